@@ -23,6 +23,8 @@ let hrMiniChartData = {};
 let cadenceMiniCharts = {};
 let cadenceMiniChartData = {};
 let sessionStartTimes = {};  // sessionId -> Date object from startDateTime
+let deltaSessionMeta = {};   // delta session index -> session metadata snapshot
+let deltaLastFields = {};    // delta session index -> last reconstructed point fields
 const SESSION_ID_START_TIME_TOLERANCE_MS = 5 * 60 * 1000;
 const CADENCE_ROLLING_WINDOW_MS = 10 * 1000;
 const CADENCE_SPARKLINE_WINDOW_MS = 5 * 60 * 1000;
@@ -1503,6 +1505,11 @@ function connectToWebSocket() {
         console.log('Connected to WebSocket server');
         addDebugMessage('WebSocket connection established', 'connection');
 
+        // Live updates as delta frames against per-session snapshots
+        deltaSessionMeta = {};
+        deltaLastFields = {};
+        websocket.send(JSON.stringify({ type: 'subscribe', firehose: true, delta: true }));
+
         // Request historical data from server
         websocket.send(JSON.stringify({ type: 'request_history' }));
 
@@ -1532,6 +1539,20 @@ function connectToWebSocket() {
             case 'update':
                 handlePoint(message.point);
                 break;
+            case 'update_batch':
+                (message.points || []).forEach(point => handlePoint(point));
+                break;
+            case 'session_snapshot':
+                deltaSessionMeta[message.s] = message.meta || {};
+                break;
+            case 'delta':
+                (message.f || []).forEach(frame => {
+                    const point = applyDeltaFrame(frame);
+                    if (point) {
+                        handlePoint(point);
+                    }
+                });
+                break;
             case 'followed_user_update':
                 handlePoint(message.point);
                 break;
@@ -1915,6 +1936,21 @@ function finalizeBatchProcessing(sessionLapTimes) {
     });
 }
 
+function applyDeltaFrame(frame) {
+    // Rebuild a full point from the session snapshot and the previous frame
+    const meta = deltaSessionMeta[frame.s];
+    const previous = frame.k ? {} : deltaLastFields[frame.s];
+    if (!meta || !previous) {
+        return null;
+    }
+
+    const fields = { ...previous, ...(frame.p || {}) };
+    (frame.r || []).forEach(key => delete fields[key]);
+    deltaLastFields[frame.s] = fields;
+
+    return { ...meta, ...fields };
+}
+
 function handlePoint(data) {
     if (!data) return;
     if (isProcessingBatch) {
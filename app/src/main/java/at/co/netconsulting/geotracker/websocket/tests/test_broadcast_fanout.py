@@ -0,0 +1,341 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from test_live_snapshot import FakeRedis, websocket_server
+
+
+def make_client(name):
+    client = MagicMock()
+    client.remote_address = (name, 0)
+    client.send = AsyncMock()
+    client.close = AsyncMock()
+    return client
+
+
+class BroadcastFanOutTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = websocket_server.TrackingServer()
+
+    async def asyncTearDown(self):
+        for client in list(self.server.client_outboxes):
+            await self.server.unregister_client_outbox(client)
+
+    async def test_message_is_serialized_once_and_sent_to_every_client(self):
+        clients = [make_client("a"), make_client("b")]
+        for client in clients:
+            self.server.connected_clients.add(client)
+            self.server.register_client_outbox(client)
+
+        await self.server.broadcast_update({"type": "update", "point": {"sessionId": "s"}})
+        await asyncio.sleep(0)
+
+        payloads = [client.send.await_args.args[0] for client in clients]
+        self.assertEqual(payloads[0], payloads[1])
+        self.assertIs(payloads[0], payloads[1])
+
+    async def test_slow_consumer_drops_oldest_updates(self):
+        client = make_client("slow")
+        outbox = websocket_server.ClientOutbox(client, 2, "drop_oldest", 0)
+
+        for payload in ("1", "2", "3"):
+            self.assertTrue(outbox.push(payload))
+
+        self.assertEqual(["2", "3"], list(outbox.queue))
+        self.assertEqual(1, outbox.dropped)
+
+    async def test_slow_consumer_is_disconnected_after_threshold(self):
+        client = make_client("slow")
+        outbox = websocket_server.ClientOutbox(client, 1, "drop_oldest", 2)
+
+        outbox.push("1")
+        outbox.push("2")
+        self.assertFalse(outbox.push("3"))
+        await asyncio.sleep(0)
+
+        self.assertTrue(outbox.closed)
+        client.close.assert_awaited_once()
+
+    async def test_disconnected_client_is_removed_from_broadcasts(self):
+        client = make_client("gone")
+        self.server.connected_clients.add(client)
+
+        await self.server.broadcast_update({"type": "session_list", "sessions": []})
+
+        self.assertNotIn(client, self.server.connected_clients)
+
+
+class TopicSubscriptionTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.firehose = make_client("firehose")
+        self.follower = make_client("follower")
+        self.event_viewer = make_client("event")
+        for client in (self.firehose, self.follower, self.event_viewer):
+            self.server.connected_clients.add(client)
+            self.server.register_client_outbox(client)
+        self.server.set_client_topics(self.firehose, {websocket_server.FIREHOSE_TOPIC})
+        self.server.set_client_topics(self.follower, self.server.parse_subscription_topics({
+            "sessionIds": ["session-1"],
+        }))
+        self.server.set_client_topics(self.event_viewer, self.server.parse_subscription_topics({
+            "eventNames": ["Vienna Marathon"],
+        }))
+
+    async def asyncTearDown(self):
+        for client in list(self.server.client_outboxes):
+            await self.server.unregister_client_outbox(client)
+
+    async def test_points_reach_only_matching_subscribers(self):
+        point = {"sessionId": "session-2", "eventName": "Graz Run", "sportType": "Running"}
+
+        await self.server.publish_point_message(point, {"type": "update", "point": point})
+        await asyncio.sleep(0)
+
+        self.firehose.send.assert_awaited_once()
+        self.follower.send.assert_not_awaited()
+        self.event_viewer.send.assert_not_awaited()
+
+    async def test_reset_fragments_reach_base_session_subscribers(self):
+        point = {"sessionId": "session-1_reset_1785782754000", "eventName": "Vienna Marathon"}
+
+        self.assertEqual(
+            {self.firehose, self.follower, self.event_viewer},
+            self.server.subscribers_for_point(point)
+        )
+
+    async def test_unsubscribe_removes_client_from_topic_index(self):
+        self.follower.send = AsyncMock()
+        await self.server.handle_subscribe_request(self.follower, {
+            "type": "unsubscribe",
+            "sessionIds": ["session-1"],
+        })
+
+        self.assertNotIn("session:session-1", self.server.topic_subscribers)
+        self.assertEqual(set(), self.server.client_topics[self.follower])
+
+
+class WireFormatTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        for outbox in list(self.outboxes):
+            await outbox.close()
+
+    async def test_message_is_encoded_once_per_wire_format(self):
+        json_client = make_client("json")
+        other_client = make_client("json-2")
+        json_client.subprotocol = None
+        other_client.subprotocol = None
+        self.outboxes = [websocket_server.ClientOutbox(client, 4, "drop_oldest", 0)
+                         for client in (json_client, other_client)]
+        message = websocket_server.EncodedMessage({"type": "update", "point": {"sessionId": "s"}})
+
+        for outbox in self.outboxes:
+            outbox.push(message)
+
+        self.assertEqual([websocket_server.JSON_WIRE_FORMAT], list(message.payloads))
+        self.assertIs(self.outboxes[0].queue[0], self.outboxes[1].queue[0])
+
+    @unittest.skipIf(websocket_server.msgpack is None, "msgpack is not installed")
+    async def test_msgpack_subprotocol_round_trips_messages(self):
+        client = make_client("binary")
+        client.subprotocol = websocket_server.MSGPACK_SUBPROTOCOL
+        self.outboxes = []
+        wire_format = websocket_server.wire_format_of(client)
+        message = {"type": "tracking_batch", "points": [{"latitude": 48.2}]}
+
+        encoded = websocket_server.encode_message(message, wire_format)
+
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(message, websocket_server.decode_message(encoded, wire_format))
+
+
+class DeltaEncodingTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.viewer = make_client("viewer")
+        self.server.connected_clients.add(self.viewer)
+        self.server.register_client_outbox(self.viewer)
+        self.server.set_client_topics(self.viewer, {websocket_server.FIREHOSE_TOPIC})
+        self.server.client_outboxes[self.viewer].delta_encoding = True
+
+    async def asyncTearDown(self):
+        for client in list(self.server.client_outboxes):
+            await self.server.unregister_client_outbox(client)
+
+    def sent_messages(self):
+        return [json.loads(call.args[0]) for call in self.viewer.send.await_args_list]
+
+    async def test_snapshot_is_sent_once_then_only_changed_fields(self):
+        point = {"sessionId": "session-1", "firstname": "Bernd", "latitude": 48.2, "longitude": 16.3}
+
+        await self.server.publish_points([point])
+        await self.server.publish_points([{**point, "latitude": 48.3}])
+        await asyncio.sleep(0)
+
+        snapshot, keyframe, delta = self.sent_messages()
+        self.assertEqual("session_snapshot", snapshot["type"])
+        self.assertEqual({"sessionId": "session-1", "firstname": "Bernd"}, snapshot["meta"])
+        self.assertEqual([{"s": 0, "k": 1, "p": {"latitude": 48.2, "longitude": 16.3}}], keyframe["f"])
+        self.assertEqual([{"s": 0, "p": {"latitude": 48.3}}], delta["f"])
+
+    async def test_changed_metadata_resends_snapshot_with_keyframe(self):
+        point = {"sessionId": "session-1", "eventName": "Run", "latitude": 48.2}
+
+        await self.server.publish_points([point])
+        await self.server.publish_points([{**point, "eventName": "Race"}])
+        await asyncio.sleep(0)
+
+        messages = self.sent_messages()
+        self.assertEqual(["session_snapshot", "delta", "session_snapshot", "delta"],
+                         [message["type"] for message in messages])
+        self.assertEqual(2, messages[2]["v"])
+        self.assertEqual(1, messages[3]["f"][0]["k"])
+
+    async def test_dropped_snapshot_resyncs_the_frames_queued_after_it(self):
+        self.server.client_outboxes[self.viewer].max_queue = 2
+        point = {"sessionId": "session-1", "firstname": "Bernd", "latitude": 48.2}
+
+        await self.server.publish_points([point])
+        await self.server.publish_points([{**point, "latitude": 48.3}])
+        await asyncio.sleep(0)
+
+        snapshot, delta = self.sent_messages()
+        self.assertEqual("session_snapshot", snapshot["type"])
+        self.assertEqual([{"s": 0, "k": 1, "p": {"latitude": 48.3}}], delta["f"])
+
+    async def test_unsubscribed_sessions_are_forgotten(self):
+        await self.server.publish_points([{"sessionId": "session-1", "latitude": 48.2}])
+        await self.server.publish_points([{"sessionId": "session-2", "latitude": 48.2}])
+        outbox = self.server.client_outboxes[self.viewer]
+        self.assertEqual({0, 1}, set(outbox.known_sessions))
+
+        await self.server.handle_subscribe_request(self.viewer, {"type": "subscribe", "sessionIds": ["session-2"]})
+
+        self.assertEqual({1}, set(outbox.known_sessions))
+
+
+class BroadcastTickTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.server.broadcast_tick_ms = 60000
+        self.viewer = make_client("viewer")
+        self.server.connected_clients.add(self.viewer)
+        self.server.register_client_outbox(self.viewer)
+        self.server.set_client_topics(self.viewer, {websocket_server.FIREHOSE_TOPIC})
+        await self.server.start_broadcast_ticker()
+
+    async def asyncTearDown(self):
+        await self.server.stop_broadcast_ticker()
+        for client in list(self.server.client_outboxes):
+            await self.server.unregister_client_outbox(client)
+
+    async def test_latest_point_per_session_is_sent_in_one_frame_per_tick(self):
+        await self.server.publish_points([{"sessionId": "session-1", "seq": 1}])
+        await self.server.publish_points([{"sessionId": "session-1", "seq": 2}])
+        await self.server.publish_points([{"sessionId": "session-2", "seq": 3}])
+        await asyncio.sleep(0)
+        self.viewer.send.assert_not_awaited()
+
+        await self.server.flush_broadcasts()
+        await asyncio.sleep(0)
+
+        self.viewer.send.assert_awaited_once()
+        message = json.loads(self.viewer.send.await_args.args[0])
+        self.assertEqual("update_batch", message["type"])
+        self.assertEqual([2, 3], [point["seq"] for point in message["points"]])
+
+    async def test_list_broadcasts_are_coalesced_until_the_tick(self):
+        self.server.send_session_list_update = AsyncMock()
+
+        await self.server.broadcast_session_list_update()
+        await self.server.broadcast_session_list_update()
+        self.server.send_session_list_update.assert_not_awaited()
+
+        await self.server.flush_broadcasts()
+
+        self.server.send_session_list_update.assert_awaited_once()
+
+
+class ClusterFanOutTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.redis = FakeRedis()
+        self.workers = [self.worker(f"worker-{index}") for index in range(2)]
+        self.viewer = make_client("viewer")
+        second = self.workers[1]
+        second.connected_clients.add(self.viewer)
+        second.register_client_outbox(self.viewer)
+        second.set_client_topics(self.viewer, {websocket_server.FIREHOSE_TOPIC})
+
+    async def asyncTearDown(self):
+        for worker in self.workers:
+            for client in list(worker.client_outboxes):
+                await worker.unregister_client_outbox(client)
+
+    def worker(self, worker_id):
+        worker = websocket_server.TrackingServer()
+        worker.redis_client = self.redis
+        worker.worker_id = worker_id
+        worker.cluster_enabled = True
+        return worker
+
+    def batch(self, *seqs):
+        return {
+            "type": "tracking_batch",
+            "sessionId": "s",
+            "firstname": "Bernd",
+            "points": [{
+                "latitude": 48.2 + seq / 10000, "longitude": 16.3, "distance": 100.0 + seq,
+                "currentSpeed": 10.0, "maxSpeed": 12.0, "movingAverageSpeed": 9.0,
+                "averageSpeed": 9.5, "seq": seq,
+            } for seq in seqs],
+        }
+
+    async def deliver(self):
+        published, self.redis.published = self.redis.published, []
+        for channel, data in published:
+            self.assertEqual(self.workers[0].cluster_channel, channel)
+            for worker in self.workers:
+                await worker.handle_cluster_message(data)
+        await asyncio.sleep(0)
+
+    def viewer_messages(self):
+        return [json.loads(call.args[0]) for call in self.viewer.send.await_args_list]
+
+    async def test_points_reach_viewers_on_other_workers(self):
+        await self.workers[0].process_tracking_batch(self.batch(1, 2))
+        await self.deliver()
+
+        for worker in self.workers:
+            self.assertEqual([1, 2], [point["seq"] for point in worker.tracking_history["s"]])
+            self.assertIn("s", worker.active_sessions)
+        updates = [message for message in self.viewer_messages() if message["type"] == "update_batch"]
+        self.assertEqual([[1, 2]], [[point["seq"] for point in message["points"]] for message in updates])
+
+    async def test_tracker_moving_to_another_worker_keeps_its_session(self):
+        first, second = self.workers
+        await second.process_tracking_batch(self.batch(1))
+        self.redis.published = []
+        # The tracker reconnects to the other worker and sends for ten minutes
+        second.sessions.get("s").last_seen -= websocket_server.datetime.timedelta(minutes=10)
+        await first.process_tracking_batch(self.batch(2))
+        await self.deliver()
+
+        tracking_points = second.create_tracking_points_batch(self.batch(3))
+
+        self.assertEqual(["s"], [point["sessionId"] for point in tracking_points])
+
+    async def test_deleted_sessions_are_dropped_on_every_worker(self):
+        await self.workers[0].process_tracking_batch(self.batch(1))
+        await self.deliver()
+        self.viewer.send.reset_mock()
+
+        await self.workers[0].publish_cluster_event({"type": "session_deleted", "sessionId": "s", "sessionIds": ["s"]})
+        await self.deliver()
+
+        self.assertNotIn("s", self.workers[1].tracking_history)
+        self.assertEqual([{"type": "session_deleted", "sessionId": "s"}], self.viewer_messages())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,297 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from test_live_snapshot import FakeRedis, websocket_server
+
+
+class RecordingWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, payload):
+        self.sent.append(payload)
+
+    def messages(self):
+        return [websocket_server.json.loads(payload) for payload in self.sent]
+
+
+class RedisPageTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.server.redis_client = FakeRedis()
+        now = time.time() - 60
+        # Equal scores within a session, as after a PostgreSQL backfill
+        await self.server.write_session_entries_to_redis({
+            "a": [({"sessionId": "a", "seq": 0}, now),
+                  ({"sessionId": "a", "seq": 1}, now + 1),
+                  ({"sessionId": "a", "seq": 2}, now + 1),
+                  ({"sessionId": "a", "seq": 3}, now + 1)],
+            "b": [({"sessionId": "b", "seq": 4}, now + 2)],
+        })
+
+    async def test_pages_follow_the_score_cursor_across_equal_scores(self):
+        pages = [
+            (session_id, [point["seq"] for point, _ in page])
+            async for session_id, page in self.server.iter_tracking_point_pages_from_redis(2)
+        ]
+
+        # Equal scores are ordered by member, like in Redis
+        self.assertEqual([2, 2, 1], [len(page) for _, page in pages])
+        self.assertEqual([0, 1, 2, 3, 4], sorted(seq for _, page in pages for seq in page))
+        self.assertEqual(("b", [4]), pages[-1])
+
+    async def test_live_history_is_loaded_page_by_page(self):
+        self.server.history_page_size = 2
+
+        loaded = await self.server.load_tracking_history_from_redis()
+
+        self.assertEqual(5, loaded)
+        self.assertEqual([0, 1, 2, 3], sorted(point["seq"] for point in self.server.tracking_history["a"]))
+
+
+class WarmStartTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.server.redis_client = FakeRedis()
+        self.server.get_lap_times_for_sessions = AsyncMock(return_value={})
+        now = time.time() - 60
+        await self.server.write_session_entries_to_redis({
+            "a": [({"sessionId": "a", "seq": 0}, now), ({"sessionId": "a", "seq": 1}, now + 1)],
+            "b": [({"sessionId": "b", "seq": 0}, now + 2)],
+        })
+        self.server.restore_started_at = time.time()
+        # A point that arrived after the server started listening
+        self.server.append_live_points("a", [{"sessionId": "a", "seq": 2}])
+        await self.server.cache_tracking_point({"sessionId": "a", "seq": 2})
+
+    async def test_restored_history_is_merged_in_front_of_live_points(self):
+        loaded = await self.server.load_tracking_history_from_redis()
+
+        self.assertEqual(3, loaded)
+        self.assertEqual([0, 1, 2], [point["seq"] for point in self.server.tracking_history["a"]])
+        self.assertEqual({}, self.server.unhydrated_sessions)
+
+    async def test_requests_during_the_restore_load_sessions_on_demand(self):
+        self.server.unhydrated_sessions.update({"a": {"sessionId": "a"}, "b": {"sessionId": "b"}})
+
+        sessions = self.server.get_session_list_message().message["sessions"]
+        self.assertEqual(["a", "b"], sorted(session["sessionId"] for session in sessions))
+
+        websocket = RecordingWebSocket()
+        await self.server.send_history(websocket)
+
+        history = [(point["sessionId"], point["seq"]) for message in websocket.messages()
+                   if message["type"] == "history_batch" for point in message["points"]]
+        self.assertEqual([("a", 0), ("a", 1), ("a", 2), ("b", 0)], history)
+        self.assertEqual({}, self.server.unhydrated_sessions)
+
+
+class HistorySnapshotTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.server.history_snapshot = websocket_server.HistorySnapshot(2, 1024 * 1024)
+        self.server.get_lap_times_for_sessions = AsyncMock(return_value={
+            "a": [{"lapNumber": 1, "duration": 300000, "distance": 1.0}],
+            "b": [],
+        })
+        self.append("a", 3)
+        self.append("b", 1)
+
+    def append(self, session_id, count):
+        for _ in range(count):
+            points = self.server.tracking_history[session_id]
+            points.append({"sessionId": session_id, "seq": len(points)})
+            self.server.history_snapshot.touch(session_id)
+
+    async def test_history_is_served_from_memory_without_redis(self):
+        websocket = RecordingWebSocket()
+
+        await self.server.send_history(websocket)
+
+        messages = websocket.messages()
+        history_points = [point for message in messages if message["type"] == "history_batch"
+                          for point in message["points"]]
+        self.assertEqual(4, len(history_points))
+        self.assertEqual(["a", "b"], [session["sessionId"] for session in messages[-2]["sessions"]])
+        self.assertEqual({"a": [{"lapNumber": 1, "duration": 300000, "distance": 1.0}]},
+                         messages[-1]["sessionLapTimes"])
+
+    async def test_sealed_chunks_are_reused_and_only_the_tail_is_rebuilt(self):
+        first = RecordingWebSocket()
+        await self.server.send_history(first)
+
+        self.append("a", 1)
+        second = RecordingWebSocket()
+        await self.server.send_history(second)
+
+        # a: [0, 1] is sealed and sent as the same object, [2] grew to [2, 3]
+        self.assertIs(first.sent[0], second.sent[0])
+        self.assertEqual([2, 3], [point["seq"] for point in second.messages()[1]["points"]])
+        # b did not change, so its open chunk is reused as well
+        self.assertIs(first.sent[2], second.sent[2])
+
+    async def test_trimmed_sessions_are_rebuilt(self):
+        first = RecordingWebSocket()
+        await self.server.send_history(first)
+
+        self.server.tracking_history["a"].drop_oldest(1)
+        self.server.history_snapshot.invalidate("a")
+        second = RecordingWebSocket()
+        await self.server.send_history(second)
+
+        self.assertEqual([1, 2], [point["seq"] for point in second.messages()[0]["points"]])
+
+    async def test_concurrent_requests_share_one_lap_query(self):
+        websockets_ = [RecordingWebSocket() for _ in range(5)]
+
+        await asyncio.gather(*(self.server.send_history(websocket) for websocket in websockets_))
+        await self.server.send_history(RecordingWebSocket())
+
+        self.server.get_lap_times_for_sessions.assert_awaited_once()
+        # Every client got the same pre-serialized history_complete
+        self.assertEqual(1, len({id(websocket.sent[-1]) for websocket in websockets_}))
+
+        self.server.record_lap_times("a", [], replace=False)
+        await self.server.send_history(RecordingWebSocket())
+        self.assertEqual(2, self.server.get_lap_times_for_sessions.await_count)
+
+    def test_session_list_follows_the_generation(self):
+        first = self.server.get_session_list_message()
+        self.assertIs(first, self.server.get_session_list_message())
+
+        self.server.mark_session_active("b")
+        second = self.server.get_session_list_message()
+
+        self.assertIsNot(first, second)
+        self.assertEqual([False, True], [session["isActive"] for session in second.message["sessions"]])
+
+
+class SessionTrackTest(unittest.TestCase):
+    def setUp(self):
+        self.point = {
+            "sessionId": "session-1",
+            "firstname": "Bernd",
+            "eventName": "Vienna Marathon",
+            "timestamp": "03-08-2026 18:45:54",
+            "latitude": 48.2082,
+            "longitude": 16.3738,
+            "heartRate": 142,
+            "windDirection": "NW",
+            "isPaused": False,
+            "pressure": None,
+        }
+
+    def test_points_round_trip_through_the_columns(self):
+        odd = {**self.point, "timestamp": "3-8-2026 18:45:54", "heartRate": 2**60, "eventName": "Relay"}
+        track = websocket_server.SessionTrack([self.point, odd])
+
+        self.assertEqual([self.point, odd], list(track))
+        self.assertIsInstance(track[0]["heartRate"], int)
+        self.assertEqual([odd], track[1:])
+        self.assertEqual(2, len(track.metadata))
+        self.assertEqual("Relay", track.value("eventName"))
+        self.assertEqual(48.2082, track.value("latitude", index=0))
+        self.assertEqual("03-08-2026 18:45:54", track.value("timestamp", index=0))
+        self.assertEqual(0.0, track.value("altitude", 0.0))
+
+    def test_dropped_points_are_compacted_lazily(self):
+        track = websocket_server.SessionTrack([{**self.point, "heartRate": seq} for seq in range(10)])
+
+        track.drop_oldest(2)
+        self.assertEqual(2, track.head)
+        track.append({**self.point, "heartRate": 10, "altitude": 180.0})
+        self.assertEqual([2, 3], [point["heartRate"] for point in track[:2]])
+        self.assertEqual(180.0, track.value("altitude"))
+        self.assertEqual(3, track.value("heartRate", index=1))
+
+        track.drop_oldest(4)
+        self.assertEqual(0, track.head)
+        self.assertEqual(list(range(6, 11)), [point["heartRate"] for point in track])
+        self.assertEqual(5, len(track.presence))
+
+    def test_only_zero_padded_timestamps_are_packed(self):
+        track = websocket_server.SessionTrack()
+
+        self.assertEqual(1785782754.0, track.pack_timestamp("03-08-2026 18:45:54"))
+        for timestamp in ("03-08-2026 24:00:00", "29-02-2026 10:00:00", "03-08-0999 10:00:00", "03-08-2026T18:45:54"):
+            self.assertNotEqual(track.pack_timestamp(timestamp), track.pack_timestamp(timestamp))
+
+    def test_trim_drops_expired_points_and_keeps_unparseable_ones(self):
+        track = websocket_server.SessionTrack([
+            {**self.point, "timestamp": "01-08-2026 10:00:00", "heartRate": 1},
+            {**self.point, "timestamp": "broken", "heartRate": 2},
+            {**self.point, "timestamp": "02-08-2026 10:00:00", "heartRate": 3},
+            {**self.point, "timestamp": "03-08-2026 10:00:00", "heartRate": 4},
+            {**self.point, "timestamp": "01-08-2026 11:00:00", "heartRate": 5},
+        ])
+
+        removed = track.trim_before(websocket_server.datetime.datetime(2026, 8, 2, 12))
+
+        self.assertEqual(3, removed)
+        self.assertEqual([2, 4], [point["heartRate"] for point in track])
+
+    def test_session_cap_drops_the_oldest_tenth(self):
+        server = websocket_server.TrackingServer()
+        server.live_session_max_points = 10
+
+        server.append_live_points("a", [{**self.point, "heartRate": seq} for seq in range(11)])
+
+        self.assertEqual(list(range(2, 11)), [point["heartRate"] for point in server.tracking_history["a"]])
+
+
+class RetentionTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.now = websocket_server.datetime.datetime.now().replace(microsecond=0)
+
+    def append(self, session_id, *hours_ago):
+        self.server.append_live_points(session_id, [
+            {"sessionId": session_id, "timestamp": (self.now - websocket_server.datetime.timedelta(hours=hours))
+             .strftime("%d-%m-%Y %H:%M:%S")}
+            for hours in hours_ago
+        ])
+
+    async def test_only_sessions_with_expired_points_are_touched(self):
+        self.append("old", 50, 49, 1)
+        self.append("gone", 60)
+        self.append("fresh", 2, 1)
+        fresh = self.server.tracking_history["fresh"]
+        trim_before = websocket_server.SessionTrack.trim_before
+
+        with patch.object(websocket_server.SessionTrack, "trim_before", autospec=True,
+                          side_effect=trim_before) as trim:
+            removed = await self.server.cleanup_old_data_from_memory()
+
+        self.assertNotIn(fresh, [call.args[0] for call in trim.call_args_list])
+        self.assertEqual(4, removed)
+        self.assertEqual(1, len(self.server.tracking_history["old"]))
+        self.assertNotIn("gone", self.server.tracking_history)
+        self.assertEqual(2, len(fresh))
+        self.assertEqual(0, await self.server.cleanup_old_data_from_memory())
+
+    async def test_active_session_keeps_its_state_when_its_track_empties(self):
+        self.append("active", 50)
+        self.append("idle", 50)
+        self.server.mark_session_active("active")
+        for session_id in ("active", "idle"):
+            self.server.sessions.touch(session_id).last_lap = 3
+
+        self.assertEqual(4, await self.server.cleanup_old_data_from_memory())
+
+        self.assertNotIn("active", self.server.tracking_history)
+        self.assertEqual(3, self.server.sessions.get("active").last_lap)
+        self.assertIsNone(self.server.sessions.get("idle"))
+
+    async def test_out_of_order_points_still_expire(self):
+        self.append("late", 1)
+        self.append("late", 50)
+
+        self.assertFalse(self.server.tracking_history["late"].ordered)
+        self.assertEqual(1, await self.server.cleanup_old_data_from_memory())
+        self.assertEqual(1, len(self.server.tracking_history["late"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
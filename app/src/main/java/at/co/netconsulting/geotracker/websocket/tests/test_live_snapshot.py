@@ -1,3 +1,4 @@
+from collections import defaultdict
 import importlib.util
 import logging
 import logging.handlers
@@ -5,6 +6,7 @@ from pathlib import Path
 import sys
 import types
 import unittest
+import uuid
 from unittest.mock import AsyncMock
 
 
@@ -21,6 +23,7 @@ def load_websocket_server_module():
     redis_package = types.ModuleType("redis")
     redis_asyncio = types.ModuleType("redis.asyncio")
     redis_asyncio.Redis = type("Redis", (), {})
+    redis_asyncio.ResponseError = type("ResponseError", (Exception,), {})
     redis_package.asyncio = redis_asyncio
 
     dateutil = types.ModuleType("dateutil")
@@ -60,6 +63,180 @@ def load_websocket_server_module():
 websocket_server = load_websocket_server_module()
 
 
+def score_bound(value):
+    return float(value)
+
+
+class FakeRedisPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        commands, self.commands = self.commands, []
+        return [await getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis commands used by the live history."""
+
+    def __init__(self):
+        self.sorted_sets = defaultdict(dict)
+        self.hashes = defaultdict(dict)
+        self.expirations = {}
+        self.strings = {}
+        self.streams = defaultdict(list)
+        self.groups = {}
+        self.published = []
+        self.clock = 0
+
+    def pipeline(self, transaction=True):
+        return FakeRedisPipeline(self)
+
+    def _ordered(self, key):
+        return sorted(self.sorted_sets.get(key, {}).items(), key=lambda item: (item[1], item[0]))
+
+    async def zadd(self, key, mapping, nx=False):
+        members = self.sorted_sets[key]
+        added = 0
+        for member, score in mapping.items():
+            if member in members and nx:
+                continue
+            added += member not in members
+            members[member] = score
+        return added
+
+    async def zcard(self, key):
+        return len(self.sorted_sets.get(key, {}))
+
+    async def zrange(self, key, start, end, withscores=False):
+        items = self._ordered(key)
+        items = items[start:] if end == -1 else items[start:end + 1]
+        return items if withscores else [member for member, _ in items]
+
+    async def zrangebyscore(self, key, min_score, max_score, start=None, num=None, withscores=False):
+        items = [item for item in self._ordered(key)
+                 if score_bound(min_score) <= item[1] <= score_bound(max_score)]
+        if start is not None:
+            items = items[start:start + num]
+        return items if withscores else [member for member, _ in items]
+
+    async def zremrangebyscore(self, key, min_score, max_score):
+        members = self.sorted_sets.get(key, {})
+        expired = [member for member, score in members.items()
+                   if score_bound(min_score) <= score <= score_bound(max_score)]
+        for member in expired:
+            del members[member]
+        return len(expired)
+
+    async def zrem(self, key, *members):
+        removed = 0
+        for member in members:
+            removed += self.sorted_sets.get(key, {}).pop(member, None) is not None
+        return removed
+
+    async def expire(self, key, seconds):
+        self.expirations[key] = seconds
+        return True
+
+    async def delete(self, *keys):
+        deleted = 0
+        for key in keys:
+            deleted += bool(self.sorted_sets.pop(key, None) or self.hashes.pop(key, None)
+                            or self.strings.pop(key, None))
+        return deleted
+
+    async def hset(self, key, field, value):
+        self.hashes[key][field] = value
+        return 1
+
+    async def set(self, key, value, ex=None):
+        self.strings[key] = value
+        if ex is not None:
+            self.expirations[key] = ex
+        return True
+
+    async def exists(self, *keys):
+        return sum(key in self.strings or key in self.hashes or key in self.sorted_sets for key in keys)
+
+    async def hsetnx(self, key, field, value):
+        if field in self.hashes[key]:
+            return 0
+        self.hashes[key][field] = value
+        return 1
+
+    async def hkeys(self, key):
+        return list(self.hashes.get(key, {}))
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def hlen(self, key):
+        return len(self.hashes.get(key, {}))
+
+    async def hdel(self, key, *fields):
+        return sum(self.hashes.get(key, {}).pop(field, None) is not None for field in fields)
+
+    async def xadd(self, key, fields, maxlen=None, approximate=True):
+        entries = self.streams[key]
+        entry_id = f"{len(entries) + 1}-0".encode()
+        entries.append((entry_id, {name.encode(): value.encode() for name, value in fields.items()}))
+        return entry_id
+
+    async def xgroup_create(self, key, group, id="$", mkstream=False):
+        if (key, group) in self.groups:
+            raise websocket_server.redis.ResponseError("BUSYGROUP Consumer Group name already exists")
+        self.groups[(key, group)] = {"delivered": 0, "pending": {}, "deliveries": defaultdict(int)}
+        return True
+
+    async def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        (key, read_id), = streams.items()
+        state = self.groups[(key, group)]
+        if read_id == ">":
+            entries = self.streams[key][state["delivered"]:state["delivered"] + count]
+            state["delivered"] += len(entries)
+        else:
+            entries = [entry for entry in self.streams[key]
+                       if state["pending"].get(entry[0], (None,))[0] == consumer][:count]
+        for entry_id, _ in entries:
+            state["pending"][entry_id] = (consumer, self.clock)
+            state["deliveries"][entry_id] += 1
+        return [[key.encode(), entries]] if entries else []
+
+    async def xack(self, key, group, *entry_ids):
+        state = self.groups[(key, group)]
+        for entry_id in entry_ids:
+            state["deliveries"].pop(entry_id, None)
+        return sum(state["pending"].pop(entry_id, None) is not None for entry_id in entry_ids)
+
+    async def xautoclaim(self, key, group, consumer, min_idle_time, start_id="0-0", count=100):
+        pending = self.groups[(key, group)]["pending"]
+        claimed = [entry for entry in self.streams[key]
+                   if entry[0] in pending and self.clock - pending[entry[0]][1] >= min_idle_time][:count]
+        for entry_id, _ in claimed:
+            pending[entry_id] = (consumer, self.clock)
+            self.groups[(key, group)]["deliveries"][entry_id] += 1
+        return [b"0-0", claimed, []]
+
+    async def xpending_range(self, key, group, min, max, count, consumername=None):
+        state = self.groups[(key, group)]
+        return [{"message_id": entry_id, "consumer": consumer.encode(),
+                 "time_since_delivered": self.clock - delivered_at,
+                 "times_delivered": state["deliveries"][entry_id]}
+                for entry_id, (consumer, delivered_at) in sorted(state["pending"].items())
+                if min <= entry_id <= max][:count]
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 0
+
+
 class LiveSnapshotTest(unittest.TestCase):
     def setUp(self):
         self.server = websocket_server.TrackingServer()
@@ -108,36 +285,397 @@ class RedisBackfillTest(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         self.server = websocket_server.TrackingServer()
         self.server.db_pool = object()
-        self.server.redis_client = AsyncMock()
+        self.server.redis_client = FakeRedis()
+
+    def stream_from_db(self, *batches):
+        self.db_batches = []
+
+        async def iter_tracking_points_from_db(batch_size):
+            for batch in batches:
+                self.db_batches.append(batch)
+                yield batch
+
+        self.server.iter_tracking_points_from_db = iter_tracking_points_from_db
 
     async def test_nonempty_redis_history_is_not_overwritten(self):
-        self.server.redis_client.zcard.return_value = 3
-        self.server.load_tracking_history_from_db = AsyncMock()
+        await self.server.cache_tracking_point({"sessionId": "session-1"})
+        self.stream_from_db([{"sessionId": "session-1", "timestamp": "03-08-2026 18:45:54"}])
 
         restored = await self.server.backfill_empty_redis_history_from_db()
 
         self.assertEqual(0, restored)
-        self.server.load_tracking_history_from_db.assert_not_awaited()
-        self.server.redis_client.zadd.assert_not_awaited()
+        self.assertEqual([], self.db_batches)
+
+    async def test_live_points_from_a_warm_start_do_not_block_the_backfill(self):
+        self.server.restore_started_at = websocket_server.time.time() - 1
+        await self.server.cache_tracking_point({"sessionId": "live"})
+        self.stream_from_db([{"sessionId": "session-1", "timestamp": "03-08-2026 18:45:54"}])
+
+        self.assertEqual(1, await self.server.backfill_empty_redis_history_from_db())
+
+    async def test_points_cached_live_during_a_warm_start_are_not_backfilled(self):
+        self.server.restore_started_at = 1785782755.0
+        self.stream_from_db([{"sessionId": "session-1", "timestamp": "03-08-2026 18:45:54"},
+                             {"sessionId": "session-1", "timestamp": "03-08-2026 18:45:55"}])
+
+        stats = await self.server.backfill_redis_from_db()
+
+        self.assertEqual((1, 1), (stats["points"], stats["live"]))
+        self.assertEqual(1, await self.server.redis_client.zcard(self.server.redis_session_key("session-1")))
+
+    async def test_restore_marker_is_set_only_while_preparing(self):
+        markers = []
+
+        async def backfill():
+            markers.append(await self.server.redis_client.exists(self.server.redis_restore_key))
+            return 0
+
+        self.server.backfill_empty_redis_history_from_db = backfill
+        await self.server.prepare_redis_history()
+
+        self.assertEqual([1], markers)
+        self.assertEqual(0, await self.server.redis_client.exists(self.server.redis_restore_key))
 
     async def test_empty_redis_history_is_backfilled_with_original_timestamp(self):
-        self.server.redis_client.zcard.return_value = 0
-        self.server.load_tracking_history_from_db = AsyncMock(return_value=1)
-        self.server.tracking_history["session-1"].append({
+        self.stream_from_db([{
             "sessionId": "session-1",
             "timestamp": "03-08-2026 18:45:54",
             "latitude": 48.2,
             "longitude": 16.3,
-        })
+        }], [{"sessionId": "session-2", "timestamp": "03-08-2026 18:45:55"}])
 
         restored = await self.server.backfill_empty_redis_history_from_db()
 
-        self.assertEqual(1, restored)
-        self.server.redis_client.zadd.assert_awaited_once()
-        key, entries = self.server.redis_client.zadd.await_args.args
-        self.assertEqual(self.server.redis_history_key, key)
+        self.assertEqual(2, restored)
+        entries = await self.server.redis_client.zrange(
+            self.server.redis_session_key("session-1"), 0, -1, withscores=True
+        )
         self.assertEqual(1, len(entries))
-        self.assertEqual(1785782754.0, next(iter(entries.values())))
+        self.assertEqual(1785782754.0, entries[0][1])
+
+
+    async def test_backfill_reports_throughput_and_skipped_rows(self):
+        self.stream_from_db(
+            [{"sessionId": "a", "timestamp": "03-08-2026 18:45:54"},
+             {"sessionId": "a", "timestamp": "broken"}],
+            [{"sessionId": "b", "timestamp": "03-08-2026 18:45:55"}],
+        )
+
+        stats = await self.server.backfill_redis_from_db(batch_size=2)
+
+        self.assertEqual({"points": 2, "sessions": 2, "skipped": 1},
+                         {key: stats[key] for key in ("points", "sessions", "skipped")})
+        self.assertGreater(stats["pointsPerSecond"], 0)
+
+
+class DbPointCodecTest(unittest.TestCase):
+    def test_rows_are_converted_by_position(self):
+        row = {
+            "session_id": "session-1", "firstname": "Bernd", "lastname": None,
+            "birthdate": websocket_server.datetime.date(1980, 1, 2), "height": 180, "weight": None, "bmi": None,
+            "event_name": "Vienna Marathon", "sport_type": "Running", "comment": None, "clothing": None,
+            "app_version": "1.2", "start_city": None, "start_country": None, "start_address": None,
+            "end_city": None, "end_country": None, "end_address": None,
+            "latitude": 48.2, "longitude": 16.3, "altitude": None,
+            "current_speed": 0, "average_speed": 3.1, "max_speed": None, "moving_average_speed": 3.0,
+            "distance": 1200.5, "cumulative_elevation_gain": 12, "heart_rate": 0, "cadence": 170,
+            "heart_rate_device": None, "temperature": 18.5, "wind_speed": None, "wind_direction": "NW",
+            "humidity": 60, "weather_timestamp": None, "weather_code": 3,
+            "pressure": None, "pressure_accuracy": None, "altitude_from_pressure": None, "sea_level_pressure": None,
+            "slope": None, "average_slope": None, "max_uphill_slope": None, "max_downhill_slope": None,
+            "received_at": websocket_server.datetime.datetime(2026, 8, 3, 18, 45, 54),
+            "start_date_time": None,
+        }
+        codec = websocket_server.DbPointCodec("%d-%m-%Y %H:%M:%S")
+
+        point = codec.decode(row)
+
+        self.assertEqual("03-08-2026 18:45:54", point["timestamp"])
+        self.assertEqual(("Bernd", "Bernd", "", "1980-01-02"),
+                         (point["firstname"], point["person"], point["lastname"], point["birthdate"]))
+        self.assertEqual((180.0, 0.0, 0.0, 3.1, 0.0), (point["height"], point["weight"], point["currentSpeed"],
+                                                       point["averageSpeed"], point["maxSpeed"]))
+        self.assertEqual((170, 18.5, 60, 3, 0), (point["cadence"], point["temperature"], point["relativeHumidity"],
+                                                 point["weatherCode"], point["windDirection"]))
+        self.assertNotIn("heartRate", point)
+        self.assertNotIn("pressure", point)
+        self.assertIsNone(point["startDateTime"])
+        self.assertEqual(point, codec.decode(row))
+
+
+class RedisSessionLayoutTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.server.redis_client = FakeRedis()
+
+    async def test_legacy_global_set_is_migrated_into_session_keys(self):
+        now = websocket_server.time.time()
+        await self.server.redis_client.zadd(self.server.redis_history_key, {
+            websocket_server.json.dumps({"point": {"sessionId": "a", "seq": 0}}): now - 2,
+            websocket_server.json.dumps({"point": {"sessionId": "b", "seq": 1}}): now - 1,
+        })
+
+        migrated = await self.server.migrate_legacy_redis_history()
+
+        self.assertEqual(2, migrated)
+        self.assertEqual(0, await self.server.redis_client.zcard(self.server.redis_history_key))
+        self.assertEqual(["a", "b"], [session_id for session_id, _ in
+                                      await self.server.get_redis_session_index()])
+
+    async def test_delete_only_touches_the_deleted_session(self):
+        await self.server.cache_tracking_points([{"sessionId": "a"}, {"sessionId": "a"}])
+        await self.server.cache_tracking_point({"sessionId": "b"})
+
+        removed = await self.server.delete_sessions_from_redis({"a"})
+
+        self.assertEqual(2, removed)
+        self.assertEqual(["b"], [session_id for session_id, _ in
+                                 await self.server.get_redis_session_index()])
+        self.assertEqual(1, await self.server.redis_client.zcard(self.server.redis_session_key("b")))
+
+
+class ActivityExpiryTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.inactive = []
+        self.server.session_inactive_listeners.append(self.inactive.extend)
+
+    def test_only_expired_sessions_are_examined(self):
+        datetime = websocket_server.datetime
+        now = datetime.datetime.now()
+        self.server.mark_session_active("a")
+        self.server.mark_session_active("b")
+        # b kept sending after its deadline was scheduled
+        self.server.sessions.get("b").last_activity = now + datetime.timedelta(seconds=30)
+        # c became active later and has not reached its deadline yet
+        self.server.active_sessions.add("c")
+        self.server.sessions.touch("c").last_activity = now + datetime.timedelta(seconds=60)
+        self.server.schedule_activity_expiry("c")
+
+        self.server.update_active_sessions(now + datetime.timedelta(seconds=61))
+
+        self.assertEqual(["a"], self.inactive)
+        self.assertEqual({"b", "c"}, self.server.active_sessions)
+        self.assertEqual(now + datetime.timedelta(seconds=90), self.server.activity_deadlines["b"])
+
+    async def test_timer_moves_sessions_to_inactive(self):
+        self.server.activity_timeout = 0.02
+        self.server.mark_session_active("a")
+
+        await websocket_server.asyncio.sleep(0.1)
+
+        self.assertEqual(["a"], self.inactive)
+        self.assertEqual(set(), self.server.active_sessions)
+        self.assertIsNone(self.server.activity_timer)
+
+
+class SessionRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.sessions = websocket_server.SessionRegistry(ttl_seconds=3600, max_sessions=3)
+        self.detector = websocket_server.SessionResetDetector(self.sessions)
+
+    def test_idle_inactive_sessions_expire_but_active_ones_stay(self):
+        for session_id in ("a", "b", "c"):
+            self.detector.update_session_data(session_id, {"latitude": 48.2, "longitude": 16.3})
+        self.sessions.active.add("a")
+        for state in self.sessions.states.values():
+            state.touched -= 7200
+        self.detector.update_session_data("c", {"latitude": 48.2, "longitude": 16.3})
+
+        self.assertEqual(["b"], self.sessions.evict_expired())
+        self.assertEqual(["a", "c"], list(self.sessions.states))
+
+    def test_least_recently_touched_inactive_session_is_evicted_first(self):
+        for session_id in ("a", "b", "c"):
+            self.sessions.touch(session_id)
+        self.sessions.active.add("a")
+        self.sessions.touch("b")
+
+        self.sessions.touch("d")
+
+        self.assertEqual(["a", "b", "d"], list(self.sessions.states))
+        self.assertEqual(3, self.sessions.memory_footprint()["sessions"])
+
+    def test_reset_detection_reads_the_session_state(self):
+        self.detector.update_session_data("a", {"latitude": 48.2, "longitude": 16.3, "distance": 5000})
+
+        self.assertTrue(self.detector.should_reset_session("a", {"latitude": 48.2, "longitude": 16.3, "distance": 100}))
+        self.detector.reset_session_tracking("a")
+        self.assertFalse(self.detector.should_reset_session("a", {"latitude": 48.2, "longitude": 16.3, "distance": 100}))
+
+
+class CachedPointCodecTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.server.redis_client = FakeRedis()
+        self.point = {
+            "sessionId": "session-1",
+            "firstname": "Bernd",
+            "eventName": "Vienna Marathon",
+            "timestamp": "03-08-2026 18:45:54",
+            "latitude": 48.2082,
+            "longitude": 16.3738,
+            "heartRate": 142,
+            "windDirection": "NW",
+        }
+
+    async def load_points(self):
+        points = []
+        async for _, page in self.server.iter_tracking_point_pages_from_redis(100):
+            points.extend(point for point, _ in page)
+        return points
+
+    async def test_points_round_trip_with_metadata_stored_once(self):
+        await self.server.cache_tracking_points([self.point, {**self.point, "latitude": 48.21}])
+
+        points = await self.load_points()
+
+        self.assertEqual([self.point, {**self.point, "latitude": 48.21}], points)
+        self.assertIsInstance(points[0]["heartRate"], int)
+        metadata_key = self.server.redis_session_metadata_key("session-1")
+        self.assertEqual(1, await self.server.redis_client.hlen(metadata_key))
+        member = next(iter(self.server.redis_client.sorted_sets[self.server.redis_session_key("session-1")]))
+        self.assertNotIn(b"Vienna Marathon", member)
+
+    async def test_changed_metadata_keeps_earlier_points_intact(self):
+        await self.server.cache_tracking_point(self.point)
+        await self.server.cache_tracking_point({**self.point, "eventName": "Graz Run", "latitude": 47.07})
+
+        points = await self.load_points()
+
+        self.assertEqual(["Vienna Marathon", "Graz Run"], [point["eventName"] for point in points])
+
+    async def test_metadata_ttl_is_refreshed_with_the_points(self):
+        await self.server.cache_tracking_point(self.point)
+        self.server.redis_client.expirations.clear()
+
+        # Same metadata, so no new version is written
+        await self.server.cache_tracking_point({**self.point, "latitude": 48.21})
+
+        metadata_key = self.server.redis_session_metadata_key("session-1")
+        self.assertEqual(1, await self.server.redis_client.hlen(metadata_key))
+        self.assertEqual(self.server.data_retention_hours * 3600,
+                         self.server.redis_client.expirations.get(metadata_key))
+
+    async def test_metadata_deleted_by_another_worker_is_written_again(self):
+        await self.server.cache_tracking_point(self.point)
+        metadata_key = self.server.redis_session_metadata_key("session-1")
+        self.server.redis_client.hashes.pop(metadata_key)
+
+        await self.server.cache_tracking_point({**self.point, "latitude": 48.21})
+
+        self.assertEqual(["Vienna Marathon", "Vienna Marathon"], [point["eventName"] for point in await self.load_points()])
+
+    async def test_cleanup_prunes_metadata_versions_without_points(self):
+        now = websocket_server.time.time()
+        expired = now - self.server.data_retention_hours * 3600 - 60
+        await self.server.write_session_entries_to_redis({"session-1": [(self.point, expired)]})
+        await self.server.write_session_entries_to_redis({"session-1": [({**self.point, "eventName": "Graz Run"}, now)]})
+        metadata_key = self.server.redis_session_metadata_key("session-1")
+        self.assertEqual(2, await self.server.redis_client.hlen(metadata_key))
+
+        self.assertEqual(1, await self.server.cleanup_old_data_from_redis())
+
+        self.assertEqual(1, await self.server.redis_client.hlen(metadata_key))
+        self.assertEqual(["Graz Run"], [point["eventName"] for point in await self.load_points()])
+
+    async def test_expired_sessions_of_other_workers_are_forgotten(self):
+        await self.server.cache_tracking_point(self.point)
+
+        await self.server.handle_cluster_message(websocket_server.json.dumps(
+            {"type": "sessions_expired", "sessionIds": ["session-1"], "origin": "other"}
+        ))
+
+        self.assertNotIn("session-1", self.server.redis_session_metadata)
+
+    async def test_json_members_are_reencoded(self):
+        await self.server.cache_tracking_point(self.point)
+        session_key = self.server.redis_session_key("session-1")
+        self.server.redis_client.sorted_sets[session_key] = {
+            websocket_server.json.dumps({"cacheId": "x", "point": self.point}): websocket_server.time.time()
+        }
+
+        self.assertEqual(1, await self.server.migrate_json_redis_entries())
+
+        members = list(self.server.redis_client.sorted_sets[session_key])
+        self.assertEqual(1, len(members))
+        self.assertIsInstance(members[0], bytes)
+        self.assertEqual([self.point], await self.load_points())
+
+
+class PositionBoardTest(unittest.TestCase):
+    def setUp(self):
+        self.name = f"geotracker_test_{uuid.uuid4().hex[:12]}"
+        self.server = websocket_server.TrackingServer()
+        self.server.position_board = websocket_server.PositionBoard.create(self.name, 2)
+        self.reader = websocket_server.PositionBoard.attach(self.name)
+
+    def tearDown(self):
+        self.reader.close()
+        # attach() untracked the name for this whole process; the owner unlinks it
+        websocket_server.resource_tracker.register(self.reader.memory._name, "shared_memory")
+        self.server.position_board.close()
+
+    def point(self, session_id, latitude, **fields):
+        return {"sessionId": session_id, "latitude": latitude, "longitude": 16.3,
+                "currentSpeed": 9.5, "distance": 1.2, **fields}
+
+    def test_latest_point_is_readable_through_another_mapping(self):
+        self.server.append_live_points("a", [self.point("a", 48.1), self.point("a", 48.2, heartRate=142)])
+        self.server.append_live_points("b", [self.point("b", 47.0)])
+
+        positions = {record["sessionId"]: record for record in self.reader.positions(max_age_seconds=60)}
+
+        self.assertEqual(["a", "b"], sorted(positions))
+        self.assertEqual((48.2, 16.3, 142), (positions["a"]["latitude"], positions["a"]["longitude"],
+                                             positions["a"]["heartRate"]))
+        self.assertIsNone(positions["b"]["heartRate"])
+
+    def test_inactive_sessions_free_their_slot(self):
+        self.server.append_live_points("a", [self.point("a", 48.1)])
+        self.server.append_live_points("b", [self.point("b", 48.1)])
+        self.server.append_live_points("c", [self.point("c", 48.1)])
+        self.assertEqual(["a", "b"], sorted(record["sessionId"] for record in self.reader.positions()))
+
+        self.server.emit_sessions_inactive(["a"])
+        self.server.append_live_points("c", [self.point("c", 48.1)])
+
+        self.assertEqual(["b", "c"], sorted(record["sessionId"] for record in self.reader.positions()))
+
+    def test_slot_being_written_is_skipped_and_writer_can_reattach(self):
+        self.server.append_live_points("a", [self.point("a", 48.1)])
+        self.server.append_live_points("b", [self.point("b", 48.1)])
+        board = self.server.position_board
+        # A writer that died between the two halves of the seqlock
+        board.SEQUENCE.pack_into(board.memory.buf, board.offset(board.slots["a"]), 3)
+
+        self.assertEqual(["b"], [record["sessionId"] for record in self.reader.positions()])
+        self.assertEqual({"b": board.slots["b"]}, websocket_server.PositionBoard(board.memory, owner=False).slots)
+
+    def test_torn_slot_is_readable_again_once_reused(self):
+        self.server.append_live_points("a", [self.point("a", 48.1)])
+        board = self.server.position_board
+        slot = board.slots["a"]
+        board.SEQUENCE.pack_into(board.memory.buf, board.offset(slot), 3)
+
+        # A new writer takes over the supervisor's copy of the board
+        board.slots, board.free_slots = {}, []
+        board.take_over()
+        self.assertEqual(4, board.SEQUENCE.unpack_from(board.memory.buf, board.offset(slot))[0])
+        self.assertIn(slot, board.free_slots)
+
+        self.server.append_live_points("c", [self.point("c", 47.5)])
+        self.server.append_live_points("d", [self.point("d", 47.6)])
+        self.assertEqual(["c", "d"], sorted(record["sessionId"] for record in self.reader.positions()))
+
+    def test_writes_restore_the_parity_of_an_odd_counter(self):
+        board = self.server.position_board
+        board.SEQUENCE.pack_into(board.memory.buf, board.offset(0), 5)
+
+        board.write(0, (b"a", 48.1, 16.3, 9.5, 1.2, 142.0, 1.0))
+
+        self.assertEqual(6, board.SEQUENCE.unpack_from(board.memory.buf, board.offset(0))[0])
+        self.assertEqual(["a"], [record["sessionId"] for record in self.reader.positions()])
 
 
 if __name__ == "__main__":
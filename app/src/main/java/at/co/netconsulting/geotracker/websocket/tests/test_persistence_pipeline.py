@@ -0,0 +1,548 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, Mock
+
+from test_live_snapshot import FakeRedis, websocket_server
+
+
+class WriteBehindPersistenceTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.server.db_pool = object()
+        self.server.persistence_batch_size = 2
+        self.server.persistence_flush_interval_ms = 1000
+        self.flushed_batches = []
+
+        async def record_batch(points):
+            self.flushed_batches.append([point["seq"] for point in points])
+            return len(points)
+
+        self.server.save_tracking_batch_to_db = AsyncMock(side_effect=record_batch)
+
+    async def test_points_are_flushed_in_batches_and_drained_on_stop(self):
+        await self.server.start_persistence_writer()
+        for seq in range(5):
+            self.assertTrue(await self.server.enqueue_tracking_point({
+                "sessionId": "session-1",
+                "seq": seq,
+            }))
+
+        await self.server.stop_persistence_writer()
+
+        self.assertEqual([[0, 1], [2, 3], [4]], self.flushed_batches)
+        self.assertIsNone(self.server.persistence_writer)
+
+    async def test_points_are_not_queued_without_database(self):
+        self.server.db_pool = None
+        await self.server.start_persistence_writer()
+
+        self.assertFalse(await self.server.enqueue_tracking_point({"sessionId": "session-1"}))
+
+        await self.server.stop_persistence_writer()
+        self.assertEqual([], self.flushed_batches)
+
+
+class BatchFallbackTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.server.db_pool = object()
+        self.server.database_is_available = AsyncMock(return_value=True)
+        self.saved = []
+
+        async def insert(points):
+            if any(point.get("bad") for point in points):
+                raise ValueError("numeric field overflow")
+            self.saved.extend(point["seq"] for point in points)
+            return len(points)
+
+        self.server.insert_tracking_batch = AsyncMock(side_effect=insert)
+
+    async def test_only_the_bad_point_is_lost(self):
+        points = [{"sessionId": "a", "seq": 0}, {"sessionId": "b", "seq": 1},
+                  {"sessionId": "a", "seq": 2, "bad": True}, {"sessionId": "a", "seq": 3}]
+
+        self.assertEqual(3, await self.server.save_tracking_batch_to_db(points))
+
+        self.assertEqual([0, 3, 1], self.saved)
+
+    async def test_nothing_is_retried_while_the_database_is_down(self):
+        self.server.database_is_available.return_value = False
+
+        self.assertEqual(0, await self.server.save_tracking_batch_to_db(
+            [{"sessionId": "a", "seq": 0, "bad": True}, {"sessionId": "b", "seq": 1}]))
+
+        self.server.insert_tracking_batch.assert_awaited_once()
+
+    async def test_lap_detection_state_is_staged_until_commit(self):
+        state = self.server.sessions.touch("a")
+        state.last_lap, state.lap_start_time = 1, 1000
+        conn = Mock(execute=AsyncMock())
+        lap_states = {}
+
+        laps = await self.server.detect_server_side_laps(conn, "a", 7, {"lap": 2}, lap_states)
+
+        self.assertEqual([2], [lap["lapNumber"] for lap in laps])
+        self.assertEqual(2, lap_states["a"][0])
+        self.assertEqual((1, 1000), (state.last_lap, state.lap_start_time))
+
+
+class SpoolTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.server = websocket_server.TrackingServer()
+        self.server.db_pool = object()
+        self.server.spool = websocket_server.PointSpool(self.directory.name, 64)
+        self.server.persistence_latency_budget_ms = 50
+        self.server.database_is_available = AsyncMock(side_effect=lambda: self.database_up)
+        self.database_up = False
+        self.delay = 0
+        self.saved = []
+
+        async def save(points):
+            await asyncio.sleep(self.delay)
+            if not self.database_up:
+                return 0
+            self.saved.extend(point["seq"] for point in points)
+            return len(points)
+
+        self.server.save_tracking_batch_to_db = AsyncMock(side_effect=save)
+
+    def tearDown(self):
+        self.server.spool.close()
+        self.directory.cleanup()
+
+    def batch(self, *seqs):
+        return [{"sessionId": "a", "seq": seq} for seq in seqs]
+
+    async def test_outage_is_spooled_and_replayed_in_order(self):
+        await self.server.flush_persistence_batch(self.batch(0, 1))
+        self.database_up = True
+        # Points stay behind the spooled ones until the replay
+        await self.server.flush_persistence_batch(self.batch(2))
+        await self.server.flush_persistence_batch(self.batch(3))
+        self.assertEqual([], self.saved)
+        self.assertGreater(len(self.server.spool.segments), 1)
+
+        self.assertEqual(4, await self.server.replay_spool())
+        await self.server.flush_persistence_batch(self.batch(4))
+
+        self.assertEqual([0, 1, 2, 3, 4], self.saved)
+        self.assertEqual(["replay.offset"], os.listdir(self.directory.name))
+        self.assertEqual(0, self.server.spool_attempts)
+
+    async def test_slow_database_is_bypassed_without_cancelling_the_transaction(self):
+        self.database_up = True
+        self.delay = 0.2
+
+        await self.server.flush_persistence_batch(self.batch(0))
+        await self.server.flush_persistence_batch(self.batch(1))
+        self.assertTrue(self.server.spool.pending())
+
+        await self.server.slow_save
+        self.assertEqual([0], self.saved)
+        self.assertEqual([[1]], [[point["seq"] for point in points]
+                                 for _, points in self.server.spool.iter_records(self.server.spool.oldest_segment())])
+
+    async def test_slow_batch_is_spooled_when_it_fails(self):
+        self.delay = 0.2
+
+        await self.server.flush_persistence_batch(self.batch(0))
+        self.assertFalse(self.server.spool.pending())
+
+        await self.server.slow_save
+        self.assertIsNone(self.server.slow_save)
+        self.assertTrue(self.server.spool.pending())
+
+    async def test_failed_slow_batch_keeps_its_place_in_the_spool(self):
+        self.delay = 0.2
+
+        await self.server.flush_persistence_batch(self.batch(0))
+        await self.server.flush_persistence_batch(self.batch(1))
+        await self.server.slow_save
+        self.database_up = True
+        self.delay = 0
+
+        self.assertEqual(2, await self.server.replay_spool())
+        self.assertEqual([0, 1], self.saved)
+
+    async def test_batch_that_keeps_failing_is_moved_to_rejected(self):
+        self.server.spool_max_attempts = 3
+        await self.server.flush_persistence_batch(self.batch(0))
+        await self.server.flush_persistence_batch(self.batch(1))
+        self.database_up = True
+        saves = self.server.save_tracking_batch_to_db.side_effect
+
+        async def reject_first(points):
+            if points[0]["seq"] == 0:
+                return 0
+            return await saves(points)
+
+        self.server.save_tracking_batch_to_db.side_effect = reject_first
+        for _ in range(2):
+            self.assertEqual(0, await self.server.replay_spool())
+            self.assertGreater(self.server.spool_retry_at, websocket_server.time.monotonic())
+        self.assertEqual(1, await self.server.replay_spool())
+
+        self.assertEqual([1], self.saved)
+        rejected = websocket_server.PointSpool(os.path.join(self.directory.name, "rejected"), 64)
+        self.assertEqual([[0]], [[point["seq"] for point in points]
+                                 for _, points in rejected.iter_records(rejected.oldest_segment())])
+        rejected.close()
+
+    async def test_replay_continues_after_a_restart(self):
+        for seq in range(3):
+            await self.server.flush_persistence_batch(self.batch(seq))
+        self.database_up = True
+        saves = self.server.save_tracking_batch_to_db.side_effect
+
+        async def crash_after_first(points):
+            if self.saved:
+                raise RuntimeError("crash")
+            return await saves(points)
+
+        self.server.save_tracking_batch_to_db.side_effect = crash_after_first
+        with self.assertRaises(RuntimeError):
+            await self.server.replay_spool()
+        self.server.spool.close()
+
+        self.server.spool = websocket_server.PointSpool(self.directory.name, 64)
+        self.server.save_tracking_batch_to_db.side_effect = saves
+        self.assertEqual(2, await self.server.replay_spool())
+        self.assertEqual([0, 1, 2], self.saved)
+
+    async def test_replay_pauses_when_the_database_goes_away(self):
+        await self.server.flush_persistence_batch(self.batch(0))
+        await self.server.flush_persistence_batch(self.batch(1))
+        self.database_up = True
+        saves = self.server.save_tracking_batch_to_db.side_effect
+
+        async def fail_after_first(points):
+            if self.saved:
+                self.database_up = False
+            return await saves(points)
+
+        self.server.save_tracking_batch_to_db.side_effect = fail_after_first
+        self.assertEqual(1, await self.server.replay_spool())
+
+        self.database_up = True
+        self.server.save_tracking_batch_to_db.side_effect = saves
+        self.assertEqual(1, await self.server.replay_spool())
+        self.assertEqual([0, 1], self.saved)
+
+    def test_torn_tail_is_ignored(self):
+        spool = self.server.spool
+        spool.append(self.batch(0))
+        segment = spool.oldest_segment()
+        with open(spool.segment_path(segment), "ab") as segment_file:
+            segment_file.write(b"\x40\x00\x00\x00partial")
+
+        self.assertEqual([[0]], [[point["seq"] for point in points] for _, points in spool.iter_records(segment)])
+
+        reopened = websocket_server.PointSpool(self.directory.name, 64)
+        self.assertEqual([segment], reopened.segments)
+
+
+class IngestStreamTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.server = self.worker("server")
+        self.server.persistence_mode = "stream"
+        self.saved = []
+        self.database_up = True
+
+    def worker(self, name):
+        server = websocket_server.TrackingServer()
+        server.redis_client = self.redis
+        server.ingest_consumer = name
+        server.persistence_batch_size = 10
+        server.ingest_retry_backoff_ms = 0
+
+        async def save(points, split=True):
+            if not self.database_up or any(point.get("poison") for point in points):
+                return 0
+            self.saved.extend(point["seq"] for point in points)
+            return len(points)
+
+        server.save_tracking_batch_to_db = AsyncMock(side_effect=save)
+        server.database_is_available = AsyncMock(side_effect=lambda: self.database_up)
+        return server
+
+    async def enqueue(self, *seqs, **extra):
+        for seq in seqs:
+            self.assertTrue(await self.server.enqueue_tracking_point({"sessionId": "a", "seq": seq, **extra}))
+
+    def pending(self):
+        return self.redis.groups[(self.server.ingest_stream_key, self.server.ingest_group)]["pending"]
+
+    async def test_server_only_appends_to_the_stream(self):
+        await self.enqueue(0, 1)
+
+        self.assertEqual(2, len(self.redis.streams[self.server.ingest_stream_key]))
+        self.server.save_tracking_batch_to_db.assert_not_awaited()
+
+    async def test_entries_of_a_stopped_worker_are_claimed(self):
+        first, second = self.worker("first"), self.worker("second")
+        await first.ensure_ingest_group()
+        await second.ensure_ingest_group()
+        await self.enqueue(0, 1)
+
+        # The first worker stops before it acknowledges what it read
+        self.assertEqual(2, len(await first.read_ingest_entries(">")))
+        self.assertEqual([], await second.read_ingest_entries(">"))
+        self.redis.clock += second.ingest_claim_idle_ms
+
+        claimed = await second.claim_stale_ingest_entries()
+
+        self.assertEqual(2, await second.persist_ingest_entries(claimed))
+        self.assertEqual([0, 1], self.saved)
+        self.assertEqual({}, self.pending())
+
+    async def test_entries_stay_pending_while_the_database_is_down(self):
+        worker = self.worker("worker")
+        await worker.ensure_ingest_group()
+        await self.enqueue(0, 1)
+        self.database_up = False
+
+        self.assertEqual(0, await worker.persist_ingest_entries(await worker.read_ingest_entries(">")))
+        self.assertEqual(2, len(self.pending()))
+
+        self.database_up = True
+        await self.enqueue(2)
+        stop_event = websocket_server.asyncio.Event()
+        worker.save_tracking_batch_to_db.side_effect = None
+        save = worker.save_tracking_batch_to_db
+
+        async def save_then_stop(points, split=True):
+            self.saved.extend(point["seq"] for point in points)
+            if len(self.saved) == 3:
+                stop_event.set()
+            return len(points)
+
+        save.side_effect = save_then_stop
+        await worker.run_persistence_worker(stop_event)
+
+        # Its own pending entries are retried before new ones
+        self.assertEqual([0, 1, 2], self.saved)
+        self.assertEqual({}, self.pending())
+
+    async def test_failed_entry_holds_back_its_session_until_it_is_dead_lettered(self):
+        worker = self.worker("worker")
+        worker.ingest_max_deliveries = 2
+        await worker.ensure_ingest_group()
+        await self.enqueue(0)
+        await self.enqueue(1, poison=True)
+        await self.enqueue(2)
+        await self.enqueue(3, sessionId="b")
+
+        self.assertEqual(2, await worker.persist_ingest_entries(await worker.read_ingest_entries(">")))
+        self.assertEqual([0, 3], self.saved)
+        self.assertEqual(2, len(self.pending()))
+
+        # Still pending after its second delivery, dead-lettered after the third
+        self.assertEqual(0, await worker.persist_ingest_entries(await worker.read_ingest_entries("0")))
+        self.assertEqual(2, await worker.persist_ingest_entries(await worker.read_ingest_entries("0")))
+
+        self.assertEqual([0, 3, 2], self.saved)
+        self.assertEqual({}, self.pending())
+        dead = self.redis.streams[worker.ingest_dead_letter_key]
+        self.assertEqual([1], [point["seq"] for point in websocket_server.json.loads(dead[0][1][b"points"])])
+
+    async def test_failed_entries_are_kept_while_the_database_is_down(self):
+        worker = self.worker("worker")
+        worker.ingest_max_deliveries = 0
+        await worker.ensure_ingest_group()
+        await self.enqueue(0, poison=True)
+        self.database_up = False
+
+        self.assertEqual(0, await worker.persist_ingest_entries(await worker.read_ingest_entries(">")))
+        self.assertEqual(1, len(self.pending()))
+        self.assertNotIn(worker.ingest_dead_letter_key, self.redis.streams)
+
+    async def test_redis_outage_falls_back_to_the_local_writer(self):
+        self.server.db_pool = object()
+        self.server.redis_client.xadd = AsyncMock(side_effect=ConnectionError("redis restarting"))
+
+        await self.enqueue(0)
+
+        self.assertEqual([0], self.saved)
+
+    async def test_worker_laps_reach_the_server_lap_cache(self):
+        self.server.lap_cache["a"] = {}
+        worker = self.worker("worker")
+        worker.publish_lap_updates = True
+        lap = worker.build_lap_time(1, 0, 300000, 1.0)
+
+        await worker.publish_lap_times([("a", [lap], False)])
+        for _, message in self.redis.published:
+            self.server.apply_lap_update(message)
+
+        self.assertEqual({1: lap}, self.server.lap_cache["a"])
+
+    async def test_every_session_is_persisted_by_one_shard(self):
+        self.server.ingest_shards = 4
+        for session_id in ("a", "b", "c", "d", "e"):
+            for seq in range(2):
+                await self.server.enqueue_tracking_point({"sessionId": session_id, "seq": seq})
+
+        shards = {}
+        for stream_key, entries in self.redis.streams.items():
+            for _, fields in entries:
+                for point in websocket_server.json.loads(fields[b"points"]):
+                    shards.setdefault(point["sessionId"], set()).add(stream_key)
+        self.assertEqual({1}, {len(stream_keys) for stream_keys in shards.values()})
+        self.assertEqual({self.server.ingest_stream_key_for("a")}, shards["a"])
+        self.assertTrue(all(key.startswith(f"{self.server.redis_key_prefix}:ingest:")
+                            for key in self.redis.streams))
+
+    async def test_deleted_sessions_are_forgotten_by_the_workers(self):
+        worker = self.worker("worker")
+        worker.session_cache.set("a", {"version": "7.1"})
+        worker.sessions.touch("a").last_lap = 3
+
+        await self.server.publish_session_deletion({"a", "a_reset_1"})
+        for _, message in self.redis.published:
+            worker.apply_session_deletion(message)
+
+        self.assertNotIn("a", worker.session_cache)
+        self.assertIsNone(worker.sessions.get("a"))
+
+
+class IdentityCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.conn = AsyncMock()
+
+    async def test_known_user_is_resolved_without_database_round_trip(self):
+        self.conn.fetchval.return_value = 7
+
+        first = await self.server.get_or_create_user(self.conn, "Bernd", "Roth", "1980-01-01", 180.0)
+        second = await self.server.get_or_create_user(self.conn, "Bernd", "Roth", "1980-01-01", 180.0)
+
+        self.assertEqual((7, 7), (first, second))
+        self.conn.fetchval.assert_awaited_once()
+        self.conn.execute.assert_awaited_once()
+
+    async def test_changed_body_metrics_are_written_once(self):
+        self.conn.fetchval.return_value = 7
+        await self.server.get_or_create_user(self.conn, "Bernd", weight=80.0)
+        self.conn.execute.reset_mock()
+
+        await self.server.get_or_create_user(self.conn, "Bernd", weight=79.5)
+        await self.server.get_or_create_user(self.conn, "Bernd", weight=79.5)
+
+        self.conn.execute.assert_awaited_once()
+
+    async def test_unchanged_session_metadata_is_not_rewritten(self):
+        self.server.session_cache.set("session-1", {"version": "7.1"})
+        metadata = {"startCity": "Wien", "version": "7.1"}
+
+        await self.server.update_session_metadata(self.conn, "session-1", metadata)
+        await self.server.update_session_metadata(self.conn, "session-1", metadata)
+
+        self.conn.execute.assert_awaited_once()
+        self.assertEqual("Wien", self.conn.execute.await_args.args[2])
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        pool = self
+
+        class Acquire:
+            async def __aenter__(self):
+                return pool.conn
+
+            async def __aexit__(self, *exc_info):
+                return False
+
+        return Acquire()
+
+
+class LapCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.conn = AsyncMock()
+        self.conn.fetch.return_value = [{
+            "lap_number": 1, "start_time": 0, "end_time": 300000,
+            "duration": 300000, "distance": 1.0, "created_at": None,
+        }]
+        self.server.db_pool = FakePool(self.conn)
+        self.server.mark_session_active("session-1")
+
+    async def test_active_session_laps_are_queried_once_and_updated_in_place(self):
+        await self.server.get_lap_times_for_session("session-1")
+        self.server.record_lap_times(
+            "session-1", [self.server.build_lap_time(2, 300000, 590000, 1.0)], replace=False
+        )
+
+        lap_times = await self.server.get_lap_times_for_session("session-1")
+
+        self.conn.fetch.assert_awaited_once()
+        self.assertEqual([1, 2], [lap["lapNumber"] for lap in lap_times])
+        self.assertEqual(290000, lap_times[1]["duration"])
+
+    async def test_inactive_session_laps_are_evicted(self):
+        await self.server.get_lap_times_for_session("session-1")
+        datetime = websocket_server.datetime
+        self.server.update_active_sessions(datetime.datetime.now() + datetime.timedelta(seconds=61))
+        await self.server.get_lap_times_for_session("session-1")
+
+        self.assertNotIn("session-1", self.server.lap_cache)
+        self.assertEqual(2, self.conn.fetch.await_count)
+
+
+class RedisWriteCoalescingTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.server.redis_client = FakeRedis()
+        self.server.redis_write_flush_interval_ms = 1000
+        self.server.redis_write_retry_backoff_ms = 1
+        self.pipelines = 0
+        write_session_entries = self.server.write_session_entries_to_redis
+
+        async def count_pipelines(session_entries):
+            self.pipelines += 1
+            await write_session_entries(session_entries)
+
+        self.server.write_session_entries_to_redis = count_pipelines
+
+    async def test_points_of_all_sessions_share_one_pipeline(self):
+        await self.server.start_redis_writer()
+        for session_id in ("a", "b", "a"):
+            self.assertTrue(await self.server.cache_tracking_point({"sessionId": session_id}))
+
+        await self.server.stop_redis_writer()
+
+        self.assertEqual(1, self.pipelines)
+        self.assertEqual(2, await self.server.redis_client.zcard(self.server.redis_session_key("a")))
+        self.assertEqual(3, self.server.redis_write_metrics["written"])
+
+    async def test_failed_batch_is_retried_with_backoff(self):
+        attempts = []
+
+        async def flaky_write(scored_points):
+            attempts.append(len(scored_points))
+            if len(attempts) == 1:
+                raise ConnectionError("redis restarting")
+
+        self.server.write_scored_points_to_redis = flaky_write
+
+        self.assertTrue(await self.server.flush_redis_batch([({"sessionId": "a"}, 1.0)]))
+        self.assertEqual([1, 1], attempts)
+        self.assertEqual(1, self.server.redis_write_metrics["retries"])
+
+    async def test_full_queue_drops_instead_of_blocking(self):
+        self.server.redis_write_queue_size = 1
+        self.server.redis_write_queue = websocket_server.asyncio.Queue(maxsize=1)
+
+        self.assertFalse(await self.server.cache_tracking_points([{"sessionId": "a"}, {"sessionId": "a"}]))
+
+        self.assertEqual(1, self.server.redis_write_metrics["dropped"])
+
+
+if __name__ == "__main__":
+    unittest.main()
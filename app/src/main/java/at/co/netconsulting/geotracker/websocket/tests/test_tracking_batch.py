@@ -0,0 +1,162 @@
+import unittest
+from unittest.mock import AsyncMock
+
+from test_live_snapshot import websocket_server
+
+
+def batch_point(latitude, longitude, distance, second):
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "distance": distance,
+        "currentSpeed": 10.0,
+        "maxSpeed": 12.0,
+        "movingAverageSpeed": 9.0,
+        "averageSpeed": 9.5,
+        "currentDateTime": f"2026-08-03T18:45:{second:02d}",
+    }
+
+
+class TrackingBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.server = websocket_server.TrackingServer()
+
+    def test_envelope_fields_are_shared_and_invalid_points_dropped(self):
+        points = self.server.create_tracking_points_batch({
+            "type": "tracking_batch",
+            "sessionId": "session-1",
+            "firstname": "Bernd",
+            "eventName": "Vienna Marathon",
+            "points": [
+                batch_point(48.2, 16.3, 100.0, 1),
+                batch_point(-999, -999, 110.0, 2),
+                batch_point(48.2001, 16.3001, 120.0, 3),
+            ],
+        })
+
+        self.assertEqual(2, len(points))
+        self.assertEqual({"session-1"}, {point["sessionId"] for point in points})
+        self.assertEqual(["Vienna Marathon"] * 2, [point["eventName"] for point in points])
+        self.assertEqual("03-08-2026 18:45:03", points[-1]["timestamp"])
+        self.assertNotIn("points", points[0])
+        self.assertIn("session-1", self.server.active_sessions)
+
+    def test_reset_detection_runs_once_for_the_whole_batch(self):
+        self.server.session_detector.update_session_data("session-1", batch_point(47.0, 15.0, 5000.0, 0))
+
+        points = self.server.create_tracking_points_batch({
+            "sessionId": "session-1",
+            "person": "Bernd",
+            "points": [
+                batch_point(48.2, 16.3, 100.0, 1),
+                batch_point(48.2001, 16.3001, 120.0, 2),
+            ],
+        })
+
+        reset_ids = {point["sessionId"] for point in points}
+        self.assertEqual(1, len(reset_ids))
+        self.assertRegex(next(iter(reset_ids)), r"^session-1_reset_\d+$")
+        self.assertEqual(points[0]["startDateTime"], points[1]["startDateTime"])
+
+
+class ReplayRejectionTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = websocket_server.TrackingServer()
+        self.server.enqueue_tracking_points = AsyncMock(return_value=True)
+        self.server.cache_tracking_points = AsyncMock(return_value=True)
+
+    async def send(self, *seqs, distance=100.0, **fields):
+        self.server.enqueue_tracking_points.reset_mock()
+        await self.server.process_tracking_batch({
+            "sessionId": "session-1",
+            "person": "Bernd",
+            "points": [{**batch_point(48.2 + seq / 10000, 16.3, distance + seq, seq % 60), "seq": seq}
+                       for seq in seqs],
+            **fields,
+        })
+        if not self.server.enqueue_tracking_points.await_args:
+            return []
+        return [point["seq"] for point in self.server.enqueue_tracking_points.await_args.args[0]]
+
+    def queued_epochs(self):
+        return {point.get("seqEpoch") for point in self.server.enqueue_tracking_points.await_args.args[0]}
+
+    def test_window_tracks_recent_numbers_and_rejects_older_ones(self):
+        window = websocket_server.SequenceWindow()
+
+        self.assertEqual([True, True, False, True, False],
+                         [window.accept(seq, 8) for seq in (5, 3, 5, 4, 3)])
+        self.assertTrue(window.accept(20, 8))
+        self.assertFalse(window.accept(12, 8))
+        self.assertTrue(window.accept(13, 8))
+
+    def test_huge_jumps_do_not_grow_the_bitmap(self):
+        window = websocket_server.SequenceWindow()
+        window.accept(1, 4096)
+
+        self.assertTrue(window.accept(1_760_000_000_000, 4096))
+        self.assertEqual(1, window.bits)
+        self.assertFalse(window.accept(1_760_000_000_000, 4096))
+        self.assertTrue(window.accept(1_759_999_999_999, 4096))
+
+    async def test_resent_points_are_dropped_before_reset_detection(self):
+        self.assertEqual([1, 2, 3], await self.send(1, 2, 3))
+
+        # The app resends the last points after a reconnect, with a lower distance
+        self.assertEqual([4], await self.send(2, 3, 4, 4))
+
+        self.assertEqual(2, self.server.replayed_points_rejected)
+        self.assertEqual(["session-1"], list(self.server.tracking_history))
+
+    async def test_points_are_only_remembered_once_queued_for_persistence(self):
+        self.server.enqueue_tracking_points.return_value = False
+        await self.send(1, 2)
+
+        self.server.enqueue_tracking_points.return_value = True
+        self.assertEqual([1, 2], await self.send(1, 2))
+
+    async def test_new_app_run_starts_a_new_window(self):
+        await self.send(1, 2, 3, seqEpoch="run-1")
+
+        self.assertEqual([1, 2], await self.send(1, 2, seqEpoch="run-2"))
+        self.assertEqual([], await self.send(1, 2, seqEpoch="run-2"))
+        self.assertEqual(2, self.server.replayed_points_rejected)
+
+    async def test_counter_restart_without_epoch_gets_one_assigned(self):
+        self.server.seq_dedupe_window = 8
+        await self.send(*range(1, 21))
+
+        self.assertEqual([1, 2], await self.send(1, 2))
+        epochs = self.queued_epochs()
+        self.assertEqual(1, len(epochs))
+        self.assertRegex(next(iter(epochs)), r"^restart-\d+$")
+
+        self.assertEqual([3], await self.send(2, 3))
+        self.assertEqual(epochs, self.queued_epochs())
+
+    async def test_resend_after_a_long_dead_zone_is_still_dropped(self):
+        await self.send(1, 2, 3, distance=5000.0)
+        state = self.server.sessions.get("session-1")
+        state.last_seen -= websocket_server.datetime.timedelta(hours=1)
+
+        # The time gap resets the session, but the window spans both fragments
+        self.assertEqual([4], await self.send(2, 3, 4, distance=5000.0))
+        self.assertRegex(self.server.enqueue_tracking_points.await_args.args[0][0]["sessionId"],
+                         r"^session-1_reset_\d+$")
+
+    def test_points_without_seq_are_never_dropped(self):
+        point = {**batch_point(48.2, 16.3, 100.0, 1), "sessionId": "session-1", "person": "Bernd"}
+
+        self.assertFalse(self.server.is_replayed_point("session-1", point))
+        self.assertFalse(self.server.is_replayed_point("session-1", point))
+
+    def test_seq_is_written_to_the_insert_record(self):
+        point = {**batch_point(48.2, 16.3, 100.0, 1), "sessionId": "session-1", "seq": "7"}
+
+        self.assertEqual((7, None), self.server.build_gps_point_record(point, None)[-2:])
+        self.assertEqual((7, "3"), self.server.build_gps_point_record({**point, "seqEpoch": 3}, None)[-2:])
+        self.assertIsNone(self.server.build_gps_point_record({**point, "seq": None}, None)[-2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,15 +5,33 @@ import time
 import websockets
 import json
 import logging
+import math
+import mmap
 from logging.handlers import RotatingFileHandler
+import multiprocessing
+import multiprocessing.connection
+from multiprocessing import resource_tracker, shared_memory
 import os
-from collections import defaultdict
-from typing import Set, DefaultDict, List, Dict, Any, Optional
+import signal
+import socket
+import sys
+import struct
+import threading
+import zlib
+from collections import OrderedDict, defaultdict, deque
+from typing import Set, DefaultDict, Deque, List, Dict, Any, Optional
 import re
 import asyncpg
 import redis.asyncio as redis
 from dateutil import parser
-import uuid
+import heapq
+from array import array
+from bisect import bisect_left, insort
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 # Configure rotating log handler (10 MB max, keep 5 backups)
 log_handler = RotatingFileHandler(
@@ -28,13 +46,223 @@ logging.basicConfig(
     handlers=[log_handler]
 )
 
+# Wire formats. JSON text frames stay the default for older app versions;
+# clients that negotiate the msgpack subprotocol exchange binary frames.
+JSON_WIRE_FORMAT = 'json'
+MSGPACK_SUBPROTOCOL = 'geotracker.msgpack.v1'
+
+def supported_subprotocols() -> List[str]:
+    """Subprotocols offered during the websocket handshake."""
+    return [MSGPACK_SUBPROTOCOL] if msgpack is not None else []
+
+def wire_format_of(websocket) -> str:
+    """Return the wire format negotiated for a connection."""
+    if getattr(websocket, 'subprotocol', None) == MSGPACK_SUBPROTOCOL:
+        return MSGPACK_SUBPROTOCOL
+    return JSON_WIRE_FORMAT
+
+def decode_message(raw_message, wire_format: str) -> Any:
+    """Decode an incoming frame into plain Python objects."""
+    if wire_format == MSGPACK_SUBPROTOCOL and isinstance(raw_message, (bytes, bytearray)):
+        return msgpack.unpackb(raw_message, raw=False)
+    return json.loads(raw_message)
+
+def encode_message(message: Any, wire_format: str):
+    """Encode a message for the given wire format."""
+    if wire_format == MSGPACK_SUBPROTOCOL:
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message)
+
+class EncodedMessage:
+    """A message that is serialized at most once per wire format."""
+
+    __slots__ = ('message', 'payloads')
+
+    def __init__(self, message: Any):
+        self.message = message
+        self.payloads: Dict[str, Any] = {}
+
+    def payload(self, wire_format: str):
+        payload = self.payloads.get(wire_format)
+        if payload is None:
+            payload = encode_message(self.message, wire_format)
+            self.payloads[wire_format] = payload
+        return payload
+
+class SequenceWindow:
+    """Sliding bitmap of the point sequence numbers accepted for one session.
+
+    Bit n is set when highest - n was accepted. Every run of the app has an
+    epoch: the 'seqEpoch' the app sends with 'seq', or one the server
+    assigns when the numbers jump back by more than size without it. A new
+    epoch starts an empty window; within an epoch, numbers more than size
+    below the highest one are treated as replays.
+    """
+
+    __slots__ = ('highest', 'bits', 'epoch', 'next_epoch')
+
+    def __init__(self):
+        self.highest = -1
+        self.bits = 0
+        self.epoch: Optional[str] = None
+        # Epoch assigned to a restarted run before its first point is accepted
+        self.next_epoch: Optional[str] = None
+
+    def epoch_of(self, seq: int, size: int, epoch: Optional[str]) -> Optional[str]:
+        """Return the epoch of a point, assigning one when the app restarted its counter."""
+        if epoch is not None:
+            return str(epoch)
+        if self.highest - seq < size:
+            return self.epoch
+        if self.next_epoch is None:
+            self.next_epoch = f"restart-{int(time.time() * 1000)}"
+        return self.next_epoch
+
+    def accept(self, seq: int, size: int, epoch: Optional[str] = None) -> bool:
+        """Record seq and return False if it was already seen."""
+        if epoch != self.epoch:
+            self.highest, self.bits, self.epoch = -1, 0, epoch
+            if epoch == self.next_epoch:
+                self.next_epoch = None
+
+        if seq > self.highest:
+            shift = seq - self.highest
+            # A jump past the whole window leaves nothing of the old bitmap,
+            # and shifting by an unbounded amount would allocate that many bits
+            self.bits = ((self.bits << shift) | 1) & ((1 << size) - 1) if shift < size else 1
+            self.highest = seq
+            return True
+
+        offset = self.highest - seq
+        if offset >= size or (self.bits >> offset) & 1:
+            return False
+        self.bits |= 1 << offset
+        return True
+
+    def seen(self, seq: int, size: int, epoch: Optional[str] = None) -> bool:
+        """Return True if accept() would reject seq, without recording it."""
+        if epoch != self.epoch or seq > self.highest:
+            return False
+        offset = self.highest - seq
+        return offset >= size or bool((self.bits >> offset) & 1)
+
+
+class SessionState:
+    """Live state of one tracking session."""
+
+    __slots__ = ('last_activity', 'last_lap', 'lap_start_time',
+                 'last_coords', 'last_distance', 'last_seen', 'seq_window', 'touched')
+
+    def __init__(self):
+        self.last_activity: Optional[datetime.datetime] = None
+        # Last known lap for server-side lap detection and the time it started
+        self.last_lap = 0
+        self.lap_start_time: Optional[int] = None
+        # Reset detection: last valid coordinates, distance counter and update
+        self.last_coords: Optional[tuple] = None
+        self.last_distance: Optional[float] = None
+        self.last_seen: Optional[datetime.datetime] = None
+        # Sequence numbers of the points accepted so far, for replay rejection
+        self.seq_window: Optional[SequenceWindow] = None
+        self.touched = 0.0
+
+
+class SessionRegistry:
+    """SessionState per session with TTL and LRU eviction.
+
+    States are ordered by when they were last touched. Inactive sessions are
+    evicted once they have not been touched for ttl_seconds, and least
+    recently touched first while more than max_sessions are held. Sessions
+    in the active index are never evicted.
+    """
+
+    def __init__(self, ttl_seconds: float, max_sessions: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.states: OrderedDict = OrderedDict()
+        self.active: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        return self.states.get(session_id)
+
+    def touch(self, session_id: str) -> SessionState:
+        """Return the state of a session, creating it, and mark it recently used."""
+        state = self.states.get(session_id)
+        if state is None:
+            state = SessionState()
+            self.states[session_id] = state
+            if len(self.states) > self.max_sessions:
+                self.evict_overflow()
+        else:
+            self.states.move_to_end(session_id)
+        state.touched = time.monotonic()
+        return state
+
+    def pop(self, session_id: str) -> Optional[SessionState]:
+        return self.states.pop(session_id, None)
+
+    def clear(self) -> None:
+        self.states.clear()
+        self.active.clear()
+
+    def restore(self, session_id: str, tracking_point: Dict[str, Any], last_seen: datetime.datetime) -> SessionState:
+        """Restore the state of a session from its latest cached point."""
+        state = self.touch(session_id)
+        state.last_activity = last_seen
+        state.last_seen = last_seen
+        try:
+            latitude = float(tracking_point.get('latitude', -999))
+            longitude = float(tracking_point.get('longitude', -999))
+            if latitude != -999.0 and longitude != -999.0:
+                state.last_coords = (latitude, longitude)
+
+            distance = float(tracking_point.get('distance', 0))
+            if distance > 0:
+                state.last_distance = distance
+        except (TypeError, ValueError):
+            logging.warning("Could not restore reset-detector state for session %s", session_id)
+        return state
+
+    def evict_expired(self) -> List[str]:
+        """Evict inactive sessions that were not touched within the TTL."""
+        cutoff = time.monotonic() - self.ttl_seconds
+        evicted = []
+        for session_id, state in list(self.states.items()):
+            if state.touched >= cutoff:
+                break
+            if session_id not in self.active:
+                del self.states[session_id]
+                evicted.append(session_id)
+        return evicted
+
+    def evict_overflow(self) -> None:
+        for session_id in list(self.states):
+            if len(self.states) <= self.max_sessions:
+                break
+            if session_id not in self.active:
+                del self.states[session_id]
+
+    def memory_footprint(self) -> Dict[str, int]:
+        """Approximate memory held by the registry."""
+        size = sys.getsizeof(self.states) + sys.getsizeof(self.active)
+        for session_id, state in self.states.items():
+            size += sys.getsizeof(session_id) + sys.getsizeof(state)
+            for value in (state.last_activity, state.last_coords, state.last_seen):
+                if value is not None:
+                    size += sys.getsizeof(value)
+            if state.seq_window is not None:
+                size += sys.getsizeof(state.seq_window) + sys.getsizeof(state.seq_window.bits)
+        return {'sessions': len(self.states), 'activeSessions': len(self.active), 'bytes': size}
+
+
 class SessionResetDetector:
     """Helper class to detect when sessions should be reset due to Android app restarts"""
     
-    def __init__(self):
-        self.session_last_coords = {}  # session_id -> (lat, lng)
-        self.session_last_distance = {}  # session_id -> distance
-        self.session_last_seen = {}  # session_id -> timestamp
+    def __init__(self, sessions: SessionRegistry):
+        self.sessions = sessions  # last coordinates, distance and update per session
         self.coordinate_jump_threshold = 0.045  # ~5km in degrees
         self.distance_reset_threshold = 0.5  # If new distance < 50% of old distance
         self.time_gap_threshold = 300  # 5 minutes in seconds
@@ -53,18 +281,19 @@ class SessionResetDetector:
             return False
             
         # If session doesn't exist in our tracking, it's new
-        if session_id not in self.session_last_coords:
+        state = self.sessions.get(session_id)
+        if state is None or state.last_coords is None:
             return False
             
         # Check time gap
-        if session_id in self.session_last_seen:
-            time_diff = (current_time - self.session_last_seen[session_id]).total_seconds()
+        if state.last_seen is not None:
+            time_diff = (current_time - state.last_seen).total_seconds()
             if time_diff > self.time_gap_threshold:
                 logging.info(f"Session {session_id}: Time gap detected ({time_diff:.0f}s > {self.time_gap_threshold}s)")
                 return True
         
         # Check coordinate jump
-        old_lat, old_lng = self.session_last_coords[session_id]
+        old_lat, old_lng = state.last_coords
         lat_diff = abs(new_lat - old_lat)
         lng_diff = abs(new_lng - old_lng)
         distance_deg = (lat_diff**2 + lng_diff**2)**0.5
@@ -74,8 +303,8 @@ class SessionResetDetector:
             return True
             
         # Check distance counter reset
-        if session_id in self.session_last_distance:
-            old_distance = self.session_last_distance[session_id]
+        if state.last_distance is not None:
+            old_distance = state.last_distance
             if new_distance > 0 and old_distance > 0 and new_distance < old_distance * self.distance_reset_threshold:
                 logging.info(f"Session {session_id}: Distance counter reset detected ({new_distance:.2f}m < {old_distance * self.distance_reset_threshold:.2f}m)")
                 return True
@@ -87,23 +316,23 @@ class SessionResetDetector:
         lat = float(data.get('latitude', -999))
         lng = float(data.get('longitude', -999))
         distance = float(data.get('distance', 0))
+        state = self.sessions.touch(session_id)
         
         if lat != -999.0 and lng != -999.0:
-            self.session_last_coords[session_id] = (lat, lng)
+            state.last_coords = (lat, lng)
             
         if distance > 0:
-            self.session_last_distance[session_id] = distance
+            state.last_distance = distance
             
-        self.session_last_seen[session_id] = datetime.datetime.now()
+        state.last_seen = datetime.datetime.now()
         
     def reset_session_tracking(self, session_id: str):
         """Reset tracking data for a session"""
-        if session_id in self.session_last_coords:
-            del self.session_last_coords[session_id]
-        if session_id in self.session_last_distance:
-            del self.session_last_distance[session_id]
-        if session_id in self.session_last_seen:
-            del self.session_last_seen[session_id]
+        state = self.sessions.get(session_id)
+        if state is not None:
+            state.last_coords = None
+            state.last_distance = None
+            state.last_seen = None
             
     def create_new_session_id(self, original_id: str) -> str:
         """Create a new unique session ID"""
@@ -112,31 +341,1236 @@ class SessionResetDetector:
         logging.info(f"🔄 Session reset: {original_id} -> {new_id}")
         return new_id
 
+FIREHOSE_TOPIC = 'firehose'
+
+# Point fields that describe the session rather than the current position.
+# Delta-encoded viewers receive them once per session in a snapshot.
+SESSION_METADATA_FIELDS = frozenset((
+    'sessionId', 'firstname', 'lastname', 'person', 'birthdate', 'height',
+    'weight', 'bmi', 'eventName', 'sportType', 'comment', 'clothing',
+    'startDateTime', 'timezoneOffsetHours', 'version', 'heartRateDevice',
+    'startCity', 'startCountry', 'startAddress',
+    'endCity', 'endCountry', 'endAddress'
+))
+
+# Latest-point fields kept in the Redis session index for the session list.
+SESSION_INDEX_FIELDS = (
+    'sessionId', 'firstname', 'person', 'eventName', 'sportType', 'startDateTime',
+    'startCity', 'startCountry', 'startAddress', 'endCity', 'endCountry', 'endAddress',
+    'version'
+)
+
+def redis_text(value) -> str:
+    """Decode a Redis reply value; the live-cache client returns raw bytes."""
+    return value.decode('utf-8') if isinstance(value, (bytes, bytearray)) else value
+
+# Numeric point fields packed by the Redis live-cache codec. Version 1 of the
+# layout depends on this order: append new fields, never reorder or remove.
+CACHED_POINT_NUMERIC_FIELDS = (
+    'latitude', 'longitude', 'altitude', 'speed', 'speedAccuracyMetersPerSecond',
+    'horizontalAccuracy', 'verticalAccuracyMeters', 'bearing', 'distance',
+    'coveredDistance', 'currentSpeed', 'maxSpeed', 'movingAverageSpeed',
+    'averageSpeed', 'cumulativeElevationGain', 'slope', 'averageSlope',
+    'maxUphillSlope', 'maxDownhillSlope', 'lap', 'heartRate', 'cadence',
+    'temperature', 'windSpeed', 'humidity', 'relativeHumidity', 'weatherCode',
+    'weatherTimestamp', 'pressure', 'pressureAccuracy', 'altitudeFromPressure',
+    'seaLevelPressure', 'numberOfSatellites', 'usedNumberOfSatellites'
+)
+
+class CachedPointCodec:
+    """Compact, versioned encoding of live points in the Redis cache.
+
+    Layout v1: version byte, cached-at score, session metadata version,
+    presence bitmask, integer bitmask, one 8-byte value per present numeric
+    field, then any remaining per-point fields as compact JSON. Session
+    metadata is not repeated per point; it is stored once per metadata
+    version and merged back in on decode. Members written by older servers
+    as JSON objects are still decoded.
+    """
+
+    VERSION = 1
+    HEADER = struct.Struct('<BdQQQ')
+
+    def encode(self, tracking_point: Dict[str, Any], score: float, metadata_version: int) -> bytes:
+        presence = 0
+        integers = 0
+        packed_fields = set()
+        packed_values = []
+
+        for bit, field in enumerate(CACHED_POINT_NUMERIC_FIELDS):
+            value = tracking_point.get(field)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if isinstance(value, int) and not -2**63 <= value < 2**63:
+                continue
+            presence |= 1 << bit
+            if isinstance(value, int):
+                integers |= 1 << bit
+                packed_values.append(struct.pack('<q', value))
+            else:
+                packed_values.append(struct.pack('<d', value))
+            packed_fields.add(field)
+
+        extras = {
+            field: value for field, value in tracking_point.items()
+            if field not in packed_fields and field not in SESSION_METADATA_FIELDS
+        }
+        packed_extras = json.dumps(
+            extras, separators=(',', ':'), ensure_ascii=False, default=str
+        ).encode('utf-8') if extras else b''
+
+        return (
+            self.HEADER.pack(self.VERSION, score, metadata_version, presence, integers)
+            + b''.join(packed_values)
+            + packed_extras
+        )
+
+    def metadata_version(self, raw_entry) -> Optional[int]:
+        """Return the metadata version a packed entry refers to (None for JSON entries)."""
+        if isinstance(raw_entry, (bytes, bytearray)) and raw_entry[:1] == bytes((self.VERSION,)):
+            return self.HEADER.unpack_from(raw_entry)[2]
+        return None
+
+    def decode(self, raw_entry, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(raw_entry, (bytes, bytearray)) or raw_entry[:1] == b'{':
+            # JSON member written before the compact codec
+            tracking_point = json.loads(raw_entry).get('point')
+            if not isinstance(tracking_point, dict):
+                raise ValueError("cache entry has no point object")
+            return tracking_point
+
+        version, _, _, presence, integers = self.HEADER.unpack_from(raw_entry)
+        if version != self.VERSION:
+            raise ValueError(f"unsupported cache entry version {version}")
+
+        tracking_point = dict(metadata)
+        offset = self.HEADER.size
+        for bit, field in enumerate(CACHED_POINT_NUMERIC_FIELDS):
+            if not presence >> bit & 1:
+                continue
+            value_format = '<q' if integers >> bit & 1 else '<d'
+            tracking_point[field] = struct.unpack_from(value_format, raw_entry, offset)[0]
+            offset += 8
+
+        if offset < len(raw_entry):
+            tracking_point.update(json.loads(raw_entry[offset:].decode('utf-8')))
+        return tracking_point
+
+class DbPointCodec:
+    """Converts rows of the live-window query into tracking points.
+
+    Column positions are resolved once from the first row and every field
+    conversion comes from the tables below, so a row is converted by
+    position instead of by name lookups and per-field branches.
+    """
+
+    # (point field, column): None becomes ''
+    TEXT_FIELDS = (
+        ('lastname', 'lastname'), ('eventName', 'event_name'), ('sportType', 'sport_type'),
+        ('comment', 'comment'), ('clothing', 'clothing'), ('version', 'app_version'),
+        ('startCity', 'start_city'), ('startCountry', 'start_country'),
+        ('startAddress', 'start_address'), ('endCity', 'end_city'),
+        ('endCountry', 'end_country'), ('endAddress', 'end_address'),
+    )
+    # None becomes 0.0
+    FLOAT_FIELDS = (
+        ('height', 'height'), ('weight', 'weight'), ('bmi', 'bmi'), ('altitude', 'altitude'),
+        ('cumulativeElevationGain', 'cumulative_elevation_gain'), ('slope', 'slope'),
+        ('averageSlope', 'average_slope'), ('maxUphillSlope', 'max_uphill_slope'),
+        ('maxDownhillSlope', 'max_downhill_slope'),
+    )
+    # Any falsy value becomes 0.0
+    NONZERO_FLOAT_FIELDS = (
+        ('currentSpeed', 'current_speed'), ('maxSpeed', 'max_speed'),
+        ('movingAverageSpeed', 'moving_average_speed'), ('averageSpeed', 'average_speed'),
+        ('distance', 'distance'),
+    )
+    # Left out when None
+    OPTIONAL_FIELDS = (
+        ('cadence', 'cadence', int), ('temperature', 'temperature', float),
+        ('windSpeed', 'wind_speed', float), ('relativeHumidity', 'humidity', int),
+        ('weatherTimestamp', 'weather_timestamp', int), ('weatherCode', 'weather_code', int),
+        ('pressure', 'pressure', float), ('pressureAccuracy', 'pressure_accuracy', int),
+        ('altitudeFromPressure', 'altitude_from_pressure', float),
+        ('seaLevelPressure', 'sea_level_pressure', float),
+    )
+
+    def __init__(self, timestamp_format: str):
+        self.timestamp_format = timestamp_format
+        self.columns: Optional[Dict[str, int]] = None
+
+    def compile(self, column_names) -> None:
+        self.columns = {name: position for position, name in enumerate(column_names)}
+        column = self.columns.__getitem__
+        self.text_fields = [(field, column(name)) for field, name in self.TEXT_FIELDS]
+        self.float_fields = [(field, column(name)) for field, name in self.FLOAT_FIELDS]
+        self.nonzero_float_fields = [(field, column(name)) for field, name in self.NONZERO_FLOAT_FIELDS]
+        self.optional_fields = [(field, column(name), convert) for field, name, convert in self.OPTIONAL_FIELDS]
+
+    def decode(self, row) -> Dict[str, Any]:
+        if self.columns is None:
+            self.compile(row.keys())
+        values = tuple(row.values())
+        columns = self.columns
+
+        firstname = values[columns['firstname']]
+        birthdate = values[columns['birthdate']]
+        start_date_time = values[columns['start_date_time']]
+        tracking_point = {
+            "timestamp": values[columns['received_at']].strftime(self.timestamp_format),
+            "sessionId": values[columns['session_id']],
+            "firstname": firstname,
+            # Keep 'person' for backward compatibility
+            "person": firstname,
+            "birthdate": birthdate.isoformat() if hasattr(birthdate, 'isoformat') else str(birthdate or ''),
+            "startDateTime": start_date_time.isoformat() if start_date_time else None,
+            "latitude": float(values[columns['latitude']]),
+            "longitude": float(values[columns['longitude']]),
+        }
+        for field, position in self.text_fields:
+            tracking_point[field] = values[position] or ''
+        for field, position in self.float_fields:
+            value = values[position]
+            tracking_point[field] = float(value) if value is not None else 0.0
+        for field, position in self.nonzero_float_fields:
+            value = values[position]
+            tracking_point[field] = float(value) if value else 0.0
+
+        heart_rate = values[columns['heart_rate']]
+        if heart_rate and heart_rate > 0:
+            tracking_point["heartRate"] = int(heart_rate)
+        heart_rate_device = values[columns['heart_rate_device']]
+        if heart_rate_device:
+            tracking_point["heartRateDevice"] = heart_rate_device
+        wind_direction = values[columns['wind_direction']]
+        if wind_direction is not None:
+            if isinstance(wind_direction, (int, float)) or str(wind_direction).replace('.', '').isdigit():
+                tracking_point["windDirection"] = float(wind_direction)
+            else:
+                tracking_point["windDirection"] = 0
+        for field, position, convert in self.optional_fields:
+            value = values[position]
+            if value is not None:
+                tracking_point[field] = convert(value)
+        return tracking_point
+
+
+class DeltaEncoder:
+    """Encode live points as per-session metadata snapshots plus changed-field frames.
+
+    Every session gets a compact integer index. A snapshot carries the
+    session metadata and a version that changes whenever the metadata does.
+    Point frames carry only the per-point fields that changed since the
+    previous frame of the session ('p') and the fields that disappeared
+    ('r'); a keyframe ('k': 1) carries all of them and is emitted every
+    keyframe_interval points and whenever no previous frame is known.
+    """
+
+    def __init__(self, keyframe_interval: int):
+        self.keyframe_interval = keyframe_interval
+        self.session_indexes: Dict[str, int] = {}
+        self.session_metadata: Dict[int, Dict[str, Any]] = {}
+        self.metadata_versions: Dict[int, int] = {}
+        self.last_fields: Dict[int, Dict[str, Any]] = {}
+        self.frames_since_keyframe: Dict[int, int] = {}
+        self._next_index = 0
+
+    def session_index(self, session_id: str) -> int:
+        index = self.session_indexes.get(session_id)
+        if index is None:
+            index = self._next_index
+            self._next_index += 1
+            self.session_indexes[session_id] = index
+        return index
+
+    def encode(self, tracking_point: Dict[str, Any]) -> tuple:
+        """Return (index, delta_frame, keyframe) for a point and advance the session state."""
+        index = self.session_index(tracking_point.get('sessionId', ''))
+
+        metadata = {}
+        point_fields = {}
+        for field, value in tracking_point.items():
+            if field in SESSION_METADATA_FIELDS:
+                metadata[field] = value
+            else:
+                point_fields[field] = value
+
+        if self.session_metadata.get(index) != metadata:
+            self.session_metadata[index] = metadata
+            self.metadata_versions[index] = self.metadata_versions.get(index, 0) + 1
+
+        keyframe = {'s': index, 'k': 1, 'p': point_fields}
+        previous_fields = self.last_fields.get(index)
+        frames_since_keyframe = self.frames_since_keyframe.get(index, 0) + 1
+
+        if previous_fields is None or frames_since_keyframe >= self.keyframe_interval:
+            delta_frame = keyframe
+            frames_since_keyframe = 0
+        else:
+            delta_frame = {
+                's': index,
+                'p': {
+                    field: value for field, value in point_fields.items()
+                    if field not in previous_fields or previous_fields[field] != value
+                }
+            }
+            removed_fields = [field for field in previous_fields if field not in point_fields]
+            if removed_fields:
+                delta_frame['r'] = removed_fields
+
+        self.last_fields[index] = point_fields
+        self.frames_since_keyframe[index] = frames_since_keyframe
+        return index, delta_frame, keyframe
+
+    def snapshot(self, index: int) -> Dict[str, Any]:
+        """Return the session_snapshot message for a session index."""
+        return {
+            'type': 'session_snapshot',
+            's': index,
+            'v': self.metadata_versions.get(index, 0),
+            'meta': self.session_metadata.get(index, {})
+        }
+
+    def forget_frames(self, session_id: str) -> None:
+        """Drop the last frame of a session so its next frame is a keyframe."""
+        index = self.session_indexes.get(session_id)
+        if index is not None:
+            self.last_fields.pop(index, None)
+
+    def release(self, session_id: str) -> None:
+        """Forget a deleted or expired session entirely."""
+        index = self.session_indexes.pop(session_id, None)
+        if index is not None:
+            self.session_metadata.pop(index, None)
+            self.metadata_versions.pop(index, None)
+            self.last_fields.pop(index, None)
+            self.frames_since_keyframe.pop(index, None)
+
+class TTLCache:
+    """Small LRU cache whose entries also expire after a fixed time-to-live."""
+
+    _missing = object()
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Return a live entry and mark it as recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return default
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any) -> None:
+        """Store an entry, evicting the least recently used one when full."""
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Any, default: Any = None) -> Any:
+        """Remove an entry and return its value."""
+        entry = self._entries.pop(key, None)
+        return entry[0] if entry is not None else default
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key, self._missing) is not self._missing
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class ClientOutbox:
+    """Bounded outbound queue with its own sender task for one websocket client.
+
+    Broadcasts push an already serialized payload and return immediately, so
+    one slow viewer never delays the others. When the queue is full the
+    slow-consumer policy either drops the oldest queued update or disconnects
+    the client; with 'drop_oldest' the client is still disconnected after too
+    many consecutive drops.
+    """
+
+    # Messages that later delta frames of a client build on
+    CHAINED_TYPES = frozenset(('session_snapshot', 'delta'))
+
+    def __init__(self, websocket: websockets.WebSocketServerProtocol, max_queue: int,
+                 slow_consumer_policy: str, disconnect_after_drops: int):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.slow_consumer_policy = slow_consumer_policy
+        self.disconnect_after_drops = disconnect_after_drops
+        self.wire_format = wire_format_of(websocket)
+        self.queue: Deque[Any] = deque()
+        self.chained: Deque[bool] = deque()  # per queued payload: is it a snapshot or delta
+        self.dropped = 0
+        self.closed = False
+        # Delta-encoded clients: session index -> snapshot version they hold
+        self.delta_encoding = False
+        self.known_sessions: Dict[int, int] = {}
+        self.broken_chain = False  # a queued snapshot or delta was dropped
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def push(self, payload: Any) -> bool:
+        """Queue a payload for sending; returns False once the client is gone.
+
+        An EncodedMessage is serialized in the client's wire format here, so
+        each format is produced once per broadcast.
+        """
+        if self.closed:
+            return False
+
+        chained = False
+        if isinstance(payload, EncodedMessage):
+            chained = isinstance(payload.message, dict) and payload.message.get('type') in self.CHAINED_TYPES
+            payload = payload.payload(self.wire_format)
+
+        if len(self.queue) >= self.max_queue:
+            if self.slow_consumer_policy == 'disconnect':
+                self.disconnect("outbound queue full")
+                return False
+
+            self.queue.popleft()
+            if self.chained.popleft():
+                # A dropped frame breaks the delta chain; resend snapshots and keyframes
+                self.known_sessions.clear()
+                self.broken_chain = True
+            self.dropped += 1
+            if self.disconnect_after_drops and self.dropped >= self.disconnect_after_drops:
+                self.disconnect(f"dropped {self.dropped} updates")
+                return False
+
+        self.queue.append(payload)
+        self.chained.append(chained)
+        self._ready.set()
+        return True
+
+    def disconnect(self, reason: str) -> None:
+        """Close a client that cannot keep up with the broadcast rate."""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self.chained.clear()
+        logging.warning(f"Disconnecting slow consumer {self.websocket.remote_address}: {reason}")
+        asyncio.ensure_future(self.websocket.close(code=1008, reason="slow consumer"))
+
+    async def _run(self) -> None:
+        try:
+            while not self.closed:
+                await self._ready.wait()
+                self._ready.clear()
+                while self.queue and not self.closed:
+                    self.chained.popleft()
+                    await self.websocket.send(self.queue.popleft())
+                # The client caught up, so earlier drops no longer count
+                self.dropped = 0
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Error sending to client {self.websocket.remote_address}: {str(e)}")
+        finally:
+            self.closed = True
+            self.queue.clear()
+            self.chained.clear()
+
+    async def close(self) -> None:
+        """Stop the sender task and discard anything still queued."""
+        self.closed = True
+        self.queue.clear()
+        self.chained.clear()
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+class SessionTrack:
+    """Columnar in-memory live history of one session.
+
+    Numeric fields are kept in array('d') columns with per-point presence and
+    integer bitmasks, the timestamp as seconds since the epoch, the session
+    metadata once per distinct value and only the remaining per-point fields
+    as small dicts. Point dicts are materialized on access, at the JSON edge;
+    append, extend, len, indexing, slicing and iteration behave like the list
+    of point dicts this replaces. Dropped points stay in the columns before
+    head until they make up half of them, so trimming the oldest points
+    does not shift every column each time.
+    """
+
+    __slots__ = ('presence', 'integers', 'columns', 'timestamps',
+                 'metadata', 'metadata_indexes', 'extras',
+                 'ordered', 'oldest_timestamp', 'head',
+                 'packed_date', 'packed_date_seconds')
+
+    TIMESTAMP_FORMAT = '%d-%m-%Y %H:%M:%S'
+    EPOCH = datetime.datetime(1970, 1, 1)
+    EPOCH_ORDINAL = EPOCH.toordinal()
+    FIELD_BITS = {field: bit for bit, field in enumerate(CACHED_POINT_NUMERIC_FIELDS)}
+
+    def __init__(self, tracking_points=()):
+        self.presence = array('Q')
+        self.integers = array('Q')
+        self.columns: Dict[str, array] = {}
+        # NaN when the timestamp could not be packed and is kept in extras
+        self.timestamps = array('d')
+        self.metadata: List[Dict[str, Any]] = []
+        self.metadata_indexes = array('I')
+        self.extras: List[Optional[Dict[str, Any]]] = []
+        # While every timestamp is packed and non-decreasing, expired points
+        # are a prefix found by bisection.
+        self.ordered = True
+        self.oldest_timestamp = float('inf')
+        self.head = 0  # column position of the first point
+        # Points of a session share their date, so it is parsed once
+        self.packed_date = ''
+        self.packed_date_seconds = 0.0
+        self.extend(tracking_points)
+
+    def __len__(self) -> int:
+        return len(self.presence) - self.head
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.point(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.point(position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("session track index out of range")
+        return self.point(index)
+
+    def append(self, tracking_point: Dict[str, Any]) -> None:
+        presence = 0
+        integers = 0
+        metadata = {}
+        values = {}
+        extras = {}
+        for field, value in tracking_point.items():
+            if field in SESSION_METADATA_FIELDS:
+                metadata[field] = value
+                continue
+            bit = self.FIELD_BITS.get(field)
+            if (bit is None or isinstance(value, bool) or not isinstance(value, (int, float))
+                    or isinstance(value, int) and not -2**53 <= value <= 2**53):
+                extras[field] = value
+                continue
+            presence |= 1 << bit
+            if isinstance(value, int):
+                integers |= 1 << bit
+            values[field] = value
+
+        timestamp = self.pack_timestamp(extras.get('timestamp'))
+        if timestamp == timestamp:
+            del extras['timestamp']
+            self.oldest_timestamp = min(self.oldest_timestamp, timestamp)
+        if not timestamp >= (self.timestamps[-1] if len(self) else timestamp):
+            # NaN compares false as well
+            self.ordered = False
+
+        count = len(self.presence)
+        for field in values:
+            if field not in self.columns:
+                self.columns[field] = array('d', bytes(8 * count))
+        for field, column in self.columns.items():
+            column.append(values.get(field, 0.0))
+
+        if not self.metadata or self.metadata[-1] != metadata:
+            self.metadata.append(metadata)
+        self.metadata_indexes.append(len(self.metadata) - 1)
+        self.presence.append(presence)
+        self.integers.append(integers)
+        self.timestamps.append(timestamp)
+        self.extras.append(extras or None)
+
+    def extend(self, tracking_points) -> None:
+        for tracking_point in tracking_points:
+            self.append(tracking_point)
+
+    def pack_timestamp(self, timestamp) -> float:
+        """Seconds since the epoch, or NaN if the string would not format back identically.
+
+        Only the zero-padded 'dd-mm-yyyy HH:MM:SS' form formats back, so it
+        is parsed by position instead of with strptime.
+        """
+        if (not isinstance(timestamp, str) or len(timestamp) != 19 or not timestamp.isascii()
+                or timestamp[2] != '-' or timestamp[5] != '-' or timestamp[10] != ' '
+                or timestamp[13] != ':' or timestamp[16] != ':'):
+            return float('nan')
+        date = timestamp[:10]
+        if date != self.packed_date:
+            day, month, year = date[:2], date[3:5], date[6:]
+            if not (day.isdigit() and month.isdigit() and year.isdigit()) or year < '1000':
+                return float('nan')
+            try:
+                ordinal = datetime.date(int(year), int(month), int(day)).toordinal()
+            except ValueError:
+                return float('nan')
+            self.packed_date = date
+            self.packed_date_seconds = (ordinal - self.EPOCH_ORDINAL) * 86400.0
+        hours, minutes, seconds = timestamp[11:13], timestamp[14:16], timestamp[17:]
+        if (not (hours.isdigit() and minutes.isdigit() and seconds.isdigit())
+                or hours > '23' or minutes > '59' or seconds > '59'):
+            return float('nan')
+        return self.packed_date_seconds + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+    def point(self, index: int) -> Dict[str, Any]:
+        """Materialize the point dict at index."""
+        index += self.head
+        tracking_point = dict(self.metadata[self.metadata_indexes[index]])
+        timestamp = self.timestamps[index]
+        if timestamp == timestamp:
+            tracking_point['timestamp'] = (
+                self.EPOCH + datetime.timedelta(seconds=timestamp)
+            ).strftime(self.TIMESTAMP_FORMAT)
+        presence = self.presence[index]
+        integers = self.integers[index]
+        for field, column in self.columns.items():
+            bit = self.FIELD_BITS[field]
+            if presence >> bit & 1:
+                value = column[index]
+                tracking_point[field] = int(value) if integers >> bit & 1 else value
+        extras = self.extras[index]
+        if extras:
+            tracking_point.update(extras)
+        return tracking_point
+
+    def value(self, field: str, default: Any = None, index: int = -1) -> Any:
+        """Read one field of one point without materializing it."""
+        if index < 0:
+            index += len(self)
+        position = self.head + index
+        if field in SESSION_METADATA_FIELDS:
+            return self.metadata[self.metadata_indexes[position]].get(field, default)
+        bit = self.FIELD_BITS.get(field)
+        if bit is not None and self.presence[position] >> bit & 1:
+            value = self.columns[field][position]
+            return int(value) if self.integers[position] >> bit & 1 else value
+        if field == 'timestamp' and self.timestamps[position] == self.timestamps[position]:
+            return self.point(index)['timestamp']
+        extras = self.extras[position]
+        return extras.get(field, default) if extras else default
+
+    def trim_before(self, cutoff: datetime.datetime) -> int:
+        """Drop points older than cutoff and return how many were dropped.
+
+        Points whose timestamp cannot be parsed are kept.
+        """
+        cutoff_seconds = (cutoff - self.EPOCH).total_seconds()
+        if self.ordered:
+            removed = bisect_left(self.timestamps, cutoff_seconds, self.head) - self.head
+            if removed:
+                self.drop_oldest(removed)
+            return removed
+
+        keep = []
+        for position in range(self.head, len(self.timestamps)):
+            timestamp = self.timestamps[position]
+            if timestamp != timestamp:
+                timestamp = self.extras_timestamp(position)
+            if not timestamp < cutoff_seconds:
+                keep.append(position)
+
+        removed = len(self) - len(keep)
+        if not removed:
+            return 0
+        if not keep or keep[0] == self.head + removed:
+            # Expired points are normally a prefix in arrival order
+            self.drop_oldest(removed)
+        else:
+            self.select(keep)
+        return removed
+
+    def extras_timestamp(self, position: int) -> float:
+        extras = self.extras[position]
+        try:
+            parsed = datetime.datetime.strptime(extras['timestamp'], self.TIMESTAMP_FORMAT)
+        except (TypeError, KeyError, ValueError):
+            return float('nan')
+        return (parsed - self.EPOCH).total_seconds()
+
+    def drop_oldest(self, count: int) -> None:
+        """Drop the first count points (the tail of the retention ring)."""
+        count = min(count, len(self))
+        for position in range(self.head, self.head + count):
+            self.extras[position] = None
+        self.head += count
+        if self.head * 2 >= len(self.presence):
+            self.compact()
+        self.update_order()
+
+    def compact(self) -> None:
+        """Remove the dropped points before head from the columns."""
+        for column in (self.presence, self.integers, self.timestamps,
+                       self.metadata_indexes, *self.columns.values()):
+            del column[:self.head]
+        del self.extras[:self.head]
+        self.head = 0
+
+    def select(self, positions: List[int]) -> None:
+        """Keep only the points at the given ascending column positions."""
+        self.presence = array('Q', (self.presence[i] for i in positions))
+        self.integers = array('Q', (self.integers[i] for i in positions))
+        self.timestamps = array('d', (self.timestamps[i] for i in positions))
+        self.metadata_indexes = array('I', (self.metadata_indexes[i] for i in positions))
+        self.columns = {
+            field: array('d', (column[i] for i in positions))
+            for field, column in self.columns.items()
+        }
+        self.extras = [self.extras[i] for i in positions]
+        self.head = 0
+        self.update_order()
+
+    def update_order(self) -> None:
+        """Recompute ordered and oldest_timestamp after points were dropped."""
+        if self.ordered:
+            self.oldest_timestamp = self.timestamps[self.head] if len(self) else float('inf')
+            return
+        packed = [timestamp for timestamp in self.timestamps[self.head:] if timestamp == timestamp]
+        self.oldest_timestamp = min(packed, default=float('inf'))
+        self.ordered = len(packed) == len(self) and all(
+            earlier <= later for earlier, later in zip(packed, packed[1:])
+        )
+
+
+class HistorySnapshot:
+    """Generation-versioned, pre-serialized view of the in-memory live window.
+
+    Every change to the live history bumps the generation. request_history
+    batches are cut per session into fixed-size chunks; a full chunk never
+    changes while points are only appended, so its payload is reused until
+    the session is trimmed or deleted, and only a session's trailing chunk is
+    re-serialized after that session changed. Payloads are kept per wire
+    format in an LRU bounded by max_bytes. Small per-generation values such as
+    the session list are cached alongside.
+    """
+
+    def __init__(self, chunk_size: int, max_bytes: int):
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self.session_generations: Dict[str, int] = {}
+        # (session_id, chunk_index, wire_format) -> (session generation, complete, payload)
+        self.payloads: OrderedDict = OrderedDict()
+        self.session_payload_keys: DefaultDict[str, Set[tuple]] = defaultdict(set)
+        self.cached_bytes = 0
+        self.generation_values: Dict[str, tuple] = {}
+
+    def touch(self, session_id: str) -> None:
+        """Record that points were appended to a session."""
+        self.generation += 1
+        self.session_generations[session_id] = self.generation
+
+    def bump(self) -> None:
+        """Record a change that is not tied to one session's points."""
+        self.generation += 1
+
+    def invalidate(self, session_id: str) -> None:
+        """Forget the payloads of a session whose points were trimmed or removed."""
+        for key in self.session_payload_keys.pop(session_id, ()):
+            entry = self.payloads.pop(key, None)
+            if entry is not None:
+                self.cached_bytes -= len(entry[2])
+        self.touch(session_id)
+
+    def reset(self) -> None:
+        """Forget everything, e.g. after the live history was reloaded."""
+        self.payloads.clear()
+        self.session_payload_keys.clear()
+        self.session_generations.clear()
+        self.generation_values.clear()
+        self.cached_bytes = 0
+        self.generation += 1
+
+    def session_payloads(self, session_id: str, points: List[Dict[str, Any]], wire_format: str) -> List[Any]:
+        """Return the serialized history_batch frames of one session."""
+        session_generation = self.session_generations.get(session_id, 0)
+        full_chunks = len(points) // self.chunk_size
+        chunk_count = -(-len(points) // self.chunk_size)
+
+        payloads = []
+        for chunk_index in range(chunk_count):
+            key = (session_id, chunk_index, wire_format)
+            entry = self.payloads.get(key)
+            if entry is not None and (entry[1] or entry[0] == session_generation):
+                self.payloads.move_to_end(key)
+                payloads.append(entry[2])
+                continue
+
+            start = chunk_index * self.chunk_size
+            payload = encode_message({
+                'type': 'history_batch',
+                'points': points[start:start + self.chunk_size]
+            }, wire_format)
+            if entry is not None:
+                self.cached_bytes -= len(entry[2])
+            self.payloads[key] = (session_generation, chunk_index < full_chunks, payload)
+            self.payloads.move_to_end(key)
+            self.session_payload_keys[session_id].add(key)
+            self.cached_bytes += len(payload)
+            payloads.append(payload)
+
+        while self.cached_bytes > self.max_bytes and self.payloads:
+            evicted_key, (_, _, evicted_payload) = self.payloads.popitem(last=False)
+            self.session_payload_keys[evicted_key[0]].discard(evicted_key)
+            self.cached_bytes -= len(evicted_payload)
+        return payloads
+
+    def cached_value(self, name: str):
+        """Return a value cached for the current generation, or None."""
+        entry = self.generation_values.get(name)
+        if entry is not None and entry[0] == self.generation:
+            return entry[1]
+        return None
+
+    def store_value(self, name: str, value: Any, generation: int) -> None:
+        self.generation_values[name] = (generation, value)
+
+
+class PositionBoard:
+    """Latest position of every active session in a fixed-layout shared-memory table.
+
+    One process writes the board; any process on the host can attach by
+    name and read it without locks. Every slot starts with a counter that
+    is odd while the slot is written (a seqlock), so readers retry torn reads.
+    """
+
+    MAGIC = b'GTPB'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHI')  # magic, version, slot size, slot count
+    SEQUENCE = struct.Struct('<I')
+    SESSION_ID_SIZE = 96
+    # session id, latitude, longitude, speed, distance, heart rate, last seen
+    RECORD = struct.Struct(f'<{SESSION_ID_SIZE}sdddddd')
+    SLOT_SIZE = SEQUENCE.size + RECORD.size
+    READ_ATTEMPTS = 100
+
+    def __init__(self, memory: shared_memory.SharedMemory, owner: bool):
+        self.memory = memory
+        self.owner = owner
+        magic, version, slot_size, self.capacity = self.HEADER.unpack_from(memory.buf, 0)
+        if magic != self.MAGIC or version != self.VERSION or slot_size != self.SLOT_SIZE:
+            raise ValueError(f"Shared memory {memory.name} is not a version {self.VERSION} position board")
+        self.slots: Dict[str, int] = {}
+        self.free_slots: List[int] = []
+        self.index_slots()
+        self.full_logged = False
+
+    def index_slots(self) -> None:
+        """Rebuild the writer-side index of occupied and free slots from the table."""
+        self.slots = {
+            record['sessionId']: slot for slot, record in self.records() if record['sessionId']
+        }
+        used_slots = set(self.slots.values())
+        self.free_slots = [slot for slot in reversed(range(self.capacity)) if slot not in used_slots]
+
+    def take_over(self) -> None:
+        """Become the writer after the previous one exited, possibly in the middle of a write."""
+        for slot in range(self.capacity):
+            if self.SEQUENCE.unpack_from(self.memory.buf, self.offset(slot))[0] & 1:
+                # Torn slot: clear it, which also makes its counter even again
+                self.write(slot, (b'', math.nan, math.nan, math.nan, math.nan, math.nan, 0.0))
+        self.index_slots()
+        self.full_logged = False
+
+    @classmethod
+    def create(cls, name: str, capacity: int) -> 'PositionBoard':
+        """Create the board, replacing one left behind by a process that crashed."""
+        size = cls.HEADER.size + capacity * cls.SLOT_SIZE
+        try:
+            memory = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            memory = shared_memory.SharedMemory(name, create=True, size=size)
+        memory.buf[:size] = bytes(size)
+        cls.HEADER.pack_into(memory.buf, 0, cls.MAGIC, cls.VERSION, cls.SLOT_SIZE, capacity)
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> 'PositionBoard':
+        """Attach to a board created by another process."""
+        memory = shared_memory.SharedMemory(name)
+        # The creator unlinks it; Python would do so when this process exits
+        resource_tracker.unregister(memory._name, 'shared_memory')
+        return cls(memory, owner=False)
+
+    def offset(self, slot: int) -> int:
+        return self.HEADER.size + slot * self.SLOT_SIZE
+
+    def write(self, slot: int, values: tuple) -> None:
+        offset = self.offset(slot)
+        # Odd while written, also when a previous writer died half-way
+        sequence = self.SEQUENCE.unpack_from(self.memory.buf, offset)[0] | 1
+        self.SEQUENCE.pack_into(self.memory.buf, offset, sequence)
+        self.RECORD.pack_into(self.memory.buf, offset + self.SEQUENCE.size, *values)
+        self.SEQUENCE.pack_into(self.memory.buf, offset, (sequence + 1) & 0xFFFFFFFF)
+
+    def update(self, session_id: str, tracking_point: Dict[str, Any], last_seen: float) -> bool:
+        """Write the latest point of a session; False if it has no slot."""
+        encoded_id = session_id.encode('utf-8')
+        slot = self.slots.get(session_id)
+        if slot is None:
+            if len(encoded_id) > self.SESSION_ID_SIZE or not self.free_slots:
+                if not self.full_logged:
+                    logging.warning(f"Position board has no slot for session {session_id}")
+                    self.full_logged = True
+                return False
+            slot = self.free_slots.pop()
+            self.slots[session_id] = slot
+
+        def number(field: str) -> float:
+            value = tracking_point.get(field)
+            try:
+                return float(value) if value is not None else math.nan
+            except (TypeError, ValueError):
+                return math.nan
+
+        self.write(slot, (
+            encoded_id,
+            number('latitude'),
+            number('longitude'),
+            number('currentSpeed'),
+            number('distance'),
+            number('heartRate'),
+            last_seen
+        ))
+        return True
+
+    def release(self, session_id: str) -> None:
+        """Clear the slot of a session that is no longer active."""
+        slot = self.slots.pop(session_id, None)
+        if slot is not None:
+            self.write(slot, (b'', math.nan, math.nan, math.nan, math.nan, math.nan, 0.0))
+            self.free_slots.append(slot)
+            self.full_logged = False
+
+    def records(self):
+        """Yield (slot, record) for every slot, retrying slots that change while read."""
+        buf = self.memory.buf
+        for slot in range(self.capacity):
+            offset = self.offset(slot)
+            for _ in range(self.READ_ATTEMPTS):
+                before = self.SEQUENCE.unpack_from(buf, offset)[0]
+                if before & 1:
+                    continue
+                values = self.RECORD.unpack_from(buf, offset + self.SEQUENCE.size)
+                if self.SEQUENCE.unpack_from(buf, offset)[0] == before:
+                    break
+            else:
+                # The writer died in the middle of this slot
+                continue
+
+            encoded_id, latitude, longitude, speed, distance, heart_rate, last_seen = (
+                None if isinstance(value, float) and math.isnan(value) else value for value in values
+            )
+            yield slot, {
+                'sessionId': encoded_id.rstrip(b'\0').decode('utf-8', 'replace'),
+                'latitude': latitude,
+                'longitude': longitude,
+                'currentSpeed': speed,
+                'distance': distance,
+                'heartRate': int(heart_rate) if heart_rate is not None else None,
+                'lastSeen': last_seen
+            }
+
+    def positions(self, max_age_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Return the occupied slots, optionally only those seen recently."""
+        oldest = time.time() - max_age_seconds if max_age_seconds is not None else 0.0
+        return [record for _, record in self.records()
+                if record['sessionId'] and record['lastSeen'] >= oldest]
+
+    def close(self) -> None:
+        """Detach from the board; the creating process also removes it."""
+        self.memory.close()
+        if self.owner:
+            try:
+                self.memory.unlink()
+            except FileNotFoundError:
+                pass
+
+class PointSpool:
+    """Append-only segment files for batches that could not go to PostgreSQL.
+
+    A record is one batch: payload length and CRC32, then the points as
+    JSON. Appends are fsync'd before they return. Replay reads the oldest
+    segment through mmap and stops at a torn tail left by a crash. How far
+    the oldest segment is replayed is kept in replay.offset, so a restart
+    continues after the last batch that was written to PostgreSQL. Batches
+    that can never be stored are moved to segments in rejected/.
+    """
+
+    RECORD_HEADER = struct.Struct('<II')
+    # Segment number and byte offset of the replay position
+    REPLAY_OFFSET = struct.Struct('<QQ')
+
+    def __init__(self, directory: str, segment_bytes: int):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        # Appends run in a thread so fsync does not block the event loop
+        self.lock = threading.Lock()
+        self.segments = sorted(
+            int(name.split('.')[0]) for name in os.listdir(directory)
+            if name.endswith('.spool') and name.split('.')[0].isdigit()
+        )
+        self.active_fd: Optional[int] = None
+        self.active_segment: Optional[int] = None
+        self.active_size = 0
+        self.offset_path = os.path.join(directory, 'replay.offset')
+        self.offset_segment = 0  # segment replay.offset refers to; numbers are never reused below it
+        self.replay_offset = self.load_replay_offset()  # into the oldest segment
+        # Number kept free for a batch whose outcome is not known yet
+        self.reserved_segment: Optional[int] = None
+        self.rejected: Optional['PointSpool'] = None
+
+    def load_replay_offset(self) -> int:
+        try:
+            with open(self.offset_path, 'rb') as offset_file:
+                self.offset_segment, offset = self.REPLAY_OFFSET.unpack(offset_file.read())
+        except (OSError, struct.error):
+            return 0
+        return offset if self.segments and self.segments[0] == self.offset_segment else 0
+
+    def segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{segment:012d}.spool")
+
+    def pending(self) -> bool:
+        """Whether spooled batches are waiting for replay."""
+        with self.lock:
+            return bool(self.segments)
+
+    def append(self, points: List[Dict[str, Any]]) -> None:
+        """Durably append one batch, starting a new segment when the current one is full."""
+        payload = json.dumps(points).encode('utf-8')
+        record = self.RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self.lock:
+            if self.active_fd is None or self.active_size >= self.segment_bytes:
+                self.open_segment()
+            os.write(self.active_fd, record)
+            os.fsync(self.active_fd)
+            self.active_size += len(record)
+
+    def next_segment(self) -> int:
+        return max(self.segments[-1] if self.segments else 0, self.offset_segment,
+                   self.reserved_segment or 0) + 1
+
+    def sync_directory(self) -> None:
+        # Make new files themselves survive a crash
+        directory_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+
+    def open_segment(self) -> None:
+        self.close_active()
+        segment = self.next_segment()
+        self.active_fd = os.open(self.segment_path(segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.sync_directory()
+        self.segments.append(segment)
+        self.active_segment = segment
+        self.active_size = 0
+
+    def reserve(self) -> int:
+        """Keep a segment number free in front of every later append, for append_reserved()."""
+        with self.lock:
+            self.close_active()
+            self.reserved_segment = self.next_segment()
+            return self.reserved_segment
+
+    def append_reserved(self, segment: int, points: List[Dict[str, Any]]) -> None:
+        """Durably write one batch into a reserved segment, so it replays in its original place."""
+        payload = json.dumps(points).encode('utf-8')
+        record = self.RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self.lock:
+            segment_fd = os.open(self.segment_path(segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(segment_fd, record)
+                os.fsync(segment_fd)
+            finally:
+                os.close(segment_fd)
+            self.sync_directory()
+            insort(self.segments, segment)
+            if self.reserved_segment == segment:
+                self.reserved_segment = None
+
+    def release(self, segment: int) -> None:
+        """Give up a reservation whose batch did reach PostgreSQL."""
+        with self.lock:
+            if self.reserved_segment == segment:
+                self.reserved_segment = None
+
+    def reject(self, points: List[Dict[str, Any]]) -> None:
+        """Keep a batch that can never be stored in rejected/ instead of discarding it."""
+        if self.rejected is None:
+            self.rejected = PointSpool(os.path.join(self.directory, 'rejected'), self.segment_bytes)
+        self.rejected.append(points)
+
+    def close_active(self) -> None:
+        if self.active_fd is not None:
+            os.close(self.active_fd)
+        self.active_fd = None
+        self.active_segment = None
+
+    def oldest_segment(self) -> Optional[int]:
+        """Return the segment to replay next, sealing it if batches are still appended to it."""
+        with self.lock:
+            if not self.segments:
+                return None
+            if self.segments[0] == self.active_segment:
+                self.close_active()
+            return self.segments[0]
+
+    def iter_records(self, segment: int):
+        """Yield (end_offset, points) for the records of a sealed segment after replay_offset."""
+        with open(self.segment_path(segment), 'rb') as segment_file:
+            size = os.fstat(segment_file.fileno()).st_size
+            if size <= self.replay_offset:
+                return
+            with mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                offset = self.replay_offset
+                while offset + self.RECORD_HEADER.size <= size:
+                    length, checksum = self.RECORD_HEADER.unpack_from(view, offset)
+                    end = offset + self.RECORD_HEADER.size + length
+                    payload = view[offset + self.RECORD_HEADER.size:end]
+                    if end > size or zlib.crc32(payload) != checksum:
+                        break
+                    yield end, json.loads(payload)
+                    offset = end
+
+                if offset < size:
+                    logging.warning(f"Spool segment {segment} ends with {size - offset} unreadable bytes")
+
+    def consumed(self, end_offset: int) -> None:
+        """Durably record that the oldest segment is replayed up to end_offset."""
+        with self.lock:
+            segment = self.segments[0]
+            offset_fd = os.open(self.offset_path, os.O_WRONLY | os.O_CREAT, 0o644)
+            try:
+                os.pwrite(offset_fd, self.REPLAY_OFFSET.pack(segment, end_offset), 0)
+                os.fsync(offset_fd)
+            finally:
+                os.close(offset_fd)
+            self.offset_segment = segment
+            self.replay_offset = end_offset
+
+    def remove(self, segment: int) -> None:
+        """Delete a fully replayed segment."""
+        with self.lock:
+            os.remove(self.segment_path(segment))
+            self.segments.remove(segment)
+            self.replay_offset = 0
+
+    def close(self) -> None:
+        with self.lock:
+            self.close_active()
+        if self.rejected is not None:
+            self.rejected.close()
+
 class TrackingServer:
     def __init__(self):
         self.connected_clients: Set[websockets.WebSocketServerProtocol] = set()
-        self.tracking_history: DefaultDict[str, List[Dict[str, Any]]] = defaultdict(list)
-        self.active_sessions: Set[str] = set()  # Track active recording sessions
-        self.last_activity: Dict[str, datetime.datetime] = {}  # Track when each session was last updated
+        self.tracking_history: DefaultDict[str, SessionTrack] = defaultdict(SessionTrack)
         self.activity_timeout = 60  # Consider a session inactive after this many seconds without updates
+        # Expiry heap of (deadline, session_id) for active sessions, checked
+        # by a loop timer armed for the earliest deadline. activity_deadlines
+        # holds the scheduled deadline of each session; other entries are stale.
+        self.activity_heap: List[tuple] = []
+        self.activity_deadlines: Dict[str, datetime.datetime] = {}
+        self.activity_timer: Optional[asyncio.TimerHandle] = None
+        # Called with the list of sessions that just became inactive;
+        # coroutine results are scheduled on the running loop.
+        self.session_inactive_listeners: List[Any] = [
+            self.finalize_inactive_sessions,
+            self.broadcast_inactive_sessions,
+            self.release_board_positions,
+        ]
         self.timestamp_format = '%d-%m-%Y %H:%M:%S'
         self.batch_size = 100
-
-        # Add session reset detector
-        self.session_detector = SessionResetDetector()
-
-        # Track last known lap per session for server-side lap detection.
-        # The app sends 'lap' in every tracking message. When the server detects
-        # that lap increased, it auto-creates lap_times records as a fallback in
-        # case the app's own lap-time saving (syncLapFromMetrics) fails.
-        self.session_last_lap: Dict[str, int] = {}
-        # Track the timestamp when each lap started (used for auto-generated lap times)
-        self.session_lap_start_time: Dict[str, int] = {}
+        # Redis is read in score-ordered pages when the live history is loaded
+        self.history_page_size = int(os.getenv('HISTORY_PAGE_SIZE', '2000'))
+        # request_history and request_sessions are served from a generation-
+        # versioned snapshot of the in-memory live window; history_batch
+        # frames are pre-serialized per chunk and kept up to the byte budget.
+        self.history_snapshot = HistorySnapshot(
+            int(os.getenv('HISTORY_CHUNK_SIZE', '500')),
+            int(os.getenv('HISTORY_CACHE_MAX_MB', '64')) * 1024 * 1024
+        )
+        # Concurrent identical builds share one future (single-flight)
+        self.inflight_builds: Dict[Any, asyncio.Future] = {}
+        # Warm start: the server accepts connections while the live history
+        # is restored in the background. Sessions listed in Redis but not
+        # loaded yet map to their index entry and are hydrated on demand;
+        # Redis is only read up to restore_started_at, later points are live.
+        self.unhydrated_sessions: Dict[str, Dict[str, Any]] = {}
+        self.restore_started_at = 0.0
+        self.restore_concurrency = int(os.getenv('RESTORE_CONCURRENCY', '8'))
+        self.backfill_progress_seconds = int(os.getenv('BACKFILL_PROGRESS_SECONDS', '5'))
+        # Optional cap on the in-memory points of one session (0 = bounded
+        # by the retention window only); the oldest tenth is dropped at once.
+        self.live_session_max_points = int(os.getenv('LIVE_SESSION_MAX_POINTS', '0'))
+        # Min-heap of (oldest point epoch, session_id) so that cleanup only
+        # touches sessions with expired points. retention_keys holds the
+        # current key of each session; heap entries that differ are stale.
+        self.retention_heap: List[tuple] = []
+        self.retention_keys: Dict[str, float] = {}
+
+        # Lap times of active sessions for follower updates: loaded from
+        # PostgreSQL once, updated in place when laps are committed and
+        # evicted when the session goes inactive.
+        self.lap_cache: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self.lap_cache_writes: Dict[str, int] = {}
 
         # CONFIGURABLE CLEANUP SETTINGS
         # Data retention period in hours - configurable via environment variable or script modification
         self.data_retention_hours = int(os.getenv('DATA_RETENTION_HOURS', '48'))  # Default: 48 hours
 
+        # Per-session live state (activity, server-side lap detection, reset
+        # detection). The app sends 'lap' in every tracking message; when the
+        # server detects that lap increased, it auto-creates lap_times records
+        # as a fallback in case the app's own lap-time saving fails.
+        # Inactive sessions are evicted after SESSION_STATE_TTL_HOURS or when
+        # more than SESSION_STATE_MAX sessions are held.
+        self.sessions = SessionRegistry(
+            int(os.getenv('SESSION_STATE_TTL_HOURS', str(self.data_retention_hours))) * 3600,
+            int(os.getenv('SESSION_STATE_MAX', '50000'))
+        )
+        self.active_sessions: Set[str] = self.sessions.active  # Track active recording sessions
+
+        # Add session reset detector
+        self.session_detector = SessionResetDetector(self.sessions)
+
+        # Replay rejection: points may carry a 'seq' that increases per
+        # sessionId, and a 'seqEpoch' that changes with every run of the app.
+        # The last SEQ_DEDUPE_WINDOW numbers of every session are remembered
+        # and resent points are dropped before reset detection, persistence
+        # and broadcast. 0 disables the window; the unique
+        # (session_id, seq_epoch, seq) index still rejects duplicates in PostgreSQL.
+        self.seq_dedupe_window = int(os.getenv('SEQ_DEDUPE_WINDOW', '4096'))
+        self.replayed_points_rejected = 0
+
         # Cleanup interval in seconds - how often to run cleanup
         self.cleanup_interval_seconds = int(os.getenv('CLEANUP_INTERVAL_SECONDS', '60'))  # Default: 1 hour
 
@@ -147,16 +1581,162 @@ class TrackingServer:
         self.client_following: Dict[websockets.WebSocketServerProtocol, Set[str]] = {}  # client -> set of session_ids
         self.session_followers: DefaultDict[str, Set[websockets.WebSocketServerProtocol]] = defaultdict(set)  # session_id -> set of clients
 
+        # Topic subscriptions for live point updates. Topics are
+        # 'session:<sessionId>', 'event:<eventName>', 'sport:<sportType>' and
+        # 'firehose'. Clients start on the firehose so older viewers keep
+        # receiving every update until they send a 'subscribe' message.
+        self.client_topics: Dict[websockets.WebSocketServerProtocol, Set[str]] = {}  # client -> set of topics
+        self.topic_subscribers: DefaultDict[str, Set[websockets.WebSocketServerProtocol]] = defaultdict(set)  # topic -> set of clients
+
+        # Broadcast fan-out: every client gets a bounded outbound queue that a
+        # per-connection task drains, so broadcasts serialize a message once
+        # and never wait for an individual viewer.
+        self.client_outboxes: Dict[websockets.WebSocketServerProtocol, ClientOutbox] = {}
+        self.outbound_queue_size = int(os.getenv('OUTBOUND_QUEUE_SIZE', '256'))
+        self.slow_consumer_policy = os.getenv('SLOW_CONSUMER_POLICY', 'drop_oldest').lower()  # 'drop_oldest' or 'disconnect'
+        self.slow_consumer_disconnect_after = int(os.getenv('SLOW_CONSUMER_DISCONNECT_AFTER', '1024'))
+
+        # Delta-encoded live updates for clients that opt in with
+        # {'type': 'subscribe', 'delta': true}
+        self.delta_encoder = DeltaEncoder(int(os.getenv('DELTA_KEYFRAME_INTERVAL', '60')))
+
+        # Broadcast tick: 0 sends every point right away; otherwise only the
+        # latest point per session is sent to viewers once per tick, and the
+        # session list / active users broadcasts are coalesced on the same tick.
+        # Persistence and Redis history still receive every point.
+        self.broadcast_tick_ms = int(os.getenv('BROADCAST_TICK_MS', '0'))
+        self.broadcast_ticker: Optional[asyncio.Task] = None
+        self.pending_points: Dict[str, Dict[str, Any]] = {}
+        self.pending_followed_updates: Dict[str, Dict[str, Any]] = {}
+        self.pending_broadcasts: Set[str] = set()
+
         # Database connection pool
         self.db_pool: Optional[asyncpg.Pool] = None
 
+        # Write-behind persistence: handle_client queues valid points and a
+        # background writer flushes them to PostgreSQL every N points or M ms.
+        self.persistence_batch_size = int(os.getenv('PERSISTENCE_BATCH_SIZE', '200'))
+        self.persistence_flush_interval_ms = int(os.getenv('PERSISTENCE_FLUSH_INTERVAL_MS', '250'))
+        self.persistence_queue_size = int(os.getenv('PERSISTENCE_QUEUE_SIZE', '10000'))
+        self.persistence_queue: Optional[asyncio.Queue] = None
+        self.persistence_writer: Optional[asyncio.Task] = None
+
+        # Local spool: batches that PostgreSQL rejects go to fsync'd segment
+        # files in SPOOL_DIR and are replayed in order once the database is
+        # back. A transaction that misses the latency budget is left to
+        # finish (slow_save) while newer batches are spooled; its own batch
+        # is only spooled if it turns out not to have committed.
+        self.spool_dir = os.getenv('SPOOL_DIR', '')
+        self.spool_segment_bytes = int(os.getenv('SPOOL_SEGMENT_BYTES', str(16 * 1024 * 1024)))
+        self.spool_replay_interval_ms = int(os.getenv('SPOOL_REPLAY_INTERVAL_MS', '5000'))
+        self.persistence_latency_budget_ms = int(os.getenv('PERSISTENCE_LATENCY_BUDGET_MS', '2000'))
+        # A spooled batch that fails while PostgreSQL is up is retried with
+        # exponential backoff and moved to rejected/ after SPOOL_MAX_ATTEMPTS
+        self.spool_max_attempts = int(os.getenv('SPOOL_MAX_ATTEMPTS', '5'))
+        self.spool_attempts = 0
+        self.spool_retry_at = 0.0
+        self.spool: Optional[PointSpool] = None
+        self.spool_replayer: Optional[asyncio.Task] = None
+        self.spool_stopping: Optional[asyncio.Event] = None
+        self.slow_save: Optional[asyncio.Task] = None
+
+        # Redis write coalescing: live points are queued without waiting and a
+        # background writer pipelines them for all sessions every few ms.
+        # Unlike PostgreSQL, Redis never applies backpressure: when the queue
+        # is full the point is only missing from the live cache.
+        self.redis_write_batch_size = int(os.getenv('REDIS_WRITE_BATCH_SIZE', '500'))
+        self.redis_write_flush_interval_ms = int(os.getenv('REDIS_WRITE_FLUSH_INTERVAL_MS', '20'))
+        self.redis_write_queue_size = int(os.getenv('REDIS_WRITE_QUEUE_SIZE', '10000'))
+        self.redis_write_max_retries = int(os.getenv('REDIS_WRITE_MAX_RETRIES', '3'))
+        self.redis_write_retry_backoff_ms = int(os.getenv('REDIS_WRITE_RETRY_BACKOFF_MS', '100'))
+        self.redis_write_queue: Optional[asyncio.Queue] = None
+        self.redis_writer: Optional[asyncio.Task] = None
+        self.redis_write_metrics = {
+            'queued': 0,
+            'written': 0,
+            'batches': 0,
+            'retries': 0,
+            'failed': 0,
+            'dropped': 0
+        }
+
+        # Identity cache for the ingest path. Users, sessions and heart-rate
+        # devices almost never change during a run, so their IDs and the last
+        # session metadata written are kept here and PostgreSQL is only
+        # touched on a cache miss or an actual change.
+        identity_cache_ttl = int(os.getenv('IDENTITY_CACHE_TTL_SECONDS', '3600'))
+        identity_cache_size = int(os.getenv('IDENTITY_CACHE_MAX_ENTRIES', '10000'))
+        self.user_cache = TTLCache(identity_cache_size, identity_cache_ttl)  # (firstname, lastname, birthdate) -> (user_id, (height, weight, bmi))
+        self.session_cache = TTLCache(identity_cache_size, identity_cache_ttl)  # session_id -> last written session metadata
+        self.heart_rate_device_cache = TTLCache(identity_cache_size, identity_cache_ttl)  # device_name -> device_id
+
         # Redis stores the recent live-view history. PostgreSQL remains the
         # permanent source for analysis and historical pages.
         self.redis_client: Optional[redis.Redis] = None
+        # Every session has its own sorted set of points; a hash indexes the
+        # sessions with their latest metadata and last-seen time. The former
+        # single global sorted set is only read once, to migrate it.
+        self.redis_key_prefix = os.getenv('REDIS_LIVE_KEY_PREFIX', 'geotracker:live')
+        self.redis_session_index_key = f"{self.redis_key_prefix}:sessions"
+        self.redis_session_order_key = f"{self.redis_key_prefix}:sessions:first_seen"
+        # Set while a server prepares the live cache, so `backfill-redis`
+        # does not write the same points a second time; the TTL keeps a
+        # crashed server from blocking it forever.
+        self.redis_restore_key = f"{self.redis_key_prefix}:restoring"
+        self.redis_restore_ttl_seconds = 3600
         self.redis_history_key = os.getenv(
             'REDIS_HISTORY_KEY',
             'geotracker:live:tracking_points'
         )
+        # Points are stored with CachedPointCodec; the metadata they share is
+        # written once per session and metadata version.
+        self.cached_point_codec = CachedPointCodec()
+        self.redis_session_metadata: Dict[str, tuple] = {}  # session_id -> (version, metadata, json)
+
+        # Ingest stream: with PERSISTENCE_MODE=stream the server only appends
+        # validated points to a Redis Stream, and `persist-worker` processes
+        # write them to PostgreSQL through a consumer group. While Redis is
+        # unavailable points fall back to the in-process writer above.
+        # Sessions are split over INGEST_SHARDS streams by a hash of their ID
+        # and exactly one worker (INGEST_SHARD) persists each stream, so the
+        # points of a session keep their order and lap detection has one owner.
+        self.persistence_mode = os.getenv('PERSISTENCE_MODE', 'inline').lower()
+        self.ingest_shards = max(1, int(os.getenv('INGEST_SHARDS', '1')))
+        self.ingest_shard = int(os.getenv('INGEST_SHARD', '0'))
+        self.ingest_stream_key = self.ingest_shard_stream_key(self.ingest_shard)  # the one this worker reads
+        self.ingest_stream_maxlen = int(os.getenv('INGEST_STREAM_MAXLEN', '1000000'))  # approximate, in entries
+        self.ingest_group = os.getenv('INGEST_CONSUMER_GROUP', 'persistence')
+        # Stable per shard, so a restarted worker resumes its own pending entries first
+        self.ingest_consumer = os.getenv('INGEST_CONSUMER_NAME') or f"shard-{self.ingest_shard}"
+        self.ingest_claim_idle_ms = int(os.getenv('INGEST_CLAIM_IDLE_MS', '60000'))
+        self.ingest_retry_backoff_ms = int(os.getenv('INGEST_RETRY_BACKOFF_MS', '1000'))
+        # An entry that fails while PostgreSQL is up stays pending, and so do
+        # the later entries of its sessions, until it was delivered more than
+        # INGEST_MAX_DELIVERIES times; then it moves to the dead-letter stream
+        self.ingest_max_deliveries = int(os.getenv('INGEST_MAX_DELIVERIES', '5'))
+        self.ingest_dead_letter_key = f"{self.ingest_stream_key}:dead"
+        # Workers commit the laps, so they publish them for the servers' lap caches
+        self.lap_update_channel = f"{self.redis_key_prefix}:laps"
+        # Servers publish deleted session families so workers drop cached IDs
+        self.session_delete_channel = f"{self.redis_key_prefix}:deleted"
+        self.publish_lap_updates = False
+
+        # Multi-process serving: WEBSOCKET_WORKERS processes share port 6789
+        # (SO_REUSEPORT) and replicate their live state through Redis pub/sub,
+        # so every worker holds every session and can serve any client.
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.cluster_enabled = False
+        self.cluster_channel = f"{self.redis_key_prefix}:cluster"
+        self.pubsub_handlers: Dict[str, Any] = {}  # channel -> handler(data)
+        self.pubsub = None
+        self.pubsub_listener: Optional[asyncio.Task] = None
+
+        # Shared-memory board with the latest position of every active
+        # session, readable by any process on this host (see `positions`).
+        # Only one process writes it: the server, or worker 1 of several.
+        self.position_board_name = os.getenv('POSITION_BOARD_NAME', 'geotracker_positions')
+        self.position_board_slots = int(os.getenv('POSITION_BOARD_SLOTS', '4096'))
+        self.position_board: Optional[PositionBoard] = None
         self.redis_config = {
             'host': os.getenv('REDIS_HOST', 'redis'),
             'port': int(os.getenv('REDIS_PORT', '6379')),
@@ -221,41 +1801,40 @@ class TrackingServer:
 
             logging.info(f"Starting memory cleanup: removing data older than {cutoff_time.strftime(self.timestamp_format)} (retention: {self.data_retention_hours} hours)")
 
-            for session_id, points in self.tracking_history.items():
-                # Filter out old points
-                filtered_points = []
-                for point in points:
-                    try:
-                        # Parse timestamp from the point
-                        point_time = datetime.datetime.strptime(point['timestamp'], self.timestamp_format)
-
-                        if point_time >= cutoff_time:
-                            filtered_points.append(point)
-                        else:
-                            removed_points += 1
-                    except Exception as e:
-                        logging.warning(f"Error parsing timestamp for cleanup in session {session_id}: {e}")
-                        # Keep the point if we can't parse its timestamp
-                        filtered_points.append(point)
+            cutoff_seconds = (cutoff_time - SessionTrack.EPOCH).total_seconds()
+            while self.retention_heap and self.retention_heap[0][0] < cutoff_seconds:
+                oldest_timestamp, session_id = heapq.heappop(self.retention_heap)
+                if self.retention_keys.get(session_id) != oldest_timestamp:
+                    continue
+                del self.retention_keys[session_id]
 
-                # Update the session's points or mark for removal
-                if filtered_points:
-                    self.tracking_history[session_id] = filtered_points
+                track = self.tracking_history.get(session_id)
+                if track is None:
+                    continue
+                removed = track.trim_before(cutoff_time)
+                if removed:
+                    removed_points += removed
+                    self.history_snapshot.invalidate(session_id)
+                if track:
+                    self.schedule_retention(session_id)
                 else:
                     sessions_to_remove.append(session_id)
 
-            # Remove empty sessions from memory
+            # Remove empty tracks from memory. A session that is still active
+            # keeps its SessionState (sequence window, lap state) until it goes
+            # inactive or expires from the registry.
+            if sessions_to_remove:
+                self.update_active_sessions()
             for session_id in sessions_to_remove:
                 del self.tracking_history[session_id]
-                if session_id in self.last_activity:
-                    del self.last_activity[session_id]
-                # Clean up lap tracking state
-                self.session_last_lap.pop(session_id, None)
-                self.session_lap_start_time.pop(session_id, None)
-                # Don't remove from active_sessions if it's still actually active
-                if session_id in self.active_sessions:
-                    # Check if session is truly inactive before removing
-                    self.update_active_sessions()
+                if session_id not in self.active_sessions:
+                    self.delta_encoder.release(session_id)
+                    self.sessions.pop(session_id)
+                    self.evict_lap_times(session_id)
+
+            evicted_states = self.sessions.evict_expired()
+            if evicted_states:
+                logging.info(f"Evicted state of {len(evicted_states)} idle sessions")
 
             if removed_points > 0 or sessions_to_remove:
                 logging.info(f"Memory cleanup completed: removed {removed_points} old points and {len(sessions_to_remove)} empty sessions from memory")
@@ -285,18 +1864,22 @@ class TrackingServer:
             return {"success": False, "message": f"Live history cleanup failed: {str(e)}"}
 
     async def broadcast_session_list_update(self) -> None:
-        """Broadcast the Redis-backed live session list to all clients."""
+        """Broadcast the live session list to all clients, on the next tick if coalescing."""
+        if self.broadcast_ticker is not None:
+            self.pending_broadcasts.add('session_list')
+            return
+
+        await self.send_session_list_update()
+
+    async def send_session_list_update(self) -> None:
+        """Send the live session list to all clients now."""
         try:
             self.update_active_sessions()
-            tracking_points = await self.get_tracking_points_from_redis()
-            session_info = self.build_session_info(tracking_points)
+            message = self.get_session_list_message()
 
-            await self.broadcast_update({
-                'type': 'session_list',
-                'sessions': session_info
-            })
+            await self.broadcast_update(message)
 
-            logging.info(f"Broadcasted session list update: {len(session_info)} sessions")
+            logging.info(f"Broadcasted session list update: {len(message.message['sessions'])} sessions")
 
         except Exception as e:
             logging.error(f"Error broadcasting session list update: {str(e)}")
@@ -356,18 +1939,18 @@ class TrackingServer:
         """Connect to Redis, which is the source for recent live history."""
         self.redis_client = redis.Redis(
             **self.redis_config,
-            decode_responses=True,
+            decode_responses=False,
             socket_connect_timeout=5,
             socket_timeout=5,
             health_check_interval=30
         )
         await self.redis_client.ping()
         logging.info(
-            "Redis connection established for live history: %s:%s db=%s key=%s",
+            "Redis connection established for live history: %s:%s db=%s prefix=%s",
             self.redis_config['host'],
             self.redis_config['port'],
             self.redis_config['db'],
-            self.redis_history_key
+            self.redis_key_prefix
         )
 
     async def close_redis(self) -> None:
@@ -379,87 +1962,418 @@ class TrackingServer:
 
     async def cache_tracking_point(self, tracking_point: Dict[str, Any]) -> bool:
         """Add one live tracking point to the 48-hour Redis cache."""
+        return await self.cache_tracking_points([tracking_point])
+
+    async def cache_tracking_points(self, tracking_points: List[Dict[str, Any]]) -> bool:
+        """Add live tracking points to their per-session Redis keys.
+
+        With the Redis writer running the points are only queued; otherwise
+        they are written in one pipeline right away.
+        """
         if not self.redis_client:
             logging.warning("Redis is unavailable; live point was not cached")
             return False
 
+        if not tracking_points:
+            return True
+
+        cached_at = time.time()
+        # Replayed points arrive together; a microsecond step keeps
+        # their arrival order in the score-ordered set.
+        scored_points = [
+            (tracking_point, cached_at + index * 1e-6)
+            for index, tracking_point in enumerate(tracking_points)
+        ]
+
+        if self.redis_write_queue is not None:
+            all_queued = True
+            for scored_point in scored_points:
+                try:
+                    self.redis_write_queue.put_nowait(scored_point)
+                    self.redis_write_metrics['queued'] += 1
+                except asyncio.QueueFull:
+                    self.redis_write_metrics['dropped'] += 1
+                    all_queued = False
+            if not all_queued:
+                logging.warning(
+                    "Redis write queue full (%s points); live points for session %s were not cached",
+                    self.redis_write_queue_size,
+                    tracking_points[0].get('sessionId', 'unknown')
+                )
+            return all_queued
+
         try:
-            cached_at = time.time()
-            cache_entry = json.dumps(
-                {
-                    "cacheId": uuid.uuid4().hex,
-                    "cachedAt": cached_at,
-                    "point": tracking_point
-                },
-                separators=(',', ':'),
-                ensure_ascii=False,
-                default=str
-            )
-            await self.redis_client.zadd(
-                self.redis_history_key,
-                {cache_entry: cached_at}
-            )
+            await self.write_scored_points_to_redis(scored_points)
             return True
         except Exception as e:
             logging.error(
-                "Failed to cache live point for session %s in Redis: %s",
-                tracking_point.get('sessionId', 'unknown'),
+                "Failed to cache %s live points for session %s in Redis: %s",
+                len(tracking_points),
+                tracking_points[0].get('sessionId', 'unknown'),
                 str(e)
             )
             return False
 
+    async def write_scored_points_to_redis(self, scored_points: List[tuple]) -> None:
+        """Write (point, score) pairs of any sessions in one pipeline."""
+        session_entries: DefaultDict[str, List[tuple]] = defaultdict(list)
+        for tracking_point, score in scored_points:
+            session_entries[tracking_point.get('sessionId', '')].append((tracking_point, score))
+        await self.write_session_entries_to_redis(session_entries)
+
+    async def start_redis_writer(self) -> None:
+        """Start the background task that pipelines queued live points into Redis."""
+        if self.redis_writer and not self.redis_writer.done():
+            return
+
+        self.redis_write_queue = asyncio.Queue(maxsize=self.redis_write_queue_size)
+        self.redis_writer = asyncio.create_task(self.redis_writer_task())
+        logging.info(
+            f"Redis write coalescing started: batch_size={self.redis_write_batch_size}, "
+            f"flush_interval={self.redis_write_flush_interval_ms}ms, "
+            f"queue_size={self.redis_write_queue_size}"
+        )
+
+    async def stop_redis_writer(self) -> None:
+        """Flush the queued live points and stop the Redis writer."""
+        if not self.redis_writer:
+            return
+
+        if not self.redis_writer.done():
+            await self.redis_write_queue.put(None)
+            try:
+                await self.redis_writer
+            except asyncio.CancelledError:
+                pass
+
+        logging.info(f"Redis write coalescing stopped: {self.get_redis_write_metrics()}")
+        self.redis_writer = None
+        self.redis_write_queue = None
+
+    async def redis_writer_task(self) -> None:
+        """Pipeline queued live points every N points or M milliseconds, whichever comes first."""
+        loop = asyncio.get_running_loop()
+        flush_interval = self.redis_write_flush_interval_ms / 1000
+        stopping = False
+
+        while not stopping:
+            first_entry = await self.redis_write_queue.get()
+            if first_entry is None:
+                break
+
+            batch = [first_entry]
+            deadline = loop.time() + flush_interval
+            while len(batch) < self.redis_write_batch_size:
+                try:
+                    next_entry = self.redis_write_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        next_entry = await asyncio.wait_for(self.redis_write_queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+
+                if next_entry is None:
+                    stopping = True
+                    break
+                batch.append(next_entry)
+
+            await self.flush_redis_batch(batch)
+
+    async def flush_redis_batch(self, batch: List[tuple]) -> bool:
+        """Write one coalesced batch, retrying with exponential backoff."""
+        for attempt in range(self.redis_write_max_retries + 1):
+            try:
+                await self.write_scored_points_to_redis(batch)
+                self.redis_write_metrics['written'] += len(batch)
+                self.redis_write_metrics['batches'] += 1
+                return True
+            except Exception as e:
+                if attempt == self.redis_write_max_retries:
+                    self.redis_write_metrics['failed'] += len(batch)
+                    logging.error(
+                        f"Giving up on {len(batch)} live points after "
+                        f"{attempt + 1} Redis write attempts: {str(e)}"
+                    )
+                    return False
+                self.redis_write_metrics['retries'] += 1
+                backoff = self.redis_write_retry_backoff_ms * (2 ** attempt) / 1000
+                logging.warning(f"Redis write failed ({str(e)}); retrying in {backoff:.2f}s")
+                await asyncio.sleep(backoff)
+        return False
+
+    def get_redis_write_metrics(self) -> Dict[str, int]:
+        """Return the Redis write counters plus the current queue depth."""
+        return {
+            **self.redis_write_metrics,
+            'queueDepth': self.redis_write_queue.qsize() if self.redis_write_queue else 0
+        }
+
+    def redis_session_key(self, session_id: str) -> str:
+        """Return the sorted set that holds the live points of one session."""
+        return f"{self.redis_key_prefix}:session:{session_id}"
+
+    def redis_session_metadata_key(self, session_id: str) -> str:
+        """Return the hash of metadata versions shared by the points of one session."""
+        return f"{self.redis_key_prefix}:session_meta:{session_id}"
+
+    def redis_metadata_version(self, session_id: str, tracking_point: Dict[str, Any]) -> tuple:
+        """Return (version, metadata JSON) for a point, starting a new version when it changed."""
+        metadata = {
+            field: value for field, value in tracking_point.items()
+            if field in SESSION_METADATA_FIELDS
+        }
+        known = self.redis_session_metadata.get(session_id)
+        if known is not None and known[1] == metadata:
+            return known[0], known[2]
+
+        # Millisecond versions stay unique across restarts without reading Redis
+        version = int(time.time() * 1000)
+        if known is not None and version <= known[0]:
+            version = known[0] + 1
+        raw_metadata = json.dumps(metadata, separators=(',', ':'), ensure_ascii=False, default=str)
+        self.redis_session_metadata[session_id] = (version, metadata, raw_metadata)
+        return version, raw_metadata
+
+    async def write_session_entries_to_redis(self, session_entries: Dict[str, List[tuple]]) -> None:
+        """Write (point, score) pairs per session and refresh the session index.
+
+        Each session key and its metadata hash get the retention window as
+        their TTL, the index hash
+        keeps the latest session metadata and last-seen time, and the order
+        set remembers when a session was first seen.
+        """
+        retention_seconds = self.data_retention_hours * 3600
+        pipe = self.redis_client.pipeline(transaction=False)
+        for session_id, entries in session_entries.items():
+            if not entries:
+                continue
+            session_key = self.redis_session_key(session_id)
+            metadata_key = self.redis_session_metadata_key(session_id)
+            members = {}
+            metadata_versions = {}
+            for point, score in entries:
+                metadata_version, raw_metadata = self.redis_metadata_version(session_id, point)
+                metadata_versions[metadata_version] = raw_metadata
+                members[self.cached_point_codec.encode(point, score, metadata_version)] = score
+            # Another worker may have deleted or pruned a version this worker
+            # remembers, so every version the points refer to is written again
+            for metadata_version, raw_metadata in metadata_versions.items():
+                pipe.hsetnx(metadata_key, str(metadata_version), raw_metadata)
+            pipe.zadd(session_key, members)
+            pipe.expire(session_key, retention_seconds)
+            # The points reference the metadata hash, so it must live as long
+            pipe.expire(metadata_key, retention_seconds)
+
+            latest_point, last_seen = max(entries, key=lambda entry: entry[1])
+            pipe.hset(self.redis_session_index_key, session_id, json.dumps({
+                "lastSeen": last_seen,
+                "point": {
+                    field: latest_point[field]
+                    for field in SESSION_INDEX_FIELDS if field in latest_point
+                }
+            }, separators=(',', ':'), ensure_ascii=False, default=str))
+            first_seen = min(score for _, score in entries)
+            pipe.zadd(self.redis_session_order_key, {session_id: first_seen}, nx=True)
+
+        try:
+            await pipe.execute()
+        except Exception:
+            # The metadata versions queued above may not exist; write them again next time
+            for session_id in session_entries:
+                self.redis_session_metadata.pop(session_id, None)
+            raise
+
+    async def get_redis_session_index(self) -> List[tuple]:
+        """Return (session_id, index_entry) pairs ordered by when each session was first seen."""
+        session_ids = await self.redis_client.zrange(self.redis_session_order_key, 0, -1)
+        raw_index = {
+            redis_text(session_id): raw_entry
+            for session_id, raw_entry in (await self.redis_client.hgetall(self.redis_session_index_key)).items()
+        }
+
+        session_index = []
+        for session_id in map(redis_text, session_ids):
+            raw_entry = raw_index.get(session_id)
+            if raw_entry is None:
+                continue
+            try:
+                session_index.append((session_id, json.loads(raw_entry)))
+            except (TypeError, ValueError):
+                logging.warning(f"Skipping invalid Redis session index entry for {session_id}")
+        return session_index
+
+    async def get_redis_session_metadata(self, session_id: str) -> Dict[int, Dict[str, Any]]:
+        """Return every stored metadata version of a session."""
+        raw_versions = await self.redis_client.hgetall(self.redis_session_metadata_key(session_id))
+        metadata_versions = {}
+        for version, raw_metadata in raw_versions.items():
+            try:
+                metadata_versions[int(redis_text(version))] = json.loads(raw_metadata)
+            except (TypeError, ValueError):
+                logging.warning(f"Skipping invalid Redis metadata version for session {session_id}")
+        return metadata_versions
+
+    def decode_cached_point(self, raw_entry, metadata_versions: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+        """Decode a live-cache member, restoring the session metadata it refers to."""
+        metadata_version = self.cached_point_codec.metadata_version(raw_entry)
+        return self.cached_point_codec.decode(raw_entry, metadata_versions.get(metadata_version, {}))
+
+    async def migrate_json_redis_entries(self) -> int:
+        """Re-encode per-session JSON members written before the compact codec."""
+        if not self.redis_client:
+            return 0
+
+        migrated = 0
+        for session_id, _ in await self.get_redis_session_index():
+            session_key = self.redis_session_key(session_id)
+            cached_entries = await self.redis_client.zrange(session_key, 0, -1, withscores=True)
+            json_members = []
+            scored_points = []
+            for raw_entry, cached_at in cached_entries:
+                if self.cached_point_codec.metadata_version(raw_entry) is not None:
+                    continue
+                try:
+                    scored_points.append((self.cached_point_codec.decode(raw_entry, {}), float(cached_at)))
+                except (TypeError, ValueError, AttributeError):
+                    logging.warning(f"Dropping invalid JSON live-cache entry of session {session_id}")
+                json_members.append(raw_entry)
+
+            if not json_members:
+                continue
+            if scored_points:
+                await self.write_session_entries_to_redis({session_id: scored_points})
+            await self.redis_client.zrem(session_key, *json_members)
+            migrated += len(scored_points)
+
+        if migrated:
+            logging.info(f"Re-encoded {migrated} JSON live-cache entries with the compact codec")
+        return migrated
+
+    async def migrate_legacy_redis_history(self) -> int:
+        """Move points from the old single global ZSET into per-session keys."""
+        if not self.redis_client:
+            return 0
+
+        legacy_count = await self.redis_client.zcard(self.redis_history_key)
+        if not legacy_count:
+            return 0
+
+        migrated = 0
+        for start in range(0, legacy_count, 1000):
+            cached_entries = await self.redis_client.zrange(
+                self.redis_history_key,
+                start,
+                start + 999,
+                withscores=True
+            )
+            session_entries: DefaultDict[str, List[tuple]] = defaultdict(list)
+            for raw_entry, cached_at in cached_entries:
+                try:
+                    tracking_point = json.loads(raw_entry).get('point')
+                    if isinstance(tracking_point, dict) and tracking_point.get('sessionId'):
+                        session_entries[tracking_point['sessionId']].append((tracking_point, float(cached_at)))
+                except (TypeError, ValueError, AttributeError):
+                    logging.warning("Skipping invalid legacy Redis entry during migration")
+            await self.write_session_entries_to_redis(session_entries)
+            migrated += sum(len(entries) for entries in session_entries.values())
+
+        await self.redis_client.delete(self.redis_history_key)
+        logging.info(
+            "Migrated %s live points from %s into per-session Redis keys",
+            migrated,
+            self.redis_history_key
+        )
+        return migrated
+
     async def backfill_empty_redis_history_from_db(self) -> int:
         """Restore the live Redis window from PostgreSQL when Redis is empty."""
         if not self.redis_client or not self.db_pool:
             return 0
 
-        if await self.redis_client.zcard(self.redis_history_key):
+        # Sessions first seen after the warm start began are live, not history
+        restored_before = self.restore_started_at or float('inf')
+        if any(float(index_entry.get('lastSeen', 0)) < restored_before
+               for _, index_entry in await self.get_redis_session_index()):
             logging.info("Redis live history is not empty; database backfill skipped")
             return 0
 
-        loaded_count = await self.load_tracking_history_from_db()
-        if not loaded_count:
+        stats = await self.backfill_redis_from_db()
+        if not stats['points']:
             logging.info("No recent PostgreSQL tracking points available for Redis backfill")
-            return 0
+        return stats['points']
 
-        cache_entries = []
-        for points in self.tracking_history.values():
-            for tracking_point in points:
-                try:
-                    cached_at = datetime.datetime.strptime(
-                        tracking_point['timestamp'],
-                        self.timestamp_format
-                    ).replace(tzinfo=datetime.timezone.utc).timestamp()
-                except (KeyError, TypeError, ValueError):
-                    logging.warning(
-                        "Skipping PostgreSQL point with invalid timestamp during Redis backfill"
-                    )
-                    continue
+    async def backfill_redis_from_db(self, batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """Stream the live window from PostgreSQL into Redis and report throughput.
 
-                cache_entry = json.dumps(
-                    {
-                        "cacheId": uuid.uuid4().hex,
-                        "cachedAt": cached_at,
-                        "point": tracking_point
-                    },
-                    separators=(',', ':'),
-                    ensure_ascii=False,
-                    default=str
-                )
-                cache_entries.append((cache_entry, cached_at))
+        Rows come from a server-side cursor and every batch is written in one
+        pipeline; the next batch is fetched while the previous one is written.
+        Progress is logged every BACKFILL_PROGRESS_SECONDS. Points from
+        restore_started_at on were cached live and are left out, because
+        the members they would get differ from the live ones.
+        """
+        batch_size = batch_size or self.redis_write_batch_size
+        live_after = self.restore_started_at or float('inf')
+        stats = {'points': 0, 'sessions': 0, 'skipped': 0, 'live': 0, 'seconds': 0.0, 'pointsPerSecond': 0.0}
+        backfilled_sessions: Set[str] = set()
+        started = last_report = time.monotonic()
+        pending_write = None
+        pending_count = 0
 
-        for index in range(0, len(cache_entries), 500):
-            batch = cache_entries[index:index + 500]
-            await self.redis_client.zadd(
-                self.redis_history_key,
-                {entry: score for entry, score in batch}
-            )
+        try:
+            async for tracking_points in self.iter_tracking_points_from_db(batch_size):
+                session_entries: DefaultDict[str, List[tuple]] = defaultdict(list)
+                for tracking_point in tracking_points:
+                    try:
+                        cached_at = datetime.datetime.strptime(
+                            tracking_point['timestamp'],
+                            self.timestamp_format
+                        ).replace(tzinfo=datetime.timezone.utc).timestamp()
+                    except (KeyError, TypeError, ValueError):
+                        stats['skipped'] += 1
+                        continue
+                    if cached_at >= live_after:
+                        stats['live'] += 1
+                        continue
+                    session_entries[tracking_point['sessionId']].append((tracking_point, cached_at))
 
-        logging.info(
-            "Backfilled %s live tracking points from PostgreSQL into Redis",
-            len(cache_entries)
-        )
-        return len(cache_entries)
+                if pending_write is not None:
+                    await pending_write
+                    stats['points'] += pending_count
+                pending_write = asyncio.ensure_future(self.write_session_entries_to_redis(session_entries))
+                pending_count = sum(len(entries) for entries in session_entries.values())
+                backfilled_sessions.update(session_entries)
+
+                if time.monotonic() - last_report >= self.backfill_progress_seconds:
+                    last_report = time.monotonic()
+                    logging.info(
+                        "Redis backfill progress: %s points, %s sessions, %.0f points/s",
+                        stats['points'], len(backfilled_sessions),
+                        stats['points'] / max(last_report - started, 1e-6)
+                    )
+
+            if pending_write is not None:
+                await pending_write
+                stats['points'] += pending_count
+        except Exception as e:
+            if pending_write is not None and not pending_write.done():
+                pending_write.cancel()
+            logging.error(f"Redis backfill from PostgreSQL stopped after {stats['points']} points: {str(e)}")
+
+        stats['sessions'] = len(backfilled_sessions)
+        stats['seconds'] = round(time.monotonic() - started, 3)
+        stats['pointsPerSecond'] = round(stats['points'] / max(stats['seconds'], 1e-6), 1)
+        if stats['skipped']:
+            logging.warning(f"Skipped {stats['skipped']} PostgreSQL points with invalid timestamps during Redis backfill")
+        if stats['points']:
+            logging.info(
+                "Backfilled %s live tracking points across %s sessions from PostgreSQL into Redis "
+                "in %.1fs (%.0f points/s)",
+                stats['points'], stats['sessions'], stats['seconds'], stats['pointsPerSecond']
+            )
+        return stats
 
     async def cleanup_old_data_from_redis(self) -> int:
         """Remove live tracking points older than the retention window."""
@@ -468,124 +2382,248 @@ class TrackingServer:
 
         try:
             cutoff_epoch = time.time() - (self.data_retention_hours * 3600)
-            removed = await self.redis_client.zremrangebyscore(
-                self.redis_history_key,
-                '-inf',
-                cutoff_epoch
-            )
+            session_index = await self.get_redis_session_index()
+
+            expired_session_ids = set()
+            trimmed_session_ids = set()
+            pipe = self.redis_client.pipeline(transaction=False)
+            for session_id, index_entry in session_index:
+                session_key = self.redis_session_key(session_id)
+                if float(index_entry.get('lastSeen', 0)) < cutoff_epoch:
+                    expired_session_ids.add(session_id)
+                    pipe.zcard(session_key)
+                    pipe.delete(session_key, self.redis_session_metadata_key(session_id))
+                else:
+                    pipe.zremrangebyscore(session_key, '-inf', cutoff_epoch)
+            results = await pipe.execute()
+
+            removed = 0
+            position = 0
+            for session_id, _ in session_index:
+                if session_id in expired_session_ids:
+                    removed += int(results[position])
+                    position += 2
+                else:
+                    if int(results[position]):
+                        trimmed_session_ids.add(session_id)
+                    removed += int(results[position])
+                    position += 1
+
+            if expired_session_ids:
+                await self.remove_sessions_from_redis_index(expired_session_ids)
+                await self.publish_cluster_event({'type': 'sessions_expired', 'sessionIds': sorted(expired_session_ids)})
+            await self.prune_redis_metadata_versions(trimmed_session_ids)
             if removed:
                 logging.info(
                     "Removed %s Redis live points older than %s hours",
                     removed,
                     self.data_retention_hours
                 )
-            return int(removed)
+            return removed
         except Exception as e:
             logging.error(f"Redis live history cleanup failed: {str(e)}")
             return 0
 
+    async def prune_redis_metadata_versions(self, session_ids: Set[str]) -> int:
+        """Delete the metadata versions no live point of a session refers to any more."""
+        pruned = 0
+        for session_id in session_ids:
+            metadata_key = self.redis_session_metadata_key(session_id)
+            versions = await self.redis_client.hkeys(metadata_key)
+            if len(versions) < 2:
+                continue
+            referenced = {
+                self.cached_point_codec.metadata_version(raw_entry)
+                for raw_entry in await self.redis_client.zrange(self.redis_session_key(session_id), 0, -1)
+            }
+            known = self.redis_session_metadata.get(session_id)
+            if known is not None:
+                referenced.add(known[0])
+            unused = [
+                version for version in versions
+                if not redis_text(version).isdigit() or int(redis_text(version)) not in referenced
+            ]
+            if unused:
+                pruned += await self.redis_client.hdel(metadata_key, *unused)
+        if pruned:
+            logging.info(f"Pruned {pruned} unreferenced Redis metadata versions")
+        return pruned
+
+    async def remove_sessions_from_redis_index(self, session_ids: Set[str]) -> None:
+        """Drop sessions from the index hash and the first-seen order set."""
+        for session_id in session_ids:
+            self.redis_session_metadata.pop(session_id, None)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hdel(self.redis_session_index_key, *session_ids)
+        pipe.zrem(self.redis_session_order_key, *session_ids)
+        await pipe.execute()
+
     async def load_tracking_history_from_redis(self) -> int:
-        """Restore the live WebSocket history exclusively from Redis."""
+        """Hydrate the in-memory live history from Redis.
+
+        Sessions are loaded in parallel and merged with points that arrived
+        while the restore was running; until a session is hydrated, requests
+        that need it load it on demand (see hydrate_session).
+        """
         if not self.redis_client:
             raise RuntimeError("Redis is not initialized")
 
+        await self.cleanup_old_data_from_redis()
         cutoff_epoch = time.time() - (self.data_retention_hours * 3600)
-        await self.redis_client.zremrangebyscore(
-            self.redis_history_key,
-            '-inf',
-            cutoff_epoch
-        )
-        cached_entries = await self.redis_client.zrangebyscore(
-            self.redis_history_key,
-            cutoff_epoch,
-            '+inf',
-            withscores=True
-        )
+        if not self.restore_started_at:
+            self.restore_started_at = time.time()
 
-        self.tracking_history.clear()
-        self.active_sessions.clear()
-        self.last_activity.clear()
-        latest_session_state: Dict[str, tuple] = {}
-        skipped_entries = 0
-
-        for raw_entry, cached_at in cached_entries:
-            try:
-                cache_entry = json.loads(raw_entry)
-                tracking_point = cache_entry.get('point')
-                if not isinstance(tracking_point, dict):
-                    raise ValueError("cache entry has no point object")
-
-                session_id = tracking_point.get('sessionId')
-                if not session_id:
-                    raise ValueError("cached point has no sessionId")
-
-                self.tracking_history[session_id].append(tracking_point)
-                latest_session_state[session_id] = (tracking_point, float(cached_at))
-            except Exception as e:
-                skipped_entries += 1
-                logging.warning(f"Skipping invalid Redis live-history entry: {str(e)}")
+        for session_id, index_entry in await self.get_redis_session_index():
+            if float(index_entry.get('lastSeen', 0)) < cutoff_epoch:
+                continue
+            point = index_entry.get('point')
+            self.unhydrated_sessions[session_id] = (
+                {**point, 'sessionId': session_id} if isinstance(point, dict) else {'sessionId': session_id}
+            )
+        self.history_snapshot.bump()
 
-        for session_id, (latest_point, cached_at) in latest_session_state.items():
-            last_seen = datetime.datetime.fromtimestamp(cached_at)
-            self.last_activity[session_id] = last_seen
+        session_ids = list(self.unhydrated_sessions)
+        semaphore = asyncio.Semaphore(self.restore_concurrency)
 
-            try:
-                latitude = float(latest_point.get('latitude', -999))
-                longitude = float(latest_point.get('longitude', -999))
-                if latitude != -999.0 and longitude != -999.0:
-                    self.session_detector.session_last_coords[session_id] = (
-                        latitude,
-                        longitude
-                    )
-
-                distance = float(latest_point.get('distance', 0))
-                if distance > 0:
-                    self.session_detector.session_last_distance[session_id] = distance
-                self.session_detector.session_last_seen[session_id] = last_seen
-            except (TypeError, ValueError):
-                logging.warning(
-                    "Could not restore reset-detector state for session %s",
-                    session_id
-                )
+        async def hydrate(session_id: str) -> int:
+            async with semaphore:
+                return await self.hydrate_session(session_id)
 
+        loaded_count = sum(await asyncio.gather(*(hydrate(session_id) for session_id in session_ids)))
         self.update_active_sessions()
-        loaded_count = sum(len(points) for points in self.tracking_history.values())
         logging.info(
-            "Loaded %s live points across %s sessions from Redis "
-            "(last %s hours, skipped %s invalid entries)",
+            "Loaded %s live points across %s sessions from Redis (last %s hours)",
             loaded_count,
-            len(self.tracking_history),
-            self.data_retention_hours,
-            skipped_entries
+            len(session_ids),
+            self.data_retention_hours
         )
         return loaded_count
 
-    async def get_tracking_points_from_redis(self) -> List[Dict[str, Any]]:
-        """Read the current 48-hour live history directly from Redis."""
+    async def hydrate_session(self, session_id: str) -> int:
+        """Load a session that is not hydrated yet from Redis; concurrent callers share one load."""
+        if session_id not in self.unhydrated_sessions:
+            return 0
+        return await self.single_flight(('hydrate', session_id), lambda: self.load_session_from_redis(session_id))
+
+    async def load_session_from_redis(self, session_id: str) -> int:
+        """Merge the Redis history of one session in front of its live points."""
+        track = SessionTrack()
+        latest = None
+        async for page in self.iter_session_pages_from_redis(
+            session_id, self.history_page_size, self.restore_started_at
+        ):
+            track.extend(point for point, _ in page)
+            if page:
+                latest = page[-1]
+
+        if self.unhydrated_sessions.pop(session_id, None) is None:
+            # Deleted while loading
+            return 0
+        loaded_count = len(track)
+        live_track = self.tracking_history.get(session_id)
+        if live_track:
+            track.extend(live_track)
+        if track:
+            self.tracking_history[session_id] = track
+            self.history_snapshot.invalidate(session_id)
+            self.schedule_retention(session_id)
+
+        state = self.sessions.get(session_id)
+        if latest is not None and (state is None or state.last_seen is None):
+            # Points that arrived during the restore are newer
+            self.sessions.restore(session_id, latest[0], datetime.datetime.fromtimestamp(latest[1]))
+        return loaded_count
+
+    async def prepare_redis_history(self) -> None:
+        """Migrate old Redis formats and backfill an empty live cache from PostgreSQL."""
         if not self.redis_client:
-            logging.error("Cannot read live history because Redis is unavailable")
-            return []
+            return
+        await self.redis_client.set(self.redis_restore_key, self.worker_id, ex=self.redis_restore_ttl_seconds)
+        try:
+            await self.migrate_legacy_redis_history()
+            await self.migrate_json_redis_entries()
+            await self.backfill_empty_redis_history_from_db()
+        finally:
+            await self.redis_client.delete(self.redis_restore_key)
+
+    async def restore_live_state(self, prepare: bool = True) -> None:
+        """Background warm start: migrate and backfill Redis, then hydrate memory.
 
+        With several workers the parent process prepares Redis once before
+        they start, and every worker only hydrates its memory.
+        """
         try:
-            cutoff_epoch = time.time() - (self.data_retention_hours * 3600)
+            if prepare:
+                await self.prepare_redis_history()
+            await self.load_tracking_history_from_redis()
+        except Exception as e:
+            logging.error(f"Restoring live history from Redis failed: {str(e)}")
+            self.unhydrated_sessions.clear()
+            self.history_snapshot.bump()
+
+    async def iter_tracking_point_pages_from_redis(self, page_size: int):
+        """Yield (session_id, [(point, score), ...]) pages of the live history in Redis.
+
+        Points cached after the read started are left to live updates.
+        """
+        if not self.redis_client:
+            logging.error("Cannot read live history because Redis is unavailable")
+            return
+
+        cutoff_epoch = time.time() - (self.data_retention_hours * 3600)
+        max_score = time.time()
+
+        for session_id, index_entry in await self.get_redis_session_index():
+            if float(index_entry.get('lastSeen', 0)) < cutoff_epoch:
+                continue
+            async for page in self.iter_session_pages_from_redis(session_id, page_size, max_score):
+                yield session_id, page
+
+    async def iter_session_pages_from_redis(self, session_id: str, page_size: int, max_score: float):
+        """Yield [(point, score), ...] pages of one session in score order.
+
+        The cursor is (score, offset among entries with that score), so equal
+        scores from a database backfill are neither skipped nor repeated.
+        """
+        session_key = self.redis_session_key(session_id)
+        metadata_versions = await self.get_redis_session_metadata(session_id)
+        min_score = time.time() - (self.data_retention_hours * 3600)
+        offset = 0
+        while True:
             cached_entries = await self.redis_client.zrangebyscore(
-                self.redis_history_key,
-                cutoff_epoch,
-                '+inf'
+                session_key,
+                min_score,
+                max_score,
+                start=offset,
+                num=page_size,
+                withscores=True
             )
+            if not cached_entries:
+                break
+
             tracking_points = []
-            for raw_entry in cached_entries:
+            for raw_entry, score in cached_entries:
                 try:
-                    cache_entry = json.loads(raw_entry)
-                    tracking_point = cache_entry.get('point')
-                    if isinstance(tracking_point, dict):
-                        tracking_points.append(tracking_point)
-                except (TypeError, ValueError, json.JSONDecodeError):
-                    logging.warning("Skipped invalid Redis entry while sending history")
-            return tracking_points
-        except Exception as e:
-            logging.error(f"Failed to read live history from Redis: {str(e)}")
-            return []
+                    tracking_points.append((self.decode_cached_point(raw_entry, metadata_versions), float(score)))
+                except (TypeError, ValueError, AttributeError, struct.error):
+                    logging.warning("Skipped invalid Redis entry while reading live history")
+            yield tracking_points
+
+            if len(cached_entries) < page_size:
+                break
+
+            last_score = cached_entries[-1][1]
+            ties = 0
+            for _, score in reversed(cached_entries):
+                if score != last_score:
+                    break
+                ties += 1
+            if last_score == min_score:
+                # The whole page shared the cursor score
+                offset += ties
+            else:
+                min_score = last_score
+                offset = ties
 
     async def delete_sessions_from_redis(self, session_ids: Set[str]) -> int:
         """Remove deleted sessions from the Redis live-history cache."""
@@ -593,34 +2631,24 @@ class TrackingServer:
             return 0
 
         try:
-            cached_entries = await self.redis_client.zrange(
-                self.redis_history_key,
-                0,
-                -1
-            )
-            entries_to_remove = []
-            for raw_entry in cached_entries:
-                try:
-                    cache_entry = json.loads(raw_entry)
-                    point = cache_entry.get('point', {})
-                    if point.get('sessionId') in session_ids:
-                        entries_to_remove.append(raw_entry)
-                except (TypeError, ValueError, json.JSONDecodeError):
-                    continue
+            pipe = self.redis_client.pipeline(transaction=False)
+            for session_id in session_ids:
+                pipe.zcard(self.redis_session_key(session_id))
+            pipe.delete(*[
+                key for session_id in session_ids
+                for key in (self.redis_session_key(session_id), self.redis_session_metadata_key(session_id))
+            ])
+            results = await pipe.execute()
+            removed = sum(int(count) for count in results[:-1])
 
-            removed = 0
-            for index in range(0, len(entries_to_remove), 500):
-                removed += await self.redis_client.zrem(
-                    self.redis_history_key,
-                    *entries_to_remove[index:index + 500]
-                )
+            await self.remove_sessions_from_redis_index(session_ids)
 
             logging.info(
                 "Removed %s cached live points for deleted sessions %s",
                 removed,
                 sorted(session_ids)
             )
-            return int(removed)
+            return removed
         except Exception as e:
             logging.error(f"Failed to remove deleted sessions from Redis: {str(e)}")
             return 0
@@ -760,6 +2788,17 @@ class TrackingServer:
                 ADD COLUMN IF NOT EXISTS cadence INTEGER
             """)
 
+            # Per-session sequence number and app-run epoch the app may send;
+            # resent points are ignored on insert through the unique index below.
+            await conn.execute("""
+                ALTER TABLE gps_tracking_points
+                ADD COLUMN IF NOT EXISTS seq BIGINT
+            """)
+            await conn.execute("""
+                ALTER TABLE gps_tracking_points
+                ADD COLUMN IF NOT EXISTS seq_epoch VARCHAR(64)
+            """)
+
             # Create lap_times table
             await conn.execute("""
                 CREATE TABLE IF NOT EXISTS lap_times (
@@ -861,6 +2900,9 @@ class TrackingServer:
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_gps_session_id ON gps_tracking_points(session_id)")
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_gps_received_at ON gps_tracking_points(received_at)")
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_gps_location ON gps_tracking_points(latitude, longitude)")
+            # Replaced by idx_gps_session_epoch_seq: a restarted app reuses its numbers
+            await conn.execute("DROP INDEX IF EXISTS idx_gps_session_seq")
+            await conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_gps_session_epoch_seq ON gps_tracking_points(session_id, (COALESCE(seq_epoch, '')), seq) WHERE seq IS NOT NULL")
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON tracking_sessions(user_id)")
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_users_name ON users(firstname, lastname)")
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_gps_temperature ON gps_tracking_points(temperature) WHERE temperature IS NOT NULL")
@@ -908,6 +2950,30 @@ class TrackingServer:
                                  birthdate: str = None, height: float = None,
                                  weight: float = None, bmi: float = None) -> int:
         """Get existing user or create new one, return user_id."""
+        user_key = (firstname, lastname or '', birthdate or '')
+        body_metrics = (height, weight, bmi)
+        cached_user = self.user_cache.get(user_key)
+        if cached_user:
+            user_id, cached_metrics = cached_user
+            # Missing values keep the stored ones, exactly like the COALESCE below
+            merged_metrics = tuple(
+                new if new is not None else old
+                for new, old in zip(body_metrics, cached_metrics)
+            )
+            if merged_metrics == cached_metrics:
+                return user_id
+
+            await conn.execute("""
+                UPDATE users SET
+                    height = COALESCE($1, height),
+                    weight = COALESCE($2, weight),
+                    bmi = COALESCE($3, bmi),
+                    updated_at = NOW()
+                WHERE user_id = $4
+            """, height, weight, bmi, user_id)
+            self.user_cache.set(user_key, (user_id, merged_metrics))
+            return user_id
+
         # Try to find existing user
         user_id = await conn.fetchval("""
             SELECT user_id FROM users
@@ -926,6 +2992,7 @@ class TrackingServer:
                         updated_at = NOW()
                     WHERE user_id = $4
                 """, height, weight, bmi, user_id)
+            self.user_cache.set(user_key, (user_id, body_metrics))
             return user_id
 
         # Create new user
@@ -936,6 +3003,7 @@ class TrackingServer:
         """, firstname, lastname, birthdate, height, weight, bmi)
 
         logging.info(f"Created new user: {firstname} {lastname} (ID: {user_id})")
+        self.user_cache.set(user_key, (user_id, body_metrics))
         return user_id
 
     async def get_or_create_heart_rate_device(self, conn, device_name: str) -> int:
@@ -946,11 +3014,16 @@ class TrackingServer:
 
         device_name = device_name.strip()
 
+        device_id = self.heart_rate_device_cache.get(device_name)
+        if device_id:
+            return device_id
+
         device_id = await conn.fetchval("""
             SELECT device_id FROM heart_rate_devices WHERE device_name = $1
         """, device_name)
 
         if device_id:
+            self.heart_rate_device_cache.set(device_name, device_id)
             return device_id
 
         device_id = await conn.fetchval("""
@@ -960,16 +3033,21 @@ class TrackingServer:
             RETURNING device_id
         """, device_name)
 
+        self.heart_rate_device_cache.set(device_name, device_id)
         return device_id
 
     async def get_or_create_session(self, conn, session_id: str, user_id: int,
                                     message_data: Dict[str, Any]) -> None:
         """Create session if it doesn't exist."""
+        if session_id in self.session_cache:
+            return
+
         exists = await conn.fetchval("""
             SELECT 1 FROM tracking_sessions WHERE session_id = $1
         """, session_id)
 
         if exists:
+            self.session_cache.set(session_id, {})
             return
 
         # Parse the start_date_time
@@ -1002,6 +3080,7 @@ class TrackingServer:
                            start_date_time,
                            message_data.get('version') or None
                            )
+        self.session_cache.set(session_id, {'version': message_data.get('version') or None})
 
     async def _compare_gps_samples(
         self,
@@ -1296,387 +3375,976 @@ class TrackingServer:
                         int(transition.get('timestamp', 0))
                     )
 
-                    logging.info(f"Saved discipline transition '{transition.get('disciplineName', '')}' #{transition.get('transitionNumber', 0)} for session {session_id}")
-                    return True
+                    logging.info(f"Saved discipline transition '{transition.get('disciplineName', '')}' #{transition.get('transitionNumber', 0)} for session {session_id}")
+                    return True
+
+        except Exception as e:
+            logging.error(f"Error saving discipline transition to database: {str(e)}")
+            return False
+
+    async def save_tracking_data_to_db(self, message_data: Dict[str, Any]) -> bool:
+        """Save one tracking point to the normalized PostgreSQL database."""
+        return await self.save_tracking_batch_to_db([message_data]) == 1
+
+    async def start_persistence_writer(self) -> None:
+        """Start the background task that flushes queued points to PostgreSQL."""
+        if self.persistence_writer and not self.persistence_writer.done():
+            return
+
+        self.persistence_queue = asyncio.Queue(maxsize=self.persistence_queue_size)
+        self.persistence_writer = asyncio.create_task(self.persistence_writer_task())
+        logging.info(
+            f"Write-behind persistence started: batch_size={self.persistence_batch_size}, "
+            f"flush_interval={self.persistence_flush_interval_ms}ms, "
+            f"queue_size={self.persistence_queue_size}"
+        )
+
+        if self.spool_dir and self.spool is None:
+            try:
+                self.spool = PointSpool(self.spool_dir, self.spool_segment_bytes)
+                self.spool_stopping = asyncio.Event()
+                self.spool_replayer = asyncio.create_task(self.spool_replayer_task())
+                logging.info(
+                    f"Spool enabled in {self.spool_dir}: latency_budget={self.persistence_latency_budget_ms}ms, "
+                    f"{len(self.spool.segments)} segments waiting for replay"
+                )
+            except OSError as e:
+                logging.error(f"Spool directory {self.spool_dir} is unusable: {str(e)}")
+
+    async def stop_persistence_writer(self) -> None:
+        """Drain the persistence queue and stop the background writer."""
+        if not self.persistence_writer:
+            return
+
+        if not self.persistence_writer.done():
+            # The sentinel is queued behind every pending point, so the writer
+            # flushes everything that was accepted before it exits.
+            await self.persistence_queue.put(None)
+            try:
+                await self.persistence_writer
+            except asyncio.CancelledError:
+                pass
+
+        logging.info("Write-behind persistence stopped and drained")
+        self.persistence_writer = None
+        self.persistence_queue = None
+
+        if self.slow_save:
+            await self.slow_save
+        if self.spool_replayer:
+            # Not cancelled: a replayed batch must finish before its offset is stored
+            self.spool_stopping.set()
+            await self.spool_replayer
+            self.spool_replayer = None
+        if self.spool:
+            # Whatever is still spooled is replayed after the next start
+            self.spool.close()
+            self.spool = None
+
+    async def enqueue_tracking_point(self, tracking_point: Dict[str, Any]) -> bool:
+        """Hand a validated point to the write-behind persistence queue."""
+        return await self.enqueue_tracking_points([tracking_point])
+
+    async def enqueue_tracking_points(self, tracking_points: List[Dict[str, Any]]) -> bool:
+        """Hand validated points, in order, to the write-behind persistence queue."""
+        if self.persistence_mode == 'stream' and self.redis_client:
+            if await self.append_to_ingest_stream(tracking_points):
+                return True
+            logging.warning("Ingest stream unavailable; persisting in this process instead")
+
+        if not self.db_pool:
+            logging.error("Database pool not initialized")
+            return False
+
+        if not self.persistence_queue:
+            # No writer running (e.g. during startup or in tools); persist inline.
+            return await self.save_tracking_batch_to_db(tracking_points) == len(tracking_points)
+
+        for tracking_point in tracking_points:
+            try:
+                self.persistence_queue.put_nowait(tracking_point)
+            except asyncio.QueueFull:
+                # Apply backpressure to this tracker instead of dropping points.
+                logging.warning(
+                    "Persistence queue full (%s points); waiting for the database writer",
+                    self.persistence_queue_size
+                )
+                await self.persistence_queue.put(tracking_point)
+        return True
+
+    async def persistence_writer_task(self) -> None:
+        """Flush queued points every N points or M milliseconds, whichever comes first."""
+        loop = asyncio.get_running_loop()
+        flush_interval = self.persistence_flush_interval_ms / 1000
+        stopping = False
+
+        while not stopping:
+            first_point = await self.persistence_queue.get()
+            if first_point is None:
+                break
+
+            batch = [first_point]
+            deadline = loop.time() + flush_interval
+            while len(batch) < self.persistence_batch_size:
+                try:
+                    next_point = self.persistence_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        next_point = await asyncio.wait_for(
+                            self.persistence_queue.get(),
+                            remaining
+                        )
+                    except asyncio.TimeoutError:
+                        break
+
+                if next_point is None:
+                    stopping = True
+                    break
+                batch.append(next_point)
+
+            try:
+                await self.flush_persistence_batch(batch)
+            except Exception as e:
+                logging.error(f"Persistence writer failed to flush {len(batch)} points: {str(e)}")
+
+    async def flush_persistence_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """Write a batch to PostgreSQL, or to the spool when the database is down or slow.
+
+        While the spool holds batches every new batch goes there as well,
+        so the replay keeps the points in arrival order.
+        """
+        if self.spool is None:
+            await self.save_tracking_batch_to_db(batch)
+            return
+
+        if not self.spool.pending() and self.slow_save is None:
+            save = asyncio.ensure_future(self.save_tracking_batch_to_db(batch))
+            done, _ = await asyncio.wait({save}, timeout=self.persistence_latency_budget_ms / 1000)
+            if not done:
+                # Cancelling could interrupt a COMMIT, leaving it unknown
+                # whether the batch was stored; let it finish instead. Its
+                # place in the spool is reserved in front of the newer batches.
+                logging.warning(
+                    f"PostgreSQL missed the {self.persistence_latency_budget_ms}ms latency budget; "
+                    f"spooling new points until the transaction finishes"
+                )
+                reserved_segment = self.spool.reserve()
+                self.slow_save = asyncio.create_task(self.finish_slow_save(save, batch, reserved_segment))
+                return
+            if save.result():
+                return
+            logging.warning(f"Spooling {len(batch)} points until PostgreSQL is available")
+
+        await asyncio.to_thread(self.spool.append, batch)
+
+    async def finish_slow_save(self, save: asyncio.Future, batch: List[Dict[str, Any]],
+                               reserved_segment: int) -> None:
+        """Wait for a transaction that missed the latency budget and spool its batch if it failed."""
+        try:
+            saved = 0
+            try:
+                saved = await save
+            except Exception as e:
+                logging.error(f"Slow batch of {len(batch)} points failed: {str(e)}")
+            if saved:
+                self.spool.release(reserved_segment)
+            else:
+                logging.warning(f"Spooling {len(batch)} points of the slow batch until PostgreSQL is available")
+                await asyncio.to_thread(self.spool.append_reserved, reserved_segment, batch)
+        except Exception as e:
+            logging.error(f"Could not spool the slow batch of {len(batch)} points: {str(e)}")
+        finally:
+            self.slow_save = None
+
+    async def spool_replayer_task(self) -> None:
+        """Replay the spool whenever PostgreSQL is reachable again, until spool_stopping is set."""
+        while not self.spool_stopping.is_set():
+            try:
+                await asyncio.wait_for(self.spool_stopping.wait(), self.spool_replay_interval_ms / 1000)
+                break
+            except asyncio.TimeoutError:
+                pass
+            try:
+                if (self.slow_save is None and self.spool.pending() and time.monotonic() >= self.spool_retry_at
+                        and await self.database_is_available()):
+                    await self.replay_spool()
+            except Exception as e:
+                logging.error(f"Spool replay failed: {str(e)}")
+
+    async def replay_spool(self) -> int:
+        """Load spooled batches into PostgreSQL in order and return the points written.
+
+        Replay stops at the first batch that fails while the database is
+        down, or when the spool is stopping. A batch that fails while it is
+        up is retried with backoff, and after SPOOL_MAX_ATTEMPTS failures it
+        is moved to rejected/.
+        """
+        replayed = 0
+        while True:
+            segment = self.spool.oldest_segment()
+            if segment is None:
+                break
+            for end_offset, points in self.spool.iter_records(segment):
+                if self.spool_stopping is not None and self.spool_stopping.is_set():
+                    logging.info(f"Spool replay stopped after {replayed} points")
+                    return replayed
+                saved = await self.save_tracking_batch_to_db(points)
+                if not saved:
+                    if not await self.database_is_available():
+                        logging.info(f"Spool replay paused after {replayed} points; PostgreSQL is unavailable")
+                        return replayed
+                    self.spool_attempts += 1
+                    if self.spool_attempts < self.spool_max_attempts:
+                        backoff = self.spool_replay_interval_ms / 1000 * 2 ** (self.spool_attempts - 1)
+                        self.spool_retry_at = time.monotonic() + backoff
+                        logging.warning(
+                            f"Spooled batch of {len(points)} points failed (attempt {self.spool_attempts}); "
+                            f"retrying in {backoff:.0f}s"
+                        )
+                        return replayed
+                    logging.error(
+                        f"Moving {len(points)} spooled points that failed {self.spool_attempts} times to rejected/"
+                    )
+                    await asyncio.to_thread(self.spool.reject, points)
+                self.spool_attempts = 0
+                await asyncio.to_thread(self.spool.consumed, end_offset)
+                replayed += saved
+            await asyncio.to_thread(self.spool.remove, segment)
+
+        logging.info(f"Spool replayed: {replayed} points written to PostgreSQL")
+        return replayed
+
+    def ingest_shard_stream_key(self, shard: int) -> str:
+        if self.ingest_shards == 1:
+            return f"{self.redis_key_prefix}:ingest"
+        return f"{self.redis_key_prefix}:ingest:{shard}"
+
+    def ingest_stream_key_for(self, session_id: str) -> str:
+        """Return the ingest stream of the shard that persists a session."""
+        return self.ingest_shard_stream_key(zlib.crc32(str(session_id).encode('utf-8')) % self.ingest_shards)
+
+    async def append_to_ingest_stream(self, tracking_points: List[Dict[str, Any]]) -> bool:
+        """Append validated points, one entry per shard, to the Redis ingest streams."""
+        streams: Dict[str, List[Dict[str, Any]]] = {}
+        for tracking_point in tracking_points:
+            streams.setdefault(self.ingest_stream_key_for(tracking_point.get('sessionId')), []).append(tracking_point)
+        try:
+            for stream_key, stream_points in streams.items():
+                await self.redis_client.xadd(
+                    stream_key,
+                    {'points': json.dumps(stream_points)},
+                    maxlen=self.ingest_stream_maxlen,
+                    approximate=True
+                )
+            return True
+        except Exception as e:
+            logging.error(f"Error appending {len(tracking_points)} points to the ingest stream: {str(e)}")
+            return False
+
+    async def ensure_ingest_group(self) -> None:
+        """Create the consumer group of the ingest stream if it does not exist."""
+        try:
+            await self.redis_client.xgroup_create(
+                self.ingest_stream_key, self.ingest_group, id='0', mkstream=True
+            )
+            logging.info(f"Created consumer group {self.ingest_group} on {self.ingest_stream_key}")
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    async def read_ingest_entries(self, read_id: str) -> List[tuple]:
+        """Read entries for this worker: its own pending ones for '0', new ones for '>'."""
+        response = await self.redis_client.xreadgroup(
+            self.ingest_group,
+            self.ingest_consumer,
+            {self.ingest_stream_key: read_id},
+            count=self.persistence_batch_size,
+            block=self.persistence_flush_interval_ms
+        )
+        return response[0][1] if response else []
+
+    async def claim_stale_ingest_entries(self) -> List[tuple]:
+        """Take over entries another worker left pending for INGEST_CLAIM_IDLE_MS."""
+        result = await self.redis_client.xautoclaim(
+            self.ingest_stream_key,
+            self.ingest_group,
+            self.ingest_consumer,
+            min_idle_time=self.ingest_claim_idle_ms,
+            start_id='0-0',
+            count=self.persistence_batch_size
+        )
+        claimed = result[1]
+        if claimed:
+            logging.warning(f"Claimed {len(claimed)} ingest entries left pending by another worker")
+        return claimed
+
+    async def database_is_available(self) -> bool:
+        """Check whether PostgreSQL answers a trivial query."""
+        if not self.db_pool:
+            return False
+        try:
+            async with self.db_pool.acquire() as conn:
+                await conn.fetchval("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    async def dead_letter_ingest_entry(self, entry_id, entry_points: List[Dict[str, Any]]) -> bool:
+        """Move an entry delivered more than INGEST_MAX_DELIVERIES times to the dead-letter stream."""
+        pending = await self.redis_client.xpending_range(
+            self.ingest_stream_key, self.ingest_group, min=entry_id, max=entry_id, count=1
+        )
+        deliveries = pending[0]['times_delivered'] if pending else 0
+        if deliveries <= self.ingest_max_deliveries:
+            return False
+
+        await self.redis_client.xadd(
+            self.ingest_dead_letter_key,
+            {'points': json.dumps(entry_points), 'entryId': redis_text(entry_id), 'deliveries': str(deliveries)},
+            maxlen=self.ingest_stream_maxlen,
+            approximate=True
+        )
+        logging.error(
+            "Moved ingest entry %s with %s points for session %s to %s after %s deliveries",
+            redis_text(entry_id),
+            len(entry_points),
+            entry_points[0].get('sessionId') if entry_points else None,
+            self.ingest_dead_letter_key,
+            deliveries
+        )
+        return True
+
+    async def persist_ingest_entries(self, entries: List[tuple]) -> int:
+        """Write ingest stream entries to PostgreSQL and acknowledge them.
+
+        All entries are written in one batch. If that fails they are retried
+        one by one in order, and a session stops at its first failed entry:
+        that entry and the later ones of its sessions stay pending, so they
+        are written in order once it succeeds or is dead-lettered. Returns
+        the number of acknowledged entries.
+        """
+        batch = []
+        done = []
+        for entry_id, fields in entries:
+            try:
+                batch.append((entry_id, json.loads(fields[b'points'])))
+            except (TypeError, KeyError, ValueError) as e:
+                # Trimmed or corrupt entries come back without readable points
+                logging.error(f"Dropping unreadable ingest entry {redis_text(entry_id)}: {str(e)}")
+                done.append(entry_id)
+
+        points = [point for _, entry_points in batch for point in entry_points]
+        if points and await self.save_tracking_batch_to_db(points, split=False):
+            done.extend(entry_id for entry_id, _ in batch)
+        elif points:
+            blocked: Set[str] = set()
+            for entry_id, entry_points in batch:
+                sessions = {str(point.get('sessionId')) for point in entry_points}
+                if not entry_points:
+                    done.append(entry_id)
+                elif sessions & blocked:
+                    # An entry of several sessions holds all of them back
+                    blocked |= sessions
+                elif len(batch) > 1 and await self.save_tracking_batch_to_db(entry_points, split=False):
+                    done.append(entry_id)
+                elif not await self.database_is_available():
+                    break
+                elif await self.dead_letter_ingest_entry(entry_id, entry_points):
+                    done.append(entry_id)
+                else:
+                    blocked |= sessions
+
+        if done:
+            await self.redis_client.xack(self.ingest_stream_key, self.ingest_group, *done)
+        return len(done)
+
+    async def run_persistence_worker(self, stop_event: asyncio.Event) -> None:
+        """Persist the ingest stream until stop_event is set.
+
+        The worker first finishes its own pending entries from a previous
+        run, then reads new ones. Every half INGEST_CLAIM_IDLE_MS it takes
+        over entries of workers that stopped, and after a failed batch it
+        backs off and retries its own pending entries in order.
+        """
+        await self.ensure_ingest_group()
+        logging.info(
+            f"Persistence worker {self.ingest_consumer} consuming {self.ingest_stream_key} "
+            f"as {self.ingest_group}: batch_size={self.persistence_batch_size}, "
+            f"claim_idle={self.ingest_claim_idle_ms}ms"
+        )
+
+        loop = asyncio.get_running_loop()
+        read_id = '0'
+        next_claim = 0.0
+        while not stop_event.is_set():
+            try:
+                entries = []
+                if loop.time() >= next_claim:
+                    next_claim = loop.time() + self.ingest_claim_idle_ms / 2000
+                    self.sessions.evict_expired()
+                    entries = await self.claim_stale_ingest_entries()
+                if not entries:
+                    entries = await self.read_ingest_entries(read_id)
+                    if not entries:
+                        # Pending entries are done; switch to new ones
+                        read_id = '>'
+                        continue
+
+                if await self.persist_ingest_entries(entries) < len(entries):
+                    read_id = '0'
+                    await asyncio.sleep(self.ingest_retry_backoff_ms / 1000)
+            except Exception as e:
+                logging.error(f"Persistence worker error: {str(e)}")
+                await asyncio.sleep(self.ingest_retry_backoff_ms / 1000)
+
+        logging.info(f"Persistence worker {self.ingest_consumer} stopped")
+
+    async def publish_lap_times(self, lap_updates: List[tuple]) -> None:
+        """Publish committed laps so the websocket servers can update their lap caches."""
+        try:
+            for session_id, lap_times, replace in lap_updates:
+                await self.redis_client.publish(self.lap_update_channel, json.dumps({
+                    'sessionId': session_id,
+                    'lapTimes': lap_times,
+                    'replace': replace
+                }))
+        except Exception as e:
+            logging.error(f"Error publishing lap updates: {str(e)}")
+
+    async def publish_session_deletion(self, session_ids: Set[str]) -> None:
+        """Tell the persistence workers about a deleted session family."""
+        try:
+            await self.redis_client.publish(self.session_delete_channel, json.dumps(sorted(session_ids)))
+        except Exception as e:
+            logging.error(f"Error publishing deleted sessions to the persistence workers: {str(e)}")
+
+    def apply_session_deletion(self, data) -> None:
+        """Forget the cached identity and lap state of sessions a server deleted."""
+        try:
+            session_ids = json.loads(data)
+        except (TypeError, ValueError) as e:
+            logging.error(f"Ignoring malformed session deletion: {str(e)}")
+            return
+        for session_id in session_ids:
+            self.session_cache.pop(session_id)
+            self.sessions.pop(session_id)
+        logging.info(f"Forgot deleted sessions: {session_ids}")
+
+    def apply_lap_update(self, data) -> None:
+        """Apply a lap update published by a persistence worker."""
+        try:
+            update = json.loads(data)
+            self.record_lap_times(update['sessionId'], update['lapTimes'], update['replace'])
+        except (TypeError, KeyError, ValueError) as e:
+            logging.error(f"Ignoring malformed lap update: {str(e)}")
+
+    async def start_pubsub_listener(self) -> None:
+        """Subscribe to the channels in pubsub_handlers and dispatch their messages."""
+        if not self.pubsub_handlers or self.pubsub_listener:
+            return
+        # Subscribe before returning, so nothing published afterwards is missed
+        self.pubsub = self.redis_client.pubsub()
+        await self.pubsub.subscribe(*self.pubsub_handlers)
+        self.pubsub_listener = asyncio.create_task(self.pubsub_listener_task())
+        logging.info(f"Listening on Redis channels: {sorted(self.pubsub_handlers)}")
+
+    async def stop_pubsub_listener(self) -> None:
+        """Stop listening on the Redis channels."""
+        if not self.pubsub_listener:
+            return
+        self.pubsub_listener.cancel()
+        try:
+            await self.pubsub_listener
+        except asyncio.CancelledError:
+            pass
+        self.pubsub_listener = None
+        try:
+            await self.pubsub.aclose()
+        except Exception:
+            pass
+        self.pubsub = None
 
-        except Exception as e:
-            logging.error(f"Error saving discipline transition to database: {str(e)}")
-            return False
+    async def pubsub_listener_task(self) -> None:
+        """Dispatch channel messages in order, resubscribing after Redis errors."""
+        while True:
+            try:
+                if not self.pubsub.subscribed:
+                    await self.pubsub.subscribe(*self.pubsub_handlers)
+                async for message in self.pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    handler = self.pubsub_handlers.get(redis_text(message['channel']))
+                    if handler is None:
+                        continue
+                    try:
+                        result = handler(message['data'])
+                        if asyncio.iscoroutine(result):
+                            await result
+                    except Exception as e:
+                        logging.error(f"Error handling message on {redis_text(message['channel'])}: {str(e)}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Redis subscription failed: {str(e)}")
+                # Laps committed meanwhile were missed; reload them on demand
+                for session_id in list(self.lap_cache):
+                    self.evict_lap_times(session_id)
+                await asyncio.sleep(self.ingest_retry_backoff_ms / 1000)
+                try:
+                    await self.pubsub.aclose()
+                except Exception:
+                    pass
+                self.pubsub = self.redis_client.pubsub()
+
+    def build_gps_point_record(self, message_data: Dict[str, Any],
+                               heart_rate_device_id: Optional[int]) -> tuple:
+        """Convert a tracking point into the gps_tracking_points insert parameters."""
+        # Extract weather data
+        temperature = None
+        wind_speed = None
+        wind_direction = None
+        humidity = None
+        weather_timestamp = None
+        weather_code = None
+
+        if message_data.get('temperature') is not None:
+            temperature = float(message_data.get('temperature'))
+        if message_data.get('windSpeed') is not None:
+            wind_speed = float(message_data.get('windSpeed'))
+        if message_data.get('windDirection') is not None:
+            wind_direction = float(message_data.get('windDirection'))
+        if message_data.get('humidity') is not None:
+            humidity = int(message_data.get('humidity'))
+        if message_data.get('weatherTimestamp') is not None:
+            weather_timestamp = int(message_data.get('weatherTimestamp'))
+        if message_data.get('weatherCode') is not None:
+            weather_code = int(message_data.get('weatherCode'))
+
+        # Extract barometer data
+        pressure = None
+        pressure_accuracy = None
+        altitude_from_pressure = None
+        sea_level_pressure = None
+
+        if message_data.get('pressure') is not None:
+            pressure = float(message_data.get('pressure'))
+        if message_data.get('pressureAccuracy') is not None:
+            pressure_accuracy = int(message_data.get('pressureAccuracy'))
+        if message_data.get('altitudeFromPressure') is not None:
+            altitude_from_pressure = float(message_data.get('altitudeFromPressure'))
+        if message_data.get('seaLevelPressure') is not None:
+            sea_level_pressure = float(message_data.get('seaLevelPressure'))
+
+        # Log weather and barometer data for debugging
+        if temperature is not None or wind_speed is not None:
+            logging.info(f"Weather data received: temp={temperature}°C, wind={wind_speed}km/h {wind_direction}°, humidity={humidity}%, code={weather_code}")
+
+        if pressure is not None or altitude_from_pressure is not None:
+            logging.info(f"Barometer data received: pressure={pressure}hPa, altitude={altitude_from_pressure}m, accuracy={pressure_accuracy}, sea_level={sea_level_pressure}hPa")
+
+        return (
+            message_data.get('sessionId'),
+            float(message_data.get('latitude', 0)),
+            float(message_data.get('longitude', 0)),
+            float(message_data.get('altitude', 0)) if message_data.get('altitude') is not None else None,
+            float(message_data.get('horizontalAccuracy', 0)) if message_data.get('horizontalAccuracy') is not None else None,
+            float(message_data.get('verticalAccuracyMeters', 0)) if message_data.get('verticalAccuracyMeters') is not None else None,
+            int(message_data.get('numberOfSatellites', 0)) if message_data.get('numberOfSatellites') is not None else None,
+            int(message_data.get('usedNumberOfSatellites', 0)) if message_data.get('usedNumberOfSatellites') is not None else None,
+            float(message_data.get('currentSpeed', 0)),
+            float(message_data.get('averageSpeed', 0)),
+            float(message_data.get('maxSpeed', 0)),
+            float(message_data.get('movingAverageSpeed', 0)),
+            float(message_data.get('speed', 0)) if message_data.get('speed') is not None else float(message_data.get('currentSpeed', 0)),
+            float(message_data.get('speedAccuracyMetersPerSecond', 0)) if message_data.get('speedAccuracyMetersPerSecond') is not None else None,
+            float(message_data.get('distance', 0)),
+            float(message_data.get('coveredDistance', 0)) if message_data.get('coveredDistance') is not None else float(message_data.get('distance', 0)),
+            float(message_data.get('cumulativeElevationGain', 0)) if message_data.get('cumulativeElevationGain') is not None else None,
+            int(message_data.get('heartRate', 0)) if message_data.get('heartRate') and message_data.get('heartRate') > 0 else None,
+            max(0, min(254, int(message_data['cadence']))) if message_data.get('cadence') is not None else None,
+            heart_rate_device_id,
+            int(message_data.get('lap', 0)) if message_data.get('lap') is not None else 0,
+            temperature,
+            wind_speed,
+            wind_direction,
+            humidity,
+            weather_timestamp,
+            weather_code,
+            pressure,
+            pressure_accuracy,
+            altitude_from_pressure,
+            sea_level_pressure,
+            float(message_data.get('slope', 0)) if message_data.get('slope') is not None else None,
+            float(message_data.get('averageSlope', 0)) if message_data.get('averageSlope') is not None else None,
+            float(message_data.get('maxUphillSlope', 0)) if message_data.get('maxUphillSlope') is not None else None,
+            float(message_data.get('maxDownhillSlope', 0)) if message_data.get('maxDownhillSlope') is not None else None,
+            int(message_data['seq']) if message_data.get('seq') is not None else None,
+            str(message_data['seqEpoch'])[:64] if message_data.get('seqEpoch') is not None else None
+        )
 
-    async def save_tracking_data_to_db(self, message_data: Dict[str, Any]) -> bool:
-        """Save tracking data to normalized PostgreSQL database with weather and barometer data in gps_tracking_points."""
+    async def save_tracking_batch_to_db(self, points: List[Dict[str, Any]], split: bool = True) -> int:
+        """Save a batch of tracking points and return how many were written.
+
+        The batch is written in one transaction. If that fails while the
+        database is reachable, every session is retried on its own and the
+        points of a failing session one by one, so only the points that
+        cannot be stored are lost. With split=False a failed batch returns
+        0 for callers that keep it for a retry.
+        """
         if not self.db_pool:
             logging.error("Database pool not initialized")
-            return False
+            return 0
+
+        if not points:
+            return 0
 
         try:
-            async with self.db_pool.acquire() as conn:
-                async with conn.transaction():
-                    # Get or create user
-                    firstname = message_data.get('firstname', message_data.get('person', ''))
-                    lastname = message_data.get('lastname', '')
-                    birthdate = message_data.get('birthdate', '')
-                    height = float(message_data.get('height', 0)) if message_data.get('height') else None
-                    weight = float(message_data.get('weight', 0)) if message_data.get('weight') else None
-                    bmi = float(message_data.get('bmi', 0)) if message_data.get('bmi') else None
-
-                    user_id = await self.get_or_create_user(
-                        conn, firstname, lastname, birthdate, height, weight, bmi
-                    )
+            return await self.insert_tracking_batch(points)
+        except Exception as e:
+            # IDs or metadata cached inside the rolled-back transaction may not
+            # exist in PostgreSQL, so start over from the database.
+            self.clear_identity_caches()
+            logging.error(f"Error saving tracking batch to normalized database: {str(e)}")
+
+        if len(points) == 1 or not split or not await self.database_is_available():
+            logging.error(
+                "Batch that failed to save: %s points for sessions %s",
+                len(points),
+                sorted({str(point.get('sessionId')) for point in points})
+            )
+            return 0
+
+        sessions: Dict[Any, List[Dict[str, Any]]] = {}
+        for point in points:
+            sessions.setdefault(point.get('sessionId'), []).append(point)
+        if len(sessions) > 1:
+            groups = list(sessions.values())
+        else:
+            groups = [[point] for point in points]
+        logging.info(f"Retrying the failed batch of {len(points)} points in {len(groups)} parts")
+
+        saved = 0
+        for group in groups:
+            saved += await self.save_tracking_batch_to_db(group)
+        return saved
+
+    async def insert_tracking_batch(self, points: List[Dict[str, Any]]) -> int:
+        """Insert tracking points in one transaction and return how many were written.
+
+        Points are inserted in the order given, so points of one session keep
+        their arrival order. Users, sessions and devices are resolved once per
+        batch, and session metadata updates are merged per session. Lap
+        detection state only changes once the transaction has committed.
+        """
+        lap_updates = []
+        lap_states: Dict[str, tuple] = {}
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                session_user_ids: Dict[str, int] = {}
+                device_ids: Dict[str, Optional[int]] = {}
+                records = []
+                saved_points = []
 
-                    # Get or create session
+                for message_data in points:
                     session_id = message_data.get('sessionId')
-                    await self.get_or_create_session(conn, session_id, user_id, message_data)
+
+                    if session_id not in session_user_ids:
+                        # Get or create user
+                        firstname = message_data.get('firstname', message_data.get('person', ''))
+                        lastname = message_data.get('lastname', '')
+                        birthdate = message_data.get('birthdate', '')
+                        height = float(message_data.get('height', 0)) if message_data.get('height') else None
+                        weight = float(message_data.get('weight', 0)) if message_data.get('weight') else None
+                        bmi = float(message_data.get('bmi', 0)) if message_data.get('bmi') else None
+
+                        user_id = await self.get_or_create_user(
+                            conn, firstname, lastname, birthdate, height, weight, bmi
+                        )
+
+                        # Get or create session
+                        await self.get_or_create_session(conn, session_id, user_id, message_data)
+                        session_user_ids[session_id] = user_id
 
                     # Get heart rate device if present
                     heart_rate_device_id = None
-                    if message_data.get('heartRateDevice'):
-                        heart_rate_device_id = await self.get_or_create_heart_rate_device(
-                            conn, message_data.get('heartRateDevice')
-                        )
+                    device_name = message_data.get('heartRateDevice')
+                    if device_name:
+                        if device_name not in device_ids:
+                            device_ids[device_name] = await self.get_or_create_heart_rate_device(
+                                conn, device_name
+                            )
+                        heart_rate_device_id = device_ids[device_name]
 
-                    # Extract weather data
-                    temperature = None
-                    wind_speed = None
-                    wind_direction = None
-                    humidity = None
-                    weather_timestamp = None
-                    weather_code = None
-
-                    if message_data.get('temperature') is not None:
-                        temperature = float(message_data.get('temperature'))
-                    if message_data.get('windSpeed') is not None:
-                        wind_speed = float(message_data.get('windSpeed'))
-                    if message_data.get('windDirection') is not None:
-                        wind_direction = float(message_data.get('windDirection'))
-                    if message_data.get('humidity') is not None:
-                        humidity = int(message_data.get('humidity'))
-                    if message_data.get('weatherTimestamp') is not None:
-                        weather_timestamp = int(message_data.get('weatherTimestamp'))
-                    if message_data.get('weatherCode') is not None:
-                        weather_code = int(message_data.get('weatherCode'))
-
-                    # Extract barometer data
-                    pressure = None
-                    pressure_accuracy = None
-                    altitude_from_pressure = None
-                    sea_level_pressure = None
-
-                    if message_data.get('pressure') is not None:
-                        pressure = float(message_data.get('pressure'))
-                    if message_data.get('pressureAccuracy') is not None:
-                        pressure_accuracy = int(message_data.get('pressureAccuracy'))
-                    if message_data.get('altitudeFromPressure') is not None:
-                        altitude_from_pressure = float(message_data.get('altitudeFromPressure'))
-                    if message_data.get('seaLevelPressure') is not None:
-                        sea_level_pressure = float(message_data.get('seaLevelPressure'))
-
-                    # Log weather and barometer data for debugging
-                    if temperature is not None or wind_speed is not None:
-                        logging.info(f"Weather data received: temp={temperature}°C, wind={wind_speed}km/h {wind_direction}°, humidity={humidity}%, code={weather_code}")
-
-                    if pressure is not None or altitude_from_pressure is not None:
-                        logging.info(f"Barometer data received: pressure={pressure}hPa, altitude={altitude_from_pressure}m, accuracy={pressure_accuracy}, sea_level={sea_level_pressure}hPa")
-
-                    # Insert GPS tracking point with weather and barometer data
-                    await conn.execute("""
-                        INSERT INTO gps_tracking_points (
-                            session_id, latitude, longitude, altitude, horizontal_accuracy,
-                            vertical_accuracy_meters, number_of_satellites,
-                            used_number_of_satellites, current_speed, average_speed, max_speed,
-                            moving_average_speed, speed, speed_accuracy_meters_per_second,
-                            distance, covered_distance, cumulative_elevation_gain, heart_rate,
-                            cadence, heart_rate_device_id, lap, temperature, wind_speed, wind_direction,
-                            humidity, weather_timestamp, weather_code,
-                            pressure, pressure_accuracy, altitude_from_pressure, sea_level_pressure,
-                            slope, average_slope, max_uphill_slope, max_downhill_slope
-                        ) VALUES (
-                            $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15,
-                            $16, $17, $18, $19, $20, $21, $22, $23, $24, $25, $26,
-                            $27, $28, $29, $30, $31, $32, $33, $34, $35
-                        )
-                    """,
-                                       session_id,
-                                       float(message_data.get('latitude', 0)),
-                                       float(message_data.get('longitude', 0)),
-                                       float(message_data.get('altitude', 0)) if message_data.get('altitude') is not None else None,
-                                       float(message_data.get('horizontalAccuracy', 0)) if message_data.get('horizontalAccuracy') is not None else None,
-                                       float(message_data.get('verticalAccuracyMeters', 0)) if message_data.get('verticalAccuracyMeters') is not None else None,
-                                       int(message_data.get('numberOfSatellites', 0)) if message_data.get('numberOfSatellites') is not None else None,
-                                       int(message_data.get('usedNumberOfSatellites', 0)) if message_data.get('usedNumberOfSatellites') is not None else None,
-                                       float(message_data.get('currentSpeed', 0)),
-                                       float(message_data.get('averageSpeed', 0)),
-                                       float(message_data.get('maxSpeed', 0)),
-                                       float(message_data.get('movingAverageSpeed', 0)),
-                                       float(message_data.get('speed', 0)) if message_data.get('speed') is not None else float(message_data.get('currentSpeed', 0)),
-                                       float(message_data.get('speedAccuracyMetersPerSecond', 0)) if message_data.get('speedAccuracyMetersPerSecond') is not None else None,
-                                       float(message_data.get('distance', 0)),
-                                       float(message_data.get('coveredDistance', 0)) if message_data.get('coveredDistance') is not None else float(message_data.get('distance', 0)),
-                                       float(message_data.get('cumulativeElevationGain', 0)) if message_data.get('cumulativeElevationGain') is not None else None,
-                                       int(message_data.get('heartRate', 0)) if message_data.get('heartRate') and message_data.get('heartRate') > 0 else None,
-                                       max(0, min(254, int(message_data['cadence']))) if message_data.get('cadence') is not None else None,
-                                       heart_rate_device_id,
-                                       int(message_data.get('lap', 0)) if message_data.get('lap') is not None else 0,
-                                       temperature,
-                                       wind_speed,
-                                       wind_direction,
-                                       humidity,
-                                       weather_timestamp,
-                                       weather_code,
-                                       pressure,
-                                       pressure_accuracy,
-                                       altitude_from_pressure,
-                                       sea_level_pressure,
-                                       float(message_data.get('slope', 0)) if message_data.get('slope') is not None else None,
-                                       float(message_data.get('averageSlope', 0)) if message_data.get('averageSlope') is not None else None,
-                                       float(message_data.get('maxUphillSlope', 0)) if message_data.get('maxUphillSlope') is not None else None,
-                                       float(message_data.get('maxDownhillSlope', 0)) if message_data.get('maxDownhillSlope') is not None else None
-                                       )
+                    try:
+                        records.append(self.build_gps_point_record(message_data, heart_rate_device_id))
+                        saved_points.append(message_data)
+                    except (TypeError, ValueError) as e:
+                        logging.error(f"Skipping malformed tracking point for session {session_id}: {str(e)}")
+
+                # Insert GPS tracking points with weather and barometer data
+                await conn.executemany("""
+                    INSERT INTO gps_tracking_points (
+                        session_id, latitude, longitude, altitude, horizontal_accuracy,
+                        vertical_accuracy_meters, number_of_satellites,
+                        used_number_of_satellites, current_speed, average_speed, max_speed,
+                        moving_average_speed, speed, speed_accuracy_meters_per_second,
+                        distance, covered_distance, cumulative_elevation_gain, heart_rate,
+                        cadence, heart_rate_device_id, lap, temperature, wind_speed, wind_direction,
+                        humidity, weather_timestamp, weather_code,
+                        pressure, pressure_accuracy, altitude_from_pressure, sea_level_pressure,
+                        slope, average_slope, max_uphill_slope, max_downhill_slope, seq, seq_epoch
+                    ) VALUES (
+                        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15,
+                        $16, $17, $18, $19, $20, $21, $22, $23, $24, $25, $26,
+                        $27, $28, $29, $30, $31, $32, $33, $34, $35, $36, $37
+                    )
+                    ON CONFLICT (session_id, (COALESCE(seq_epoch, '')), seq) WHERE seq IS NOT NULL DO NOTHING
+                """, records)
+
+                latest_session_metadata: Dict[str, Dict[str, Any]] = {}
+                for message_data in saved_points:
+                    session_id = message_data.get('sessionId')
+                    user_id = session_user_ids[session_id]
 
                     # Process lap times if they exist in the message
                     if message_data.get('lapTimes') and isinstance(message_data['lapTimes'], list):
-                        await self.save_lap_times(conn, session_id, user_id, message_data['lapTimes'])
-
-                    # Server-side lap detection fallback: if the app didn't send
-                    # lapTimes but the 'lap' field increased, auto-create lap_time
-                    # records.  This covers cases where ForegroundService's
-                    # syncLapFromMetrics silently skips (e.g. FS.lap already matches
-                    # CLL.lap after state restoration).
-                    current_lap = int(message_data.get('lap', 0))
-                    if current_lap > 0 and not (message_data.get('lapTimes') and isinstance(message_data['lapTimes'], list)):
-                        prev_lap = self.session_last_lap.get(session_id, 0)
-                        now_ms = int(datetime.datetime.now().timestamp() * 1000)
-
-                        if prev_lap == 0 and current_lap >= 1:
-                            # First tracking point for this session (or first
-                            # time server sees it).  Seed the lap start time and
-                            # back-fill any laps we missed (current_lap could
-                            # already be > 1 if the server restarted mid-session).
-                            # Check which laps already exist in the DB.
-                            existing_max = await conn.fetchval(
-                                "SELECT COALESCE(MAX(lap_number), 0) FROM lap_times WHERE session_id = $1",
-                                session_id
-                            )
-                            if current_lap > existing_max:
-                                # Derive the session start time from startDateTime
-                                # so the first lap has a real duration instead of 0.
-                                session_start_ms = now_ms
-                                start_dt_str = message_data.get('startDateTime', '')
-                                if start_dt_str:
-                                    try:
-                                        tz_offset_hours = float(message_data.get('timezoneOffsetHours', 0))
-                                        tz = datetime.timezone(datetime.timedelta(hours=tz_offset_hours))
-                                        # Parse ISO local datetime and attach the device timezone
-                                        dt = datetime.datetime.fromisoformat(start_dt_str).replace(tzinfo=tz)
-                                        session_start_ms = int(dt.timestamp() * 1000)
-                                    except Exception as e:
-                                        logging.warning(f"Could not parse startDateTime '{start_dt_str}': {e}")
-
-                                laps_to_fill = current_lap - existing_max
-                                # Spread time evenly across missed laps
-                                total_span = now_ms - session_start_ms
-                                lap_duration = total_span // laps_to_fill if laps_to_fill > 0 and total_span > 0 else 0
-
-                                for idx, lap_num in enumerate(range(existing_max + 1, current_lap + 1)):
-                                    lap_start_ms = session_start_ms + idx * lap_duration
-                                    lap_end_ms = session_start_ms + (idx + 1) * lap_duration
-                                    await conn.execute("""
-                                        INSERT INTO lap_times (session_id, user_id, lap_number, start_time, end_time, distance)
-                                        VALUES ($1, $2, $3, $4, $5, $6)
-                                        ON CONFLICT (session_id, lap_number) DO NOTHING
-                                    """, session_id, user_id, lap_num, lap_start_ms, lap_end_ms, 1.0)
-                                logging.info(f"Server-side lap backfill: session {session_id} laps {existing_max+1}..{current_lap}")
-                            self.session_lap_start_time[session_id] = now_ms
-
-                        elif current_lap > prev_lap:
-                            # Lap increased — save new lap(s)
-                            lap_start = self.session_lap_start_time.get(session_id, now_ms)
-                            laps_to_fill = current_lap - prev_lap
-                            total_span = now_ms - lap_start
-                            lap_duration = total_span // laps_to_fill if laps_to_fill > 0 and total_span > 0 else 0
-
-                            for idx, lap_num in enumerate(range(prev_lap + 1, current_lap + 1)):
-                                lap_start_ms = lap_start + idx * lap_duration
-                                lap_end_ms = lap_start + (idx + 1) * lap_duration
-                                await conn.execute("""
-                                    INSERT INTO lap_times (session_id, user_id, lap_number, start_time, end_time, distance)
-                                    VALUES ($1, $2, $3, $4, $5, $6)
-                                    ON CONFLICT (session_id, lap_number) DO NOTHING
-                                """, session_id, user_id, lap_num, lap_start_ms, lap_end_ms, 1.0)
-                            logging.info(f"Server-side lap detect: session {session_id} laps {prev_lap+1}..{current_lap}")
-                            self.session_lap_start_time[session_id] = now_ms
-
-                        self.session_last_lap[session_id] = current_lap
-
-                    # Update session location geocoding data if present
-                    start_city = message_data.get('startCity')
-                    start_country = message_data.get('startCountry')
-                    start_address = message_data.get('startAddress')
-                    end_city = message_data.get('endCity')
-                    end_country = message_data.get('endCountry')
-                    end_address = message_data.get('endAddress')
-
-                    if any([start_city, start_country, start_address, end_city, end_country, end_address]):
-                        await conn.execute("""
-                            UPDATE tracking_sessions SET
-                                start_city = COALESCE($2, start_city),
-                                start_country = COALESCE($3, start_country),
-                                start_address = COALESCE($4, start_address),
-                                end_city = COALESCE($5, end_city),
-                                end_country = COALESCE($6, end_country),
-                                end_address = COALESCE($7, end_address),
-                                updated_at = NOW()
-                            WHERE session_id = $1
-                        """, session_id, start_city, start_country, start_address, end_city, end_country, end_address)
-                        logging.info(f"Updated location geocoding data for session {session_id}: start={start_address or f'{start_city}, {start_country}'}, end={end_address or f'{end_city}, {end_country}'}")
-
-                    # Update app_version whenever a new or changed version is received
-                    app_version = message_data.get('version') or None
-                    if app_version:
-                        await conn.execute("""
-                            UPDATE tracking_sessions SET app_version = $2, updated_at = NOW()
-                            WHERE session_id = $1 AND (app_version IS NULL OR app_version != $2)
-                        """, session_id, app_version)
-
-            logging.info(f"Successfully saved normalized tracking data with barometer data for session {session_id}")
-            return True
+                        saved_laps = await self.save_lap_times(conn, session_id, user_id, message_data['lapTimes'])
+                        lap_updates.append((session_id, saved_laps, True))
+                    else:
+                        detected_laps = await self.detect_server_side_laps(
+                            conn, session_id, user_id, message_data, lap_states
+                        )
+                        if detected_laps:
+                            lap_updates.append((session_id, detected_laps, False))
+
+                    # Keep the newest non-empty geocoding and version values per session
+                    session_metadata = latest_session_metadata.setdefault(session_id, {})
+                    for field in ('startCity', 'startCountry', 'startAddress',
+                                  'endCity', 'endCountry', 'endAddress', 'version'):
+                        if message_data.get(field):
+                            session_metadata[field] = message_data[field]
+
+                for session_id, session_metadata in latest_session_metadata.items():
+                    await self.update_session_metadata(conn, session_id, session_metadata)
+
+        # Only committed laps go into the lap cache and the lap detection state
+        for session_id, (last_lap, lap_start_time) in lap_states.items():
+            state = self.sessions.touch(session_id)
+            state.last_lap = last_lap
+            state.lap_start_time = lap_start_time
+        for session_id, lap_times, replace in lap_updates:
+            self.record_lap_times(session_id, lap_times, replace)
+        if lap_updates and self.publish_lap_updates:
+            await self.publish_lap_times(lap_updates)
 
-        except Exception as e:
-            logging.error(f"Error saving tracking data to normalized database: {str(e)}")
-            logging.error(f"Data that failed to save: {json.dumps(message_data, indent=2)}")
-            return False
+        logging.info(
+            f"Saved {len(records)} tracking points for {len(session_user_ids)} sessions "
+            f"in one batch"
+        )
+        return len(records)
+
+    def clear_identity_caches(self) -> None:
+        """Forget all cached user, session and heart-rate device identities."""
+        self.user_cache.clear()
+        self.session_cache.clear()
+        self.heart_rate_device_cache.clear()
+
+    async def detect_server_side_laps(self, conn, session_id: str, user_id: int,
+                                      message_data: Dict[str, Any],
+                                      lap_states: Dict[str, tuple]) -> List[Dict[str, Any]]:
+        """Create lap_times rows when the 'lap' counter increases without app lap times.
+
+        The lap detection state of the session is read from and written to
+        lap_states, as (last_lap, lap_start_time), and is only copied to the
+        session once the transaction commits. Returns the laps that were
+        inserted, for the lap cache.
+        """
+        # Server-side lap detection fallback: if the app didn't send
+        # lapTimes but the 'lap' field increased, auto-create lap_time
+        # records.  This covers cases where ForegroundService's
+        # syncLapFromMetrics silently skips (e.g. FS.lap already matches
+        # CLL.lap after state restoration).
+        current_lap = int(message_data.get('lap', 0))
+        if current_lap <= 0:
+            return []
 
-    async def load_tracking_history_from_db(self) -> int:
-        """Load recent tracking history from normalized database using configurable retention period."""
-        if not self.db_pool:
-            logging.warning("Database pool not initialized, skipping history load")
-            return 0
+        detected_laps = []
+        if session_id not in lap_states:
+            state = self.sessions.get(session_id)
+            lap_states[session_id] = (state.last_lap, state.lap_start_time) if state else (0, None)
+        prev_lap, lap_start_time = lap_states[session_id]
+        now_ms = int(datetime.datetime.now().timestamp() * 1000)
+
+        if prev_lap == 0 and current_lap >= 1:
+            # First tracking point for this session (or first
+            # time server sees it).  Seed the lap start time and
+            # back-fill any laps we missed (current_lap could
+            # already be > 1 if the server restarted mid-session).
+            # Check which laps already exist in the DB.
+            existing_max = await conn.fetchval(
+                "SELECT COALESCE(MAX(lap_number), 0) FROM lap_times WHERE session_id = $1",
+                session_id
+            )
+            if current_lap > existing_max:
+                # Derive the session start time from startDateTime
+                # so the first lap has a real duration instead of 0.
+                session_start_ms = now_ms
+                start_dt_str = message_data.get('startDateTime', '')
+                if start_dt_str:
+                    try:
+                        tz_offset_hours = float(message_data.get('timezoneOffsetHours', 0))
+                        tz = datetime.timezone(datetime.timedelta(hours=tz_offset_hours))
+                        # Parse ISO local datetime and attach the device timezone
+                        dt = datetime.datetime.fromisoformat(start_dt_str).replace(tzinfo=tz)
+                        session_start_ms = int(dt.timestamp() * 1000)
+                    except Exception as e:
+                        logging.warning(f"Could not parse startDateTime '{start_dt_str}': {e}")
 
-        try:
-            # Use an offset-aware cutoff and restore only points that still
-            # belong to the configured live-history window.
-            cutoff_time = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=self.data_retention_hours)
-
-            query = """
-                SELECT
-                    gtp.session_id,
-                    u.firstname, u.lastname, u.birthdate, u.height, u.weight, u.bmi,
-                    s.event_name, s.sport_type, s.comment, s.clothing, s.app_version,
-                    s.start_city, s.start_country, s.start_address,
-                    s.end_city, s.end_country, s.end_address,
-                    gtp.latitude, gtp.longitude, gtp.altitude,
-                    gtp.current_speed, gtp.average_speed, gtp.max_speed, gtp.moving_average_speed,
-                    gtp.distance, gtp.cumulative_elevation_gain, gtp.heart_rate, gtp.cadence, hrd.device_name as heart_rate_device,
-                    gtp.temperature, gtp.wind_speed, gtp.wind_direction,
-                    gtp.humidity, gtp.weather_timestamp, gtp.weather_code,
-                    gtp.pressure, gtp.pressure_accuracy, gtp.altitude_from_pressure, gtp.sea_level_pressure,
-                    gtp.slope, gtp.average_slope, gtp.max_uphill_slope, gtp.max_downhill_slope,
-                    gtp.received_at,
-                    s.start_date_time
-                FROM gps_tracking_points gtp
-                JOIN tracking_sessions s ON gtp.session_id = s.session_id
-                JOIN users u ON s.user_id = u.user_id
-                LEFT JOIN heart_rate_devices hrd ON gtp.heart_rate_device_id = hrd.device_id
-                WHERE gtp.received_at >= $1
-                ORDER BY gtp.session_id, gtp.received_at
-            """
+                laps_to_fill = current_lap - existing_max
+                # Spread time evenly across missed laps
+                total_span = now_ms - session_start_ms
+                lap_duration = total_span // laps_to_fill if laps_to_fill > 0 and total_span > 0 else 0
 
-            async with self.db_pool.acquire() as conn:
-                rows = await conn.fetch(query, cutoff_time)
+                for idx, lap_num in enumerate(range(existing_max + 1, current_lap + 1)):
+                    lap_start_ms = session_start_ms + idx * lap_duration
+                    lap_end_ms = session_start_ms + (idx + 1) * lap_duration
+                    await conn.execute("""
+                        INSERT INTO lap_times (session_id, user_id, lap_number, start_time, end_time, distance)
+                        VALUES ($1, $2, $3, $4, $5, $6)
+                        ON CONFLICT (session_id, lap_number) DO NOTHING
+                    """, session_id, user_id, lap_num, lap_start_ms, lap_end_ms, 1.0)
+                    detected_laps.append(self.build_lap_time(lap_num, lap_start_ms, lap_end_ms, 1.0))
+                logging.info(f"Server-side lap backfill: session {session_id} laps {existing_max+1}..{current_lap}")
+            lap_start_time = now_ms
+
+        elif current_lap > prev_lap:
+            # Lap increased — save new lap(s)
+            lap_start = lap_start_time if lap_start_time is not None else now_ms
+            laps_to_fill = current_lap - prev_lap
+            total_span = now_ms - lap_start
+            lap_duration = total_span // laps_to_fill if laps_to_fill > 0 and total_span > 0 else 0
+
+            for idx, lap_num in enumerate(range(prev_lap + 1, current_lap + 1)):
+                lap_start_ms = lap_start + idx * lap_duration
+                lap_end_ms = lap_start + (idx + 1) * lap_duration
+                await conn.execute("""
+                    INSERT INTO lap_times (session_id, user_id, lap_number, start_time, end_time, distance)
+                    VALUES ($1, $2, $3, $4, $5, $6)
+                    ON CONFLICT (session_id, lap_number) DO NOTHING
+                """, session_id, user_id, lap_num, lap_start_ms, lap_end_ms, 1.0)
+                detected_laps.append(self.build_lap_time(lap_num, lap_start_ms, lap_end_ms, 1.0))
+            logging.info(f"Server-side lap detect: session {session_id} laps {prev_lap+1}..{current_lap}")
+            lap_start_time = now_ms
 
-            # Clear existing memory before loading fresh data
-            self.tracking_history.clear()
+        lap_states[session_id] = (current_lap, lap_start_time)
+        return detected_laps
 
-            # Convert database rows to the format expected by the websocket clients
-            for row in rows:
-                tracking_point = {
-                    "timestamp": row['received_at'].strftime(self.timestamp_format),
-                    "sessionId": row['session_id'],
-                    "firstname": row['firstname'],
-                    "lastname": row['lastname'] or '',
-                    "birthdate": (
-                        row['birthdate'].isoformat()
-                        if hasattr(row['birthdate'], 'isoformat')
-                        else str(row['birthdate'] or '')
-                    ),
-                    "height": float(row['height']) if row['height'] is not None else 0.0,
-                    "weight": float(row['weight']) if row['weight'] is not None else 0.0,
-                    "bmi": float(row['bmi']) if row['bmi'] is not None else 0.0,
-                    "eventName": row['event_name'] or '',
-                    "sportType": row['sport_type'] or '',
-                    "comment": row['comment'] or '',
-                    "clothing": row['clothing'] or '',
-                    "version": row['app_version'] or '',
-                    "startCity": row['start_city'] or '',
-                    "startCountry": row['start_country'] or '',
-                    "startAddress": row['start_address'] or '',
-                    "endCity": row['end_city'] or '',
-                    "endCountry": row['end_country'] or '',
-                    "endAddress": row['end_address'] or '',
-                    "latitude": float(row['latitude']),
-                    "longitude": float(row['longitude']),
-                    "altitude": float(row['altitude']) if row['altitude'] is not None else 0.0,
-                    "currentSpeed": float(row['current_speed']) if row['current_speed'] else 0.0,
-                    "maxSpeed": float(row['max_speed']) if row['max_speed'] else 0.0,
-                    "movingAverageSpeed": float(row['moving_average_speed']) if row['moving_average_speed'] else 0.0,
-                    "averageSpeed": float(row['average_speed']) if row['average_speed'] else 0.0,
-                    "distance": float(row['distance']) if row['distance'] else 0.0,
-                    "cumulativeElevationGain": float(row['cumulative_elevation_gain']) if row['cumulative_elevation_gain'] is not None else 0.0,
-                    "slope": float(row['slope']) if row['slope'] is not None else 0.0,
-                    "averageSlope": float(row['average_slope']) if row['average_slope'] is not None else 0.0,
-                    "maxUphillSlope": float(row['max_uphill_slope']) if row['max_uphill_slope'] is not None else 0.0,
-                    "maxDownhillSlope": float(row['max_downhill_slope']) if row['max_downhill_slope'] is not None else 0.0,
-                    # Keep 'person' for backward compatibility
-                    "person": row['firstname'],
-                    "startDateTime": row['start_date_time'].isoformat() if row['start_date_time'] else None
-                }
+    async def update_session_metadata(self, conn, session_id: str,
+                                      session_metadata: Dict[str, Any]) -> None:
+        """Write geocoding results and the app version reported for a session.
 
-                # Add heart rate data if available
-                if row['heart_rate'] and row['heart_rate'] > 0:
-                    tracking_point["heartRate"] = int(row['heart_rate'])
-                if row['cadence'] is not None:
-                    tracking_point["cadence"] = int(row['cadence'])
-                if row['heart_rate_device']:
-                    tracking_point["heartRateDevice"] = row['heart_rate_device']
+        Values already written for the session (per the identity cache) are
+        skipped, so steady-state points cause no UPDATE at all.
+        """
+        written_metadata = self.session_cache.get(session_id)
+        if written_metadata is not None:
+            session_metadata = {
+                field: value for field, value in session_metadata.items()
+                if written_metadata.get(field) != value
+            }
+            if not session_metadata:
+                return
+
+        # Update session location geocoding data if present
+        start_city = session_metadata.get('startCity')
+        start_country = session_metadata.get('startCountry')
+        start_address = session_metadata.get('startAddress')
+        end_city = session_metadata.get('endCity')
+        end_country = session_metadata.get('endCountry')
+        end_address = session_metadata.get('endAddress')
+
+        if any([start_city, start_country, start_address, end_city, end_country, end_address]):
+            await conn.execute("""
+                UPDATE tracking_sessions SET
+                    start_city = COALESCE($2, start_city),
+                    start_country = COALESCE($3, start_country),
+                    start_address = COALESCE($4, start_address),
+                    end_city = COALESCE($5, end_city),
+                    end_country = COALESCE($6, end_country),
+                    end_address = COALESCE($7, end_address),
+                    updated_at = NOW()
+                WHERE session_id = $1
+            """, session_id, start_city, start_country, start_address, end_city, end_country, end_address)
+            logging.info(f"Updated location geocoding data for session {session_id}: start={start_address or f'{start_city}, {start_country}'}, end={end_address or f'{end_city}, {end_country}'}")
+
+        # Update app_version whenever a new or changed version is received
+        app_version = session_metadata.get('version') or None
+        if app_version:
+            await conn.execute("""
+                UPDATE tracking_sessions SET app_version = $2, updated_at = NOW()
+                WHERE session_id = $1 AND (app_version IS NULL OR app_version != $2)
+            """, session_id, app_version)
 
-                # Add weather data if available
-                if row['temperature'] is not None:
-                    tracking_point["temperature"] = float(row['temperature'])
-                if row['wind_speed'] is not None:
-                    tracking_point["windSpeed"] = float(row['wind_speed'])
-                if row['wind_direction'] is not None:
-                    wind_dir = row['wind_direction']
-                    if isinstance(wind_dir, (int, float)):
-                        tracking_point["windDirection"] = float(wind_dir)
-                    else:
-                        tracking_point["windDirection"] = float(wind_dir) if str(wind_dir).replace('.', '').isdigit() else 0
-                if row['humidity'] is not None:
-                    tracking_point["relativeHumidity"] = int(row['humidity'])
-                if row['weather_timestamp'] is not None:
-                    tracking_point["weatherTimestamp"] = int(row['weather_timestamp'])
-                if row['weather_code'] is not None:
-                    tracking_point["weatherCode"] = int(row['weather_code'])
+        if written_metadata is not None:
+            self.session_cache.set(session_id, {**written_metadata, **session_metadata})
 
-                # Add barometer data if available
-                if row['pressure'] is not None:
-                    tracking_point["pressure"] = float(row['pressure'])
-                if row['pressure_accuracy'] is not None:
-                    tracking_point["pressureAccuracy"] = int(row['pressure_accuracy'])
-                if row['altitude_from_pressure'] is not None:
-                    tracking_point["altitudeFromPressure"] = float(row['altitude_from_pressure'])
-                if row['sea_level_pressure'] is not None:
-                    tracking_point["seaLevelPressure"] = float(row['sea_level_pressure'])
+    async def iter_tracking_points_from_db(self, batch_size: int):
+        """Yield the recent tracking history from the normalized database in batches.
 
-                # Note: slope data is now added directly in tracking_point creation above
+        Rows are read through a server-side cursor in session and time order,
+        so the retention window is never held in memory at once.
+        """
+        if not self.db_pool:
+            logging.warning("Database pool not initialized, skipping history load")
+            return
 
-                self.tracking_history[row['session_id']].append(tracking_point)
+        # Use an offset-aware cutoff and restore only points that still
+        # belong to the configured live-history window.
+        cutoff_time = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=self.data_retention_hours)
 
-            logging.info(f"Loaded {len(rows)} tracking points from database (last {self.data_retention_hours} hours)")
-            return len(rows)
+        query = """
+            SELECT
+                gtp.session_id,
+                u.firstname, u.lastname, u.birthdate, u.height, u.weight, u.bmi,
+                s.event_name, s.sport_type, s.comment, s.clothing, s.app_version,
+                s.start_city, s.start_country, s.start_address,
+                s.end_city, s.end_country, s.end_address,
+                gtp.latitude, gtp.longitude, gtp.altitude,
+                gtp.current_speed, gtp.average_speed, gtp.max_speed, gtp.moving_average_speed,
+                gtp.distance, gtp.cumulative_elevation_gain, gtp.heart_rate, gtp.cadence, hrd.device_name as heart_rate_device,
+                gtp.temperature, gtp.wind_speed, gtp.wind_direction,
+                gtp.humidity, gtp.weather_timestamp, gtp.weather_code,
+                gtp.pressure, gtp.pressure_accuracy, gtp.altitude_from_pressure, gtp.sea_level_pressure,
+                gtp.slope, gtp.average_slope, gtp.max_uphill_slope, gtp.max_downhill_slope,
+                gtp.received_at,
+                s.start_date_time
+            FROM gps_tracking_points gtp
+            JOIN tracking_sessions s ON gtp.session_id = s.session_id
+            JOIN users u ON s.user_id = u.user_id
+            LEFT JOIN heart_rate_devices hrd ON gtp.heart_rate_device_id = hrd.device_id
+            WHERE gtp.received_at >= $1
+            ORDER BY gtp.session_id, gtp.received_at
+        """
 
-        except Exception as e:
-            logging.error(f"Error loading tracking history from normalized database: {str(e)}")
-            return 0
+        loaded_count = 0
+        codec = DbPointCodec(self.timestamp_format)
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                batch = []
+                async for row in conn.cursor(query, cutoff_time, prefetch=batch_size):
+                    batch.append(codec.decode(row))
+                    if len(batch) >= batch_size:
+                        loaded_count += len(batch)
+                        yield batch
+                        batch = []
+                if batch:
+                    loaded_count += len(batch)
+                    yield batch
+
+        logging.info(f"Loaded {loaded_count} tracking points from database (last {self.data_retention_hours} hours)")
 
     async def get_weather_data_for_session(self, session_id: str) -> List[Dict[str, Any]]:
         """Retrieve weather data from GPS tracking points for a specific session."""
@@ -1717,10 +4385,16 @@ class TrackingServer:
             logging.error(f"Error retrieving weather data for session {session_id}: {str(e)}")
             return []
 
-    async def save_lap_times(self, conn, session_id: str, user_id: int, lap_times_data: List[Dict[str, Any]]):
-        """Save lap times data to the database."""
+    async def save_lap_times(self, conn, session_id: str, user_id: int,
+                             lap_times_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Save lap times data to the database and return the saved laps."""
         try:
+            saved_laps = []
             for lap_time in lap_times_data:
+                lap_number = int(lap_time.get('lapNumber'))
+                start_time = int(lap_time.get('startTime'))
+                end_time = int(lap_time.get('endTime'))
+                distance = float(lap_time.get('distance', 1.0))
                 await conn.execute("""
                     INSERT INTO lap_times (session_id, user_id, lap_number, start_time, end_time, distance)
                     VALUES ($1, $2, $3, $4, $5, $6)
@@ -1731,24 +4405,69 @@ class TrackingServer:
                 """,
                     session_id,
                     user_id,
-                    int(lap_time.get('lapNumber')),
-                    int(lap_time.get('startTime')),
-                    int(lap_time.get('endTime')),
-                    float(lap_time.get('distance', 1.0))
+                    lap_number,
+                    start_time,
+                    end_time,
+                    distance
                 )
-            
+                saved_laps.append(self.build_lap_time(lap_number, start_time, end_time, distance))
+
             logging.info(f"Successfully saved {len(lap_times_data)} lap times for session {session_id}")
+            return saved_laps
 
         except Exception as e:
             logging.error(f"Error saving lap times for session {session_id}: {str(e)}")
             raise
 
+    def build_lap_time(self, lap_number: int, start_time: int, end_time: int,
+                       distance: float, created_at: Optional[str] = None) -> Dict[str, Any]:
+        """Build a lap time entry in the shape clients receive it."""
+        return {
+            "lapNumber": lap_number,
+            "startTime": start_time,
+            "endTime": end_time,
+            "duration": end_time - start_time,
+            "distance": distance,
+            "createdAt": created_at or datetime.datetime.now().isoformat()
+        }
+
+    def record_lap_times(self, session_id: str, lap_times: List[Dict[str, Any]], replace: bool) -> None:
+        """Apply committed lap times to the lap cache of a session.
+
+        Laps inserted with ON CONFLICT DO NOTHING must not replace cached laps,
+        so only app-reported laps (which are upserts) use replace=True.
+        """
+        self.lap_cache_writes[session_id] = self.lap_cache_writes.get(session_id, 0) + 1
+        # history_complete carries the lap times
+        self.history_snapshot.bump()
+        cached_laps = self.lap_cache.get(session_id)
+        if cached_laps is None:
+            # Not cached yet; the next read loads the committed rows
+            return
+
+        for lap_time in lap_times:
+            if replace or lap_time["lapNumber"] not in cached_laps:
+                cached_laps[lap_time["lapNumber"]] = lap_time
+
+    def evict_lap_times(self, session_id: str) -> None:
+        """Forget the cached lap times of a session."""
+        self.lap_cache.pop(session_id, None)
+        self.lap_cache_writes.pop(session_id, None)
+
     async def get_lap_times_for_session(self, session_id: str) -> List[Dict[str, Any]]:
-        """Retrieve lap times for a specific session."""
+        """Retrieve lap times for a specific session.
+
+        Active sessions are served from the lap cache after the first query.
+        """
+        cached_laps = self.lap_cache.get(session_id)
+        if cached_laps is not None:
+            return [cached_laps[lap_number] for lap_number in sorted(cached_laps)]
+
         if not self.db_pool:
             return []
 
         try:
+            writes_before = self.lap_cache_writes.get(session_id, 0)
             async with self.db_pool.acquire() as conn:
                 rows = await conn.fetch("""
                     SELECT lap_number, start_time, end_time, duration, distance, created_at
@@ -1769,12 +4488,66 @@ class TrackingServer:
                     }
                     lap_times.append(lap_time)
 
-                return lap_times
+            # Laps committed while the query ran would be missing from its result
+            if (session_id in self.active_sessions
+                    and self.lap_cache_writes.get(session_id, 0) == writes_before):
+                self.lap_cache[session_id] = {lap["lapNumber"]: lap for lap in lap_times}
+            return lap_times
 
         except Exception as e:
             logging.error(f"Error retrieving lap times for session {session_id}: {str(e)}")
             return []
 
+    async def get_lap_times_for_sessions(self, session_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Retrieve lap times for several sessions, querying uncached ones together."""
+        session_lap_times = {}
+        uncached_session_ids = []
+        for session_id in session_ids:
+            cached_laps = self.lap_cache.get(session_id)
+            if cached_laps is not None:
+                session_lap_times[session_id] = [cached_laps[n] for n in sorted(cached_laps)]
+            else:
+                uncached_session_ids.append(session_id)
+
+        if not uncached_session_ids or not self.db_pool:
+            return session_lap_times
+
+        try:
+            writes_before = {
+                session_id: self.lap_cache_writes.get(session_id, 0)
+                for session_id in uncached_session_ids
+            }
+            async with self.db_pool.acquire() as conn:
+                rows = await conn.fetch("""
+                    SELECT session_id, lap_number, start_time, end_time, duration, distance, created_at
+                    FROM lap_times
+                    WHERE session_id = ANY($1)
+                    ORDER BY session_id, lap_number ASC
+                """, uncached_session_ids)
+
+            fetched_lap_times: DefaultDict[str, List[Dict[str, Any]]] = defaultdict(list)
+            for row in rows:
+                fetched_lap_times[row['session_id']].append({
+                    "lapNumber": row['lap_number'],
+                    "startTime": row['start_time'],
+                    "endTime": row['end_time'],
+                    "duration": row['duration'],
+                    "distance": float(row['distance']),
+                    "createdAt": row['created_at'].isoformat() if row['created_at'] else None
+                })
+
+            for session_id in uncached_session_ids:
+                lap_times = fetched_lap_times.get(session_id, [])
+                session_lap_times[session_id] = lap_times
+                if (session_id in self.active_sessions
+                        and self.lap_cache_writes.get(session_id, 0) == writes_before[session_id]):
+                    self.lap_cache[session_id] = {lap["lapNumber"]: lap for lap in lap_times}
+
+        except Exception as e:
+            logging.error(f"Error retrieving lap times for {len(uncached_session_ids)} sessions: {str(e)}")
+
+        return session_lap_times
+
     async def get_weather_summary_for_session(self, session_id: str) -> Dict[str, Any]:
         """Get weather summary statistics for a session."""
         if not self.db_pool:
@@ -1909,7 +4682,7 @@ class TrackingServer:
         """
         if not self.db_pool:
             logging.warning("Database pool not initialized, falling back to in-memory history")
-            return self.tracking_history.get(session_id, [])
+            return list(self.tracking_history.get(session_id, ()))
 
         try:
             async with self.db_pool.acquire() as conn:
@@ -2002,23 +4775,51 @@ class TrackingServer:
         except Exception as e:
             logging.error(f"Error loading session history from database: {str(e)}")
             # Fall back to in-memory history
-            return self.tracking_history.get(session_id, [])
+            return list(self.tracking_history.get(session_id, ()))
+
+    def register_client_outbox(self, websocket: websockets.WebSocketServerProtocol) -> ClientOutbox:
+        """Create and start the outbound queue for a connected client."""
+        outbox = ClientOutbox(
+            websocket,
+            self.outbound_queue_size,
+            self.slow_consumer_policy,
+            self.slow_consumer_disconnect_after
+        )
+        outbox.start()
+        self.client_outboxes[websocket] = outbox
+        return outbox
+
+    async def unregister_client_outbox(self, websocket: websockets.WebSocketServerProtocol) -> None:
+        """Stop and forget the outbound queue of a disconnected client."""
+        outbox = self.client_outboxes.pop(websocket, None)
+        if outbox:
+            await outbox.close()
+
+    async def send_message(self, websocket: websockets.WebSocketServerProtocol, message: Any) -> None:
+        """Send a direct reply in the wire format of the connection."""
+        if isinstance(message, EncodedMessage):
+            await websocket.send(message.payload(wire_format_of(websocket)))
+        else:
+            await websocket.send(encode_message(message, wire_format_of(websocket)))
+
+    def fan_out(self, payload: Any, clients) -> Set[websockets.WebSocketServerProtocol]:
+        """Queue one encoded payload for every client and return the ones that are gone."""
+        disconnected_clients = set()
+        for client in clients:
+            outbox = self.client_outboxes.get(client)
+            # Clients without an outbox have already left handle_client
+            if outbox is None or not outbox.push(payload):
+                disconnected_clients.add(client)
+        return disconnected_clients
 
-    async def broadcast_update(self, message: Dict[str, Any]) -> None:
+    async def broadcast_update(self, message: Any) -> None:
         """Broadcast message to all connected clients."""
         if not self.connected_clients:
             return
 
-        disconnected_clients = set()
-
-        for client in self.connected_clients.copy():
-            try:
-                await client.send(json.dumps(message))
-            except websockets.exceptions.ConnectionClosed:
-                disconnected_clients.add(client)
-            except Exception as e:
-                logging.error(f"Error broadcasting to client: {str(e)}")
-                disconnected_clients.add(client)
+        # Serialize once per wire format for every client
+        payload = message if isinstance(message, EncodedMessage) else EncodedMessage(message)
+        disconnected_clients = self.fan_out(payload, list(self.connected_clients))
 
         # Remove disconnected clients
         self.connected_clients.difference_update(disconnected_clients)
@@ -2030,72 +4831,392 @@ class TrackingServer:
         if session_id not in self.session_followers:
             return
 
-        followers = self.session_followers[session_id].copy()
-        disconnected_clients = set()
-
-        for client in followers:
-            try:
-                await client.send(json.dumps(message))
-            except websockets.exceptions.ConnectionClosed:
-                disconnected_clients.add(client)
-            except Exception as e:
-                logging.error(f"Error broadcasting to follower: {str(e)}")
-                disconnected_clients.add(client)
+        payload = EncodedMessage(message)
+        disconnected_clients = self.fan_out(payload, list(self.session_followers[session_id]))
 
         # Remove disconnected clients from following
         for client in disconnected_clients:
             self.remove_client_from_following(client)
 
         if disconnected_clients:
-            logging.info(f"Removed {len(disconnected_clients)} disconnected followers")
-
-    def add_following_relationship(self, client: websockets.WebSocketServerProtocol, session_ids: List[str]) -> None:
-        """Add following relationships for a client."""
-        # Remove client from previous following relationships
-        self.remove_client_from_following(client)
+            logging.info(f"Removed {len(disconnected_clients)} disconnected followers")
+
+    def build_followed_user_update(self, session_id: str, tracking_point: Dict[str, Any],
+                                   lap_times: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build the followed_user_update message for the latest point of a session."""
+        return {
+            'type': 'followed_user_update',
+            'point': {
+                'sessionId': session_id,
+                'person': tracking_point.get("firstname", tracking_point.get("person", "")),
+                'latitude': tracking_point.get("latitude", 0.0),
+                'longitude': tracking_point.get("longitude", 0.0),
+                'altitude': tracking_point.get("altitude", 0.0),
+                'currentSpeed': tracking_point.get("currentSpeed", 0.0),
+                'distance': tracking_point.get("distance", 0.0),
+                'sportType': tracking_point.get("sportType", ""),
+                'heartRate': tracking_point.get("heartRate"),
+                'cadence': tracking_point.get("cadence"),
+                'slope': tracking_point.get("slope"),
+                'averageSlope': tracking_point.get("averageSlope"),
+                'maxUphillSlope': tracking_point.get("maxUphillSlope"),
+                'maxDownhillSlope': tracking_point.get("maxDownhillSlope"),
+                'timestamp': tracking_point.get("timestamp", ""),
+                'lapTimes': [
+                    {
+                        'lapNumber': lap['lapNumber'],
+                        'duration': lap['duration'],
+                        'distance': lap['distance']
+                    } for lap in lap_times
+                ] if lap_times else None
+            }
+        }
+
+    async def send_followed_user_update(self, session_id: str, tracking_point: Dict[str, Any]) -> None:
+        """Send the latest point of a session to the clients following it."""
+        if session_id not in self.session_followers:
+            return
+
+        if self.broadcast_ticker is not None:
+            self.pending_followed_updates[session_id] = tracking_point
+            return
+
+        await self.deliver_followed_user_update(session_id, tracking_point)
+
+    async def deliver_followed_user_update(self, session_id: str, tracking_point: Dict[str, Any]) -> None:
+        """Send a followed_user_update to the current followers of a session."""
+        if session_id not in self.session_followers:
+            return
+
+        # Get lap times for this session
+        lap_times = await self.get_lap_times_for_session(session_id)
+
+        follower_update = self.build_followed_user_update(session_id, tracking_point, lap_times)
+        await self.broadcast_to_followers(session_id, follower_update)
+        logging.info(f"Sent followed_user_update for session {session_id} to {len(self.session_followers.get(session_id, ()))} followers")
+
+    def add_following_relationship(self, client: websockets.WebSocketServerProtocol, session_ids: List[str]) -> None:
+        """Add following relationships for a client."""
+        # Remove client from previous following relationships
+        self.remove_client_from_following(client)
+
+        # Add new following relationships
+        self.client_following[client] = set(session_ids)
+
+        for session_id in session_ids:
+            self.session_followers[session_id].add(client)
+
+        logging.info(f"Client {client.remote_address} now following {len(session_ids)} sessions: {session_ids}")
+
+    def remove_client_from_following(self, client: websockets.WebSocketServerProtocol) -> None:
+        """Remove a client from all following relationships."""
+        if client in self.client_following:
+            followed_sessions = self.client_following[client].copy()
+
+            # Remove from session_followers
+            for session_id in followed_sessions:
+                if client in self.session_followers[session_id]:
+                    self.session_followers[session_id].remove(client)
+                    if not self.session_followers[session_id]:
+                        del self.session_followers[session_id]
+
+            # Remove from client_following
+            del self.client_following[client]
+
+            logging.info(f"Removed client {client.remote_address} from following {len(followed_sessions)} sessions")
+
+    def set_client_topics(self, client: websockets.WebSocketServerProtocol, topics: Set[str]) -> None:
+        """Replace the topics a client is subscribed to."""
+        self.remove_client_topics(client)
+        self.client_topics[client] = set(topics)
+        for topic in topics:
+            self.topic_subscribers[topic].add(client)
+
+    def remove_client_topics(self, client: websockets.WebSocketServerProtocol) -> None:
+        """Remove a client from all topic subscriptions."""
+        for topic in self.client_topics.pop(client, set()):
+            subscribers = self.topic_subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self.topic_subscribers[topic]
+
+    def parse_subscription_topics(self, message_data: Dict[str, Any]) -> Set[str]:
+        """Collect topics from a subscribe/unsubscribe message."""
+        topics = {
+            str(topic) for topic in message_data.get('topics', [])
+            if topic
+        }
+        topics.update(f"session:{session_id}" for session_id in message_data.get('sessionIds', []) if session_id)
+        topics.update(f"event:{event_name}" for event_name in message_data.get('eventNames', []) if event_name)
+        topics.update(f"sport:{sport_type}" for sport_type in message_data.get('sportTypes', []) if sport_type)
+        if message_data.get('firehose'):
+            topics.add(FIREHOSE_TOPIC)
+        return topics
+
+    async def handle_subscribe_request(self, websocket: websockets.WebSocketServerProtocol,
+                                       message_data: Dict[str, Any]) -> None:
+        """Handle 'subscribe' (replace topics) and 'unsubscribe' (remove topics) messages."""
+        topics = self.parse_subscription_topics(message_data)
+        outbox = self.client_outboxes.get(websocket)
+        if message_data.get('type') == 'subscribe':
+            self.set_client_topics(websocket, topics)
+            if outbox and 'delta' in message_data:
+                outbox.delta_encoding = bool(message_data['delta'])
+                outbox.known_sessions.clear()
+        else:
+            remaining_topics = self.client_topics.get(websocket, set()) - topics if topics else set()
+            self.set_client_topics(websocket, remaining_topics)
+        if outbox:
+            self.forget_unsubscribed_sessions(outbox, self.client_topics.get(websocket, set()))
+
+        subscribed_topics = sorted(self.client_topics.get(websocket, set()))
+        logging.info(f"Client {websocket.remote_address} subscribed to topics: {subscribed_topics}")
+        await self.send_message(websocket, {
+            'type': 'subscribe_response',
+            'success': True,
+            'topics': subscribed_topics,
+            'delta': bool(outbox and outbox.delta_encoding)
+        })
+
+    def forget_unsubscribed_sessions(self, outbox: ClientOutbox, topics: Set[str]) -> None:
+        """Drop the snapshots a delta client holds for sessions it no longer subscribes to."""
+        for index in list(outbox.known_sessions):
+            # Session metadata carries the sessionId, eventName and sportType topics
+            if topics.isdisjoint(self.topics_for_point(self.delta_encoder.session_metadata.get(index, {}))):
+                del outbox.known_sessions[index]
+
+    def topics_for_point(self, tracking_point: Dict[str, Any]) -> List[str]:
+        """Return every topic a tracking point is published on."""
+        session_id = tracking_point.get('sessionId', '')
+        topics = [FIREHOSE_TOPIC, f"session:{session_id}"]
+        # Viewers subscribe to the session they see, which hides reset fragments
+        base_session_id = re.sub(r'_reset_\d+$', '', session_id)
+        if base_session_id != session_id:
+            topics.append(f"session:{base_session_id}")
+        if tracking_point.get('eventName'):
+            topics.append(f"event:{tracking_point['eventName']}")
+        if tracking_point.get('sportType'):
+            topics.append(f"sport:{tracking_point['sportType']}")
+        return topics
+
+    def subscribers_for_point(self, tracking_point: Dict[str, Any]) -> Set[websockets.WebSocketServerProtocol]:
+        """Return the clients subscribed to any topic of a tracking point."""
+        subscribers = set()
+        for topic in self.topics_for_point(tracking_point):
+            subscribers.update(self.topic_subscribers.get(topic, ()))
+        return subscribers
+
+    async def publish_point_message(self, tracking_point: Dict[str, Any], message: Dict[str, Any]) -> None:
+        """Send a message about a tracking point only to the matching subscribers."""
+        subscribers = self.subscribers_for_point(tracking_point)
+        if not subscribers:
+            return
+
+        payload = EncodedMessage(message)
+        disconnected_clients = self.fan_out(payload, subscribers)
+        for client in disconnected_clients:
+            self.connected_clients.discard(client)
+            self.remove_client_topics(client)
+        if disconnected_clients:
+            logging.info(f"Removed {len(disconnected_clients)} disconnected subscribers")
+
+    async def publish_points(self, tracking_points: List[Dict[str, Any]]) -> None:
+        """Publish new points of one session to its subscribers.
+
+        With a broadcast tick only the latest point of the session is kept
+        until the next tick; otherwise the points are delivered right away.
+        """
+        if self.broadcast_ticker is not None:
+            latest_point = tracking_points[-1]
+            self.pending_points[latest_point.get('sessionId', '')] = latest_point
+            return
+
+        await self.deliver_points(tracking_points)
+
+    async def deliver_points(self, tracking_points: List[Dict[str, Any]]) -> None:
+        """Send points, possibly of several sessions, to their subscribers.
+
+        Every client gets one frame for all of its sessions. Plain clients get
+        'update' (or 'update_batch' for several points). Delta clients get a
+        'delta' message with changed-field frames, preceded by session
+        snapshots and keyframes for sessions whose current snapshot they do
+        not hold yet. Clients subscribed to the same sessions share payloads.
+        """
+        points_by_session: Dict[str, List[Dict[str, Any]]] = {}
+        for point in tracking_points:
+            points_by_session.setdefault(point.get('sessionId', ''), []).append(point)
+
+        client_sessions: DefaultDict[Any, List[str]] = defaultdict(list)
+        delta_sessions = set()
+        for session_id, points in points_by_session.items():
+            for client in self.subscribers_for_point(points[-1]):
+                client_sessions[client].append(session_id)
+                outbox = self.client_outboxes.get(client)
+                if outbox is not None and outbox.delta_encoding:
+                    delta_sessions.add(session_id)
+
+        # Delta frames are encoded once per point, whatever the number of clients
+        session_frames = {}
+        for session_id, points in points_by_session.items():
+            if session_id in delta_sessions:
+                session_frames[session_id] = [self.delta_encoder.encode(point) for point in points]
+            else:
+                # Nobody decodes this session's deltas right now, so the next
+                # frame for it has to be a keyframe anyway.
+                self.delta_encoder.forget_frames(session_id)
+
+        client_groups: DefaultDict[tuple, List[Any]] = defaultdict(list)
+        for client, session_ids in client_sessions.items():
+            client_groups[tuple(session_ids)].append(client)
+
+        snapshot_payloads: Dict[int, EncodedMessage] = {}
+        disconnected_clients = set()
+        for session_ids, clients in client_groups.items():
+            plain_subscribers = []
+            delta_outboxes = []
+            for client in clients:
+                outbox = self.client_outboxes.get(client)
+                if outbox is not None and outbox.delta_encoding:
+                    delta_outboxes.append(outbox)
+                else:
+                    plain_subscribers.append(client)
+
+            if plain_subscribers:
+                group_points = [point for session_id in session_ids for point in points_by_session[session_id]]
+                if len(group_points) == 1:
+                    message = {'type': 'update', 'point': group_points[0]}
+                else:
+                    message = {'type': 'update_batch'}
+                    if len(session_ids) == 1:
+                        message['sessionId'] = session_ids[0]
+                    message['points'] = group_points
+                disconnected_clients |= self.fan_out(EncodedMessage(message), plain_subscribers)
+
+            delta_payloads: Dict[tuple, EncodedMessage] = {}
+            for outbox in delta_outboxes:
+                resynced = []
+                frames = []
+                for session_id in session_ids:
+                    encoded = session_frames[session_id]
+                    index = encoded[-1][0]
+                    version = self.delta_encoder.metadata_versions.get(index, 0)
+                    if outbox.known_sessions.get(index) == version:
+                        frames.extend(frame[1] for frame in encoded)
+                    else:
+                        resynced.append(index)
+                        frames.extend(frame[2] for frame in encoded)
+                        outbox.known_sessions[index] = version
+
+                resync_key = tuple(resynced)
+                if resync_key not in delta_payloads:
+                    delta_payloads[resync_key] = EncodedMessage({'type': 'delta', 'f': frames})
+                outbox.broken_chain = False
+                delivered = True
+                for index in resynced:
+                    if index not in snapshot_payloads:
+                        snapshot_payloads[index] = EncodedMessage(self.delta_encoder.snapshot(index))
+                    delivered = delivered and outbox.push(snapshot_payloads[index])
+                delivered = delivered and outbox.push(delta_payloads[resync_key])
+                if delivered and outbox.broken_chain:
+                    # The frames just queued may build on what was dropped
+                    delivered = self.resync_outbox(outbox, session_ids, session_frames, snapshot_payloads)
+                if not delivered:
+                    disconnected_clients.add(outbox.websocket)
+
+        for client in disconnected_clients:
+            self.connected_clients.discard(client)
+            self.remove_client_topics(client)
+        if disconnected_clients:
+            logging.info(f"Removed {len(disconnected_clients)} disconnected subscribers")
+
+    def resync_outbox(self, outbox: ClientOutbox, session_ids: tuple, session_frames: Dict[str, list],
+                      snapshot_payloads: Dict[int, EncodedMessage]) -> bool:
+        """Queue snapshots and keyframes for sessions whose delta chain an outbox broke."""
+        outbox.broken_chain = False
+        indexes = [session_frames[session_id][-1][0] for session_id in session_ids]
+        for index in indexes:
+            if index not in snapshot_payloads:
+                snapshot_payloads[index] = EncodedMessage(self.delta_encoder.snapshot(index))
+            if not outbox.push(snapshot_payloads[index]):
+                return False
+        keyframes = [frame[2] for session_id in session_ids for frame in session_frames[session_id]]
+        if not outbox.push(EncodedMessage({'type': 'delta', 'f': keyframes})):
+            return False
+        for index in indexes:
+            outbox.known_sessions[index] = self.delta_encoder.metadata_versions.get(index, 0)
+        return True
 
-        # Add new following relationships
-        self.client_following[client] = set(session_ids)
+    async def start_broadcast_ticker(self) -> None:
+        """Start coalescing viewer broadcasts into one flush per broadcast tick."""
+        if self.broadcast_tick_ms <= 0 or self.broadcast_ticker is not None:
+            return
 
-        for session_id in session_ids:
-            self.session_followers[session_id].add(client)
+        self.broadcast_ticker = asyncio.create_task(self.broadcast_ticker_task())
+        logging.info(f"Broadcast tick started: every {self.broadcast_tick_ms}ms")
 
-        logging.info(f"Client {client.remote_address} now following {len(session_ids)} sessions: {session_ids}")
+    async def stop_broadcast_ticker(self) -> None:
+        """Stop the broadcast tick and send whatever is still pending."""
+        if self.broadcast_ticker is None:
+            return
 
-    def remove_client_from_following(self, client: websockets.WebSocketServerProtocol) -> None:
-        """Remove a client from all following relationships."""
-        if client in self.client_following:
-            followed_sessions = self.client_following[client].copy()
+        self.broadcast_ticker.cancel()
+        try:
+            await self.broadcast_ticker
+        except asyncio.CancelledError:
+            pass
+        self.broadcast_ticker = None
+        await self.flush_broadcasts()
 
-            # Remove from session_followers
-            for session_id in followed_sessions:
-                if client in self.session_followers[session_id]:
-                    self.session_followers[session_id].remove(client)
-                    if not self.session_followers[session_id]:
-                        del self.session_followers[session_id]
+    async def broadcast_ticker_task(self) -> None:
+        """Background task that flushes coalesced broadcasts every tick."""
+        while True:
+            await asyncio.sleep(self.broadcast_tick_ms / 1000)
+            try:
+                await self.flush_broadcasts()
+            except Exception as e:
+                logging.error(f"Error flushing coalesced broadcasts: {str(e)}")
+
+    async def flush_broadcasts(self) -> None:
+        """Send the latest point of every changed session and the pending list updates."""
+        pending_points, self.pending_points = self.pending_points, {}
+        pending_followed_updates, self.pending_followed_updates = self.pending_followed_updates, {}
+        pending_broadcasts, self.pending_broadcasts = self.pending_broadcasts, set()
+
+        if pending_points:
+            await self.deliver_points(list(pending_points.values()))
+        for session_id, tracking_point in pending_followed_updates.items():
+            await self.deliver_followed_user_update(session_id, tracking_point)
+        if 'active_users' in pending_broadcasts:
+            await self.send_active_users_update()
+        if 'session_list' in pending_broadcasts:
+            await self.send_session_list_update()
 
-            # Remove from client_following
-            del self.client_following[client]
+    async def broadcast_active_users_update(self) -> None:
+        """Broadcast updated active users list to all clients, on the next tick if coalescing."""
+        if self.broadcast_ticker is not None:
+            self.pending_broadcasts.add('active_users')
+            return
 
-            logging.info(f"Removed client {client.remote_address} from following {len(followed_sessions)} sessions")
+        await self.send_active_users_update()
 
-    async def broadcast_active_users_update(self) -> None:
-        """Broadcast updated active users list to all clients."""
+    async def send_active_users_update(self) -> None:
+        """Send the active users list to all clients now."""
         try:
             self.update_active_sessions()
 
             # Get current active users with their latest data
             active_users = []
             for session_id in self.active_sessions:
-                if session_id in self.tracking_history and self.tracking_history[session_id]:
-                    latest_point = self.tracking_history[session_id][-1]
+                track = self.tracking_history.get(session_id)
+                if track:
                     active_user = {
                         "sessionId": session_id,
-                        "person": latest_point.get("firstname", latest_point.get("person", "")),
-                        "eventName": latest_point.get("eventName", ""),
-                        "lastUpdate": latest_point.get("timestamp", ""),
-                        "latitude": latest_point.get("latitude", 0.0),
-                        "longitude": latest_point.get("longitude", 0.0)
+                        "person": track.value("firstname", track.value("person", "")),
+                        "eventName": track.value("eventName", ""),
+                        "lastUpdate": track.value("timestamp", ""),
+                        "latitude": track.value("latitude", 0.0),
+                        "longitude": track.value("longitude", 0.0)
                     }
                     active_users.append(active_user)
 
@@ -2117,23 +5238,23 @@ class TrackingServer:
 
             active_users = []
             for session_id in self.active_sessions:
-                if session_id in self.tracking_history and self.tracking_history[session_id]:
-                    latest_point = self.tracking_history[session_id][-1]
+                track = self.tracking_history.get(session_id)
+                if track:
                     active_user = {
                         "sessionId": session_id,
-                        "person": latest_point.get("firstname", latest_point.get("person", "")),
-                        "eventName": latest_point.get("eventName", ""),
-                        "lastUpdate": latest_point.get("timestamp", ""),
-                        "latitude": latest_point.get("latitude", 0.0),
-                        "longitude": latest_point.get("longitude", 0.0)
+                        "person": track.value("firstname", track.value("person", "")),
+                        "eventName": track.value("eventName", ""),
+                        "lastUpdate": track.value("timestamp", ""),
+                        "latitude": track.value("latitude", 0.0),
+                        "longitude": track.value("longitude", 0.0)
                     }
                     active_users.append(active_user)
 
             # Send response to requesting client
-            await websocket.send(json.dumps({
+            await self.send_message(websocket, {
                 'type': 'active_users',
                 'users': active_users
-            }))
+            })
 
             logging.info(f"Sent active users list to client: {len(active_users)} users")
 
@@ -2160,6 +5281,7 @@ class TrackingServer:
 
                 # Send data for each followed session
                 for session_id in valid_session_ids:
+                    await self.hydrate_session(session_id)
                     # Get lap times for this session
                     lap_times = await self.get_lap_times_for_session(session_id)
 
@@ -2173,7 +5295,7 @@ class TrackingServer:
                         if history_points:
                             person = history_points[0].get("firstname", history_points[0].get("person", "")) if history_points else ""
 
-                            await websocket.send(json.dumps({
+                            await self.send_message(websocket, {
                                 'type': 'followed_user_history',
                                 'sessionId': session_id,
                                 'person': person,
@@ -2200,7 +5322,7 @@ class TrackingServer:
                                         'windDirection': point.get("windDirection")
                                     } for point in history_points
                                 ]
-                            }))
+                            })
                             logging.info(f"Sent full history for session {session_id}: {len(history_points)} points (from database)")
                         else:
                             logging.warning(f"No history found for session {session_id} in database")
@@ -2209,126 +5331,152 @@ class TrackingServer:
                         latest_point = self.tracking_history[session_id][-1]
 
                         # Send followed_user_update message with latest data
-                        await websocket.send(json.dumps({
-                            'type': 'followed_user_update',
-                            'point': {
-                                'sessionId': session_id,
-                                'person': latest_point.get("firstname", latest_point.get("person", "")),
-                                'latitude': latest_point.get("latitude", 0.0),
-                                'longitude': latest_point.get("longitude", 0.0),
-                                'altitude': latest_point.get("altitude", 0.0),
-                                'currentSpeed': latest_point.get("currentSpeed", 0.0),
-                                'distance': latest_point.get("distance", 0.0),
-                                'sportType': latest_point.get("sportType", ""),
-                                'heartRate': latest_point.get("heartRate"),
-                                'cadence': latest_point.get("cadence"),
-                                'slope': latest_point.get("slope"),
-                                'averageSlope': latest_point.get("averageSlope"),
-                                'maxUphillSlope': latest_point.get("maxUphillSlope"),
-                                'maxDownhillSlope': latest_point.get("maxDownhillSlope"),
-                                'timestamp': latest_point.get("timestamp", ""),
-                                'lapTimes': [
-                                    {
-                                        'lapNumber': lap['lapNumber'],
-                                        'duration': lap['duration'],
-                                        'distance': lap['distance']
-                                    } for lap in lap_times
-                                ] if lap_times else None
-                            }
-                        }))
+                        await self.send_message(websocket,
+                            self.build_followed_user_update(session_id, latest_point, lap_times)
+                        )
 
             # Send response
-            await websocket.send(json.dumps({
+            await self.send_message(websocket, {
                 'type': 'follow_response',
                 'success': True,
                 'following': valid_session_ids
-            }))
+            })
 
             logging.info(f"Client {websocket.remote_address} started following {len(valid_session_ids)} sessions")
 
         except Exception as e:
             logging.error(f"Error handling follow users request: {str(e)}")
-            await websocket.send(json.dumps({
+            await self.send_message(websocket, {
                 'type': 'follow_response',
                 'success': False,
                 'error': str(e)
-            }))
+            })
 
     async def handle_unfollow_users_request(self, websocket: websockets.WebSocketServerProtocol) -> None:
         """Handle request to stop following all users."""
         try:
             self.remove_client_from_following(websocket)
 
-            await websocket.send(json.dumps({
+            await self.send_message(websocket, {
                 'type': 'unfollow_response',
                 'success': True
-            }))
+            })
 
             logging.info(f"Client {websocket.remote_address} stopped following all users")
 
         except Exception as e:
             logging.error(f"Error handling unfollow users request: {str(e)}")
-            await websocket.send(json.dumps({
+            await self.send_message(websocket, {
                 'type': 'unfollow_response',
                 'success': False,
                 'error': str(e)
-            }))
+            })
 
     async def send_history(self, websocket: websockets.WebSocketServerProtocol) -> None:
-        """Send Redis-backed live history to a newly connected client."""
+        """Send the live history snapshot to a newly connected client."""
         try:
             # Check for stale active sessions before sending data
             self.update_active_sessions()
 
-            # Redis, not PostgreSQL or process memory, is the source for the
-            # live webpage's request_history response.
-            all_points = await self.get_tracking_points_from_redis()
-
-            all_points.sort(key=lambda x: datetime.datetime.strptime(x['timestamp'], self.timestamp_format))
+            # The in-memory live window is the snapshot source, so history is
+            # still served while Redis is unavailable. Sealed chunks are sent
+            # as the bytes cached for them; points are in arrival order.
+            wire_format = wire_format_of(websocket)
+            sent_points = 0
+            session_ids = list(self.unhydrated_sessions)
+            session_ids.extend(
+                session_id for session_id in list(self.tracking_history)
+                if session_id not in self.unhydrated_sessions
+            )
+            for session_id in session_ids:
+                # During a warm start, sessions are loaded as they are reached
+                await self.hydrate_session(session_id)
+                points = self.tracking_history.get(session_id)
+                if not points:
+                    continue
+                for payload in self.history_snapshot.session_payloads(session_id, points, wire_format):
+                    await websocket.send(payload)
+                sent_points += len(points)
 
-            # Send points in batches
-            for i in range(0, len(all_points), self.batch_size):
-                batch = all_points[i:i + self.batch_size]
-                await websocket.send(json.dumps({
-                    'type': 'history_batch',
-                    'points': batch
-                }))
-                await asyncio.sleep(0.001)  # Minimal delay between batches
+            # Session Manager and graphs come from the same snapshot
+            await self.send_message(websocket, self.get_session_list_message())
 
-            # Build the Session Manager from this exact Redis snapshot so the
-            # graph and the list cannot disagree about which sessions exist.
-            session_info = self.build_session_info(all_points)
+            # Completion message with lap times of all sessions
+            await self.send_message(websocket, await self.get_history_complete_message())
 
-            await websocket.send(json.dumps({
-                'type': 'session_list',
-                'sessions': session_info
-            }))
-
-            # Gather lap times for all sessions
-            session_lap_times = {}
-            for session_id in self.tracking_history.keys():
-                lap_times = await self.get_lap_times_for_session(session_id)
-                if lap_times:
-                    session_lap_times[session_id] = [
-                        {
-                            'lapNumber': lap['lapNumber'],
-                            'duration': lap['duration'],
-                            'distance': lap['distance']
-                        } for lap in lap_times
-                    ]
-
-            # Send completion message with lap times
-            await websocket.send(json.dumps({
-                'type': 'history_complete',
-                'sessionLapTimes': session_lap_times if session_lap_times else None
-            }))
-
-            logging.info(f"Sent {len(all_points)} historical points to client")
+            logging.info(f"Sent {sent_points} historical points to client")
 
         except Exception as e:
             logging.error(f"Error sending history: {str(e)}")
             raise  # Re-raise to be handled by the caller
 
+    async def single_flight(self, key: Any, factory):
+        """Await factory() once for all concurrent callers with the same key."""
+        future = self.inflight_builds.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self.inflight_builds[key] = future
+
+            def forget(done: asyncio.Future) -> None:
+                if self.inflight_builds.get(key) is done:
+                    del self.inflight_builds[key]
+
+            future.add_done_callback(forget)
+        # A cancelled caller must not cancel the build for the others
+        return await asyncio.shield(future)
+
+    def get_session_list_message(self) -> EncodedMessage:
+        """Return the session_list message of the current snapshot generation."""
+        message = self.history_snapshot.cached_value('session_list')
+        if message is None:
+            latest_points = [
+                {**points[-1], 'sessionId': session_id}
+                for session_id, points in self.tracking_history.items() if points
+            ]
+            # Sessions not hydrated yet are listed from their Redis index entry
+            latest_points.extend(
+                index_point for session_id, index_point in self.unhydrated_sessions.items()
+                if not self.tracking_history.get(session_id)
+            )
+            message = EncodedMessage({
+                'type': 'session_list',
+                'sessions': self.build_session_info(latest_points)
+            })
+            self.history_snapshot.store_value('session_list', message, self.history_snapshot.generation)
+        return message
+
+    async def get_history_complete_message(self) -> EncodedMessage:
+        """Return the history_complete message of the current snapshot generation."""
+        message = self.history_snapshot.cached_value('history_complete')
+        if message is not None:
+            return message
+
+        generation = self.history_snapshot.generation
+        message = await self.single_flight(
+            ('history_complete', generation), self.build_history_complete_message
+        )
+        self.history_snapshot.store_value('history_complete', message, generation)
+        return message
+
+    async def build_history_complete_message(self) -> EncodedMessage:
+        """Gather lap times for all live sessions in one query."""
+        session_lap_times = {}
+        all_lap_times = await self.get_lap_times_for_sessions(list(self.tracking_history.keys()))
+        for session_id, lap_times in all_lap_times.items():
+            if lap_times:
+                session_lap_times[session_id] = [
+                    {
+                        'lapNumber': lap['lapNumber'],
+                        'duration': lap['duration'],
+                        'distance': lap['distance']
+                    } for lap in lap_times
+                ]
+
+        return EncodedMessage({
+            'type': 'history_complete',
+            'sessionLapTimes': session_lap_times if session_lap_times else None
+        })
+
     def validate_tracking_point(self, message_data: Dict[str, Any]) -> bool:
         """Validate required fields in tracking point data."""
         required_fields = [
@@ -2350,6 +5498,52 @@ class TrackingServer:
             for key in required_fields
         )
 
+    def point_sequence(self, message_data: Dict[str, Any]) -> Optional[int]:
+        """Return the 'seq' of a point, or None if it has none or the window is off."""
+        seq = message_data.get('seq')
+        if seq is None or self.seq_dedupe_window <= 0:
+            return None
+        try:
+            return int(seq)
+        except (TypeError, ValueError):
+            return None
+
+    def is_replayed_point(self, session_id: str, message_data: Dict[str, Any]) -> bool:
+        """Return True if the 'seq' of a point was already accepted for the session.
+
+        session_id is the ID the app sent, before any reset is applied, so
+        the window spans reset fragments. A point of a new app run gets its
+        epoch written to 'seqEpoch'. Nothing is recorded here, see
+        record_point_sequences.
+        """
+        seq = self.point_sequence(message_data)
+        if seq is None:
+            return False
+        state = self.sessions.get(session_id)
+        if state is None or state.seq_window is None:
+            return False
+        epoch = state.seq_window.epoch_of(seq, self.seq_dedupe_window, message_data.get('seqEpoch'))
+        if epoch is not None:
+            message_data['seqEpoch'] = epoch
+        if not state.seq_window.seen(seq, self.seq_dedupe_window, epoch):
+            return False
+
+        self.replayed_points_rejected += 1
+        logging.debug(f"Dropping replayed point seq={seq} of session {session_id}")
+        return True
+
+    def record_point_sequences(self, session_id: str, tracking_points: List[Dict[str, Any]]) -> None:
+        """Remember the 'seq' of points accepted for persistence so resends are dropped."""
+        for tracking_point in tracking_points:
+            seq = self.point_sequence(tracking_point)
+            if seq is None:
+                continue
+            state = self.sessions.touch(session_id)
+            if state.seq_window is None:
+                state.seq_window = SequenceWindow()
+            epoch = tracking_point.get('seqEpoch')
+            state.seq_window.accept(seq, self.seq_dedupe_window, str(epoch) if epoch is not None else None)
+
     def validate_waypoint_message(self, message_data: Dict[str, Any]) -> bool:
         """Validate required fields in waypoint message data."""
         required_fields = ["sessionId", "eventName", "waypoint"]
@@ -2380,8 +5574,7 @@ class TrackingServer:
 
             # Mark session as active to prevent timeout
             was_active = original_session_id in self.active_sessions
-            self.active_sessions.add(original_session_id)
-            self.last_activity[original_session_id] = datetime.datetime.now()
+            self.mark_session_active(original_session_id)
 
             if not was_active:
                 logging.info(f"Session {original_session_id} kept ACTIVE despite invalid coordinates")
@@ -2398,49 +5591,184 @@ class TrackingServer:
             }
 
         # Check if session should be reset (only for valid coordinates)
-        should_reset = self.session_detector.should_reset_session(original_session_id, message_data)
-
-        # Determine actual session ID to use
-        if should_reset:
-            # Create new session ID
-            actual_session_id = self.session_detector.create_new_session_id(original_session_id)
-
-            # Reset session tracking
-            self.session_detector.reset_session_tracking(original_session_id)
-
-            # Remove from active sessions
-            if original_session_id in self.active_sessions:
-                self.active_sessions.remove(original_session_id)
-
-            # Update the message data with new session ID
-            message_data = message_data.copy()  # Don't modify original
-            message_data['sessionId'] = actual_session_id
-            reset_match = re.search(r'_reset_(\d+)$', actual_session_id)
-            if reset_match:
-                reset_timestamp_ms = int(reset_match.group(1))
-                reset_start_time = datetime.datetime.fromtimestamp(
-                    reset_timestamp_ms / 1000,
-                    datetime.timezone.utc
-                )
-                message_data['startDateTime'] = reset_start_time.isoformat()
-                message_data['timezoneOffsetHours'] = 0
-
-            logging.info(f"SESSION RESET APPLIED: {original_session_id} -> {actual_session_id}")
-
-        else:
-            actual_session_id = original_session_id
+        actual_session_id, message_data = self.resolve_session_reset(original_session_id, message_data)
 
         # Update session tracking data (only for valid coordinates)
         self.session_detector.update_session_data(actual_session_id, message_data)
 
         # Mark session as active
-        was_active = actual_session_id in self.active_sessions
-        self.active_sessions.add(actual_session_id)
-        self.last_activity[actual_session_id] = datetime.datetime.now()
+        self.mark_session_active(actual_session_id)
+
+        return self.build_tracking_point(message_data)
+
+    def create_tracking_points_batch(self, batch_message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Create tracking points for a 'tracking_batch' replay of one session.
+
+        Fields on the envelope (everything except 'type' and 'points') are
+        shared by every point, so the app can send session metadata once.
+        Validation runs over the whole array, points with invalid coordinates
+        are dropped, and reset detection runs once for the batch.
+        """
+        original_session_id = batch_message.get('sessionId')
+        raw_points = batch_message.get('points')
+        if not original_session_id or not isinstance(raw_points, list):
+            logging.error("tracking_batch requires a sessionId and a points array")
+            return []
+
+        shared_fields = {
+            key: value for key, value in batch_message.items()
+            if key not in ('type', 'points')
+        }
+
+        valid_messages = []
+        skipped_points = 0
+        replayed_points = 0
+        batch_seqs: Set[int] = set()
+        for raw_point in raw_points:
+            if not isinstance(raw_point, dict):
+                skipped_points += 1
+                continue
+
+            message_data = {**shared_fields, **raw_point, 'sessionId': original_session_id}
+            if not self.validate_tracking_point(message_data):
+                skipped_points += 1
+                continue
+
+            is_valid, _ = self.validate_gps_coordinates(
+                message_data.get('latitude', -999),
+                message_data.get('longitude', -999)
+            )
+            if not is_valid:
+                skipped_points += 1
+                continue
+
+            seq = self.point_sequence(message_data)
+            if seq in batch_seqs or self.is_replayed_point(original_session_id, message_data):
+                replayed_points += 1
+                continue
+            if seq is not None:
+                batch_seqs.add(seq)
+
+            valid_messages.append(message_data)
+
+        if skipped_points:
+            logging.warning(
+                f"tracking_batch for session {original_session_id}: skipped "
+                f"{skipped_points} of {len(raw_points)} points (missing fields or invalid coordinates)"
+            )
+        if replayed_points:
+            logging.info(
+                f"tracking_batch for session {original_session_id}: dropped "
+                f"{replayed_points} of {len(raw_points)} points that were already received"
+            )
+
+        if not valid_messages:
+            # Keep the session alive exactly like a single invalid point would
+            self.mark_session_active(original_session_id)
+            return []
+
+        # The buffered points are consecutive, so only the first one is
+        # compared against the state from before the dead zone.
+        actual_session_id, first_message = self.resolve_session_reset(
+            original_session_id,
+            valid_messages[0]
+        )
+        if actual_session_id != original_session_id:
+            valid_messages = [first_message] + [
+                {**message_data, 'sessionId': actual_session_id,
+                 'startDateTime': first_message['startDateTime'],
+                 'timezoneOffsetHours': first_message['timezoneOffsetHours']}
+                for message_data in valid_messages[1:]
+            ]
+
+        self.session_detector.update_session_data(actual_session_id, valid_messages[-1])
+        self.mark_session_active(actual_session_id)
+
+        tracking_points = []
+        for message_data in valid_messages:
+            try:
+                tracking_points.append(self.build_tracking_point(message_data))
+            except (KeyError, TypeError, ValueError) as e:
+                logging.warning(f"Skipping malformed point in tracking_batch for session {actual_session_id}: {str(e)}")
+        return tracking_points
+
+    def resolve_session_reset(self, original_session_id: str,
+                              message_data: Dict[str, Any]) -> tuple:
+        """Return (actual_session_id, message_data), applying a detected app restart."""
+        should_reset = self.session_detector.should_reset_session(original_session_id, message_data)
+        if not should_reset:
+            return original_session_id, message_data
+
+        # Create new session ID
+        actual_session_id = self.session_detector.create_new_session_id(original_session_id)
+        self.apply_session_reset(original_session_id)
+
+        # Update the message data with new session ID
+        message_data = message_data.copy()  # Don't modify original
+        message_data['sessionId'] = actual_session_id
+        reset_match = re.search(r'_reset_(\d+)$', actual_session_id)
+        if reset_match:
+            reset_timestamp_ms = int(reset_match.group(1))
+            reset_start_time = datetime.datetime.fromtimestamp(
+                reset_timestamp_ms / 1000,
+                datetime.timezone.utc
+            )
+            message_data['startDateTime'] = reset_start_time.isoformat()
+            message_data['timezoneOffsetHours'] = 0
+
+        logging.info(f"SESSION RESET APPLIED: {original_session_id} -> {actual_session_id}")
+        return actual_session_id, message_data
+
+    def apply_session_reset(self, original_session_id: str) -> None:
+        """Forget the tracking state of a session the app restarted under a new ID."""
+        self.session_detector.reset_session_tracking(original_session_id)
+        self.release_board_positions([original_session_id])
+
+        # Remove from active sessions
+        if original_session_id in self.active_sessions:
+            self.active_sessions.remove(original_session_id)
+            self.evict_lap_times(original_session_id)
+
+    def append_live_points(self, session_id: str, tracking_points: List[Dict[str, Any]]) -> None:
+        """Append points to the in-memory live history of a session."""
+        track = self.tracking_history[session_id]
+        track.extend(tracking_points)
+        if self.position_board:
+            self.position_board.update(session_id, tracking_points[-1], time.time())
+        if self.live_session_max_points and len(track) > self.live_session_max_points:
+            track.drop_oldest(len(track) - self.live_session_max_points + self.live_session_max_points // 10)
+            self.history_snapshot.invalidate(session_id)
+            self.schedule_retention(session_id)
+        else:
+            self.history_snapshot.touch(session_id)
+            if track.oldest_timestamp < self.retention_keys.get(session_id, float('inf')):
+                self.schedule_retention(session_id)
+
+    def schedule_retention(self, session_id: str) -> None:
+        """Key a session in the retention heap by its oldest point."""
+        track = self.tracking_history.get(session_id)
+        oldest_timestamp = track.oldest_timestamp if track else float('inf')
+        if oldest_timestamp == float('inf'):
+            # No point that could expire
+            self.retention_keys.pop(session_id, None)
+            return
+        if self.retention_keys.get(session_id) != oldest_timestamp:
+            self.retention_keys[session_id] = oldest_timestamp
+            heapq.heappush(self.retention_heap, (oldest_timestamp, session_id))
+
+    def mark_session_active(self, session_id: str) -> None:
+        """Record activity for a session and mark it active."""
+        was_active = session_id in self.active_sessions
+        self.active_sessions.add(session_id)
+        self.sessions.touch(session_id).last_activity = datetime.datetime.now()
 
         if not was_active:
-            logging.info(f"Session {actual_session_id} became ACTIVE - total active: {len(self.active_sessions)}")
+            self.schedule_activity_expiry(session_id)
+            self.history_snapshot.bump()
+            logging.info(f"Session {session_id} became ACTIVE - total active: {len(self.active_sessions)}")
 
+    def build_tracking_point(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize a validated tracker message into the stored/broadcast point format."""
         # Get timestamp from Android device
         android_timestamp = self.parse_android_timestamp(message_data)
 
@@ -2573,21 +5901,97 @@ class TrackingServer:
             # Return original if normalization fails
             return timestamp_str.replace('Z', '').replace('+00:00', '')
 
-    def update_active_sessions(self) -> None:
-        """Update the list of active sessions based on recent activity."""
-        now = datetime.datetime.now()
-        inactive_sessions = set()
+    def update_active_sessions(self, now: Optional[datetime.datetime] = None) -> None:
+        """Move sessions whose activity deadline passed to inactive.
+
+        Only expired heap entries are looked at; a session that was updated
+        since its entry was scheduled is rescheduled at its new deadline.
+        """
+        now = now or datetime.datetime.now()
+        inactive_sessions = []
+
+        while self.activity_heap and self.activity_heap[0][0] < now:
+            deadline, session_id = heapq.heappop(self.activity_heap)
+            if self.activity_deadlines.get(session_id) != deadline:
+                continue
+            del self.activity_deadlines[session_id]
+            if session_id not in self.active_sessions:
+                continue
+
+            state = self.sessions.get(session_id)
+            last_time = state.last_activity if state else None
+            if last_time is not None and (now - last_time).total_seconds() <= self.activity_timeout:
+                self.schedule_activity_expiry(session_id)
+                continue
+
+            self.active_sessions.remove(session_id)
+            inactive_sessions.append(session_id)
+            logging.info(f"Session {session_id} marked as inactive after {self.activity_timeout} seconds without updates")
+
+        if inactive_sessions:
+            self.emit_sessions_inactive(inactive_sessions)
+        self.arm_activity_timer()
+
+    def schedule_activity_expiry(self, session_id: str) -> None:
+        """Schedule the activity deadline of an active session."""
+        state = self.sessions.get(session_id)
+        last_time = (state.last_activity if state else None) or datetime.datetime.now()
+        deadline = last_time + datetime.timedelta(seconds=self.activity_timeout)
+        self.activity_deadlines[session_id] = deadline
+        heapq.heappush(self.activity_heap, (deadline, session_id))
+        self.arm_activity_timer()
+
+    def arm_activity_timer(self) -> None:
+        """Arm the loop timer for the earliest activity deadline."""
+        if self.activity_timer is not None or not self.activity_heap:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop (startup or tests); the next update_active_sessions call catches up
+            return
+
+        delay = (self.activity_heap[0][0] - datetime.datetime.now()).total_seconds()
+        self.activity_timer = loop.call_later(max(delay, 0) + 0.01, self.activity_timer_fired)
+
+    def activity_timer_fired(self) -> None:
+        self.activity_timer = None
+        self.update_active_sessions()
+
+    def stop_activity_timer(self) -> None:
+        if self.activity_timer is not None:
+            self.activity_timer.cancel()
+            self.activity_timer = None
+
+    def emit_sessions_inactive(self, session_ids: List[str]) -> None:
+        """Notify the session-inactive listeners."""
+        for listener in self.session_inactive_listeners:
+            try:
+                result = listener(session_ids)
+                if asyncio.iscoroutine(result):
+                    try:
+                        asyncio.get_running_loop().create_task(result)
+                    except RuntimeError:
+                        result.close()
+            except Exception as e:
+                logging.error(f"Error in session-inactive listener: {str(e)}")
+
+    def finalize_inactive_sessions(self, session_ids: List[str]) -> None:
+        """Drop per-session state that is only kept while a session is active."""
+        for session_id in session_ids:
+            self.evict_lap_times(session_id)
+        self.history_snapshot.bump()
 
-        for session_id, last_time in self.last_activity.items():
-            time_diff = (now - last_time).total_seconds()
-            if time_diff > self.activity_timeout:
-                inactive_sessions.add(session_id)
+    def release_board_positions(self, session_ids) -> None:
+        """Remove sessions from the shared position board."""
+        if self.position_board:
+            for session_id in session_ids:
+                self.position_board.release(session_id)
 
-        # Remove inactive sessions
-        for session_id in inactive_sessions:
-            if session_id in self.active_sessions:
-                self.active_sessions.remove(session_id)
-                logging.info(f"Session {session_id} marked as inactive after {self.activity_timeout} seconds without updates")
+    async def broadcast_inactive_sessions(self, session_ids: List[str]) -> None:
+        """Tell viewers that sessions went inactive."""
+        await self.broadcast_active_users_update()
+        await self.broadcast_session_list_update()
 
     async def delete_session(self, session_id: str) -> Dict[str, Any]:
         """Delete a base session, its hidden fragments, and related data."""
@@ -2599,7 +6003,7 @@ class TrackingServer:
             database_reset_pattern = rf'^{re.escape(base_session_id)}_reset_[0-9]+$'
             memory_session_ids = {
                 stored_session_id
-                for stored_session_id in self.tracking_history
+                for stored_session_id in [*self.tracking_history, *self.unhydrated_sessions]
                 if memory_family_pattern.fullmatch(stored_session_id)
             }
 
@@ -2640,26 +6044,14 @@ class TrackingServer:
                 return {"success": False, "reason": "Session does not exist"}
 
             await self.delete_sessions_from_redis(family_session_ids)
-
-            for family_session_id in family_session_ids:
-                self.tracking_history.pop(family_session_id, None)
-                self.last_activity.pop(family_session_id, None)
-                self.active_sessions.discard(family_session_id)
-                self.session_last_lap.pop(family_session_id, None)
-                self.session_lap_start_time.pop(family_session_id, None)
-                self.session_followers.pop(family_session_id, None)
-                self.session_detector.reset_session_tracking(family_session_id)
-
-            for followed_session_ids in self.client_following.values():
-                followed_session_ids.difference_update(family_session_ids)
-
-            logging.info(f"Deleted session family: {sorted(family_session_ids)}")
-
-            # Notify all clients about the deletion
-            await self.broadcast_update({
+            await self.publish_cluster_event({
                 'type': 'session_deleted',
-                'sessionId': base_session_id
+                'sessionId': base_session_id,
+                'sessionIds': sorted(family_session_ids)
             })
+            if self.persistence_mode == 'stream' and self.redis_client:
+                await self.publish_session_deletion(family_session_ids)
+            await self.forget_deleted_sessions(base_session_id, family_session_ids)
 
             return {
                 "success": True,
@@ -2671,6 +6063,139 @@ class TrackingServer:
             logging.error(f"Error deleting session {session_id}: {str(e)}")
             return {"success": False, "reason": str(e)}
 
+    async def forget_deleted_sessions(self, base_session_id: str, family_session_ids: Set[str]) -> None:
+        """Drop a deleted session family from memory and tell the clients."""
+        for family_session_id in family_session_ids:
+            self.tracking_history.pop(family_session_id, None)
+            self.unhydrated_sessions.pop(family_session_id, None)
+            self.history_snapshot.invalidate(family_session_id)
+            self.retention_keys.pop(family_session_id, None)
+            self.sessions.pop(family_session_id)
+            self.active_sessions.discard(family_session_id)
+            self.evict_lap_times(family_session_id)
+            self.session_followers.pop(family_session_id, None)
+            self.session_detector.reset_session_tracking(family_session_id)
+            self.session_cache.pop(family_session_id)
+            self.redis_session_metadata.pop(family_session_id, None)
+            self.delta_encoder.release(family_session_id)
+        self.release_board_positions(family_session_ids)
+
+        for followed_session_ids in self.client_following.values():
+            followed_session_ids.difference_update(family_session_ids)
+
+        logging.info(f"Deleted session family: {sorted(family_session_ids)}")
+
+        # Notify all clients about the deletion
+        await self.broadcast_update({
+            'type': 'session_deleted',
+            'sessionId': base_session_id
+        })
+
+    async def process_tracking_batch(self, message_data: Dict[str, Any]) -> bool:
+        """Persist, cache and broadcast a 'tracking_batch' message.
+
+        Returns True when the batch started a new active session (and the
+        active-users list was therefore broadcast).
+        """
+        old_active_sessions = self.active_sessions.copy()
+        tracking_points = self.create_tracking_points_batch(message_data)
+        if not tracking_points:
+            if message_data.get('sessionId') in self.active_sessions:
+                # Invalid points keep the session alive on every worker
+                await self.publish_cluster_event({'type': 'activity', 'sessionId': message_data['sessionId']})
+            return False
+
+        actual_session_id = tracking_points[0]['sessionId']
+        logging.info(f"Received tracking_batch of {len(tracking_points)} points for session {actual_session_id}")
+
+        db_queued = await self.enqueue_tracking_points(tracking_points)
+        if db_queued:
+            self.record_point_sequences(message_data['sessionId'], tracking_points)
+        else:
+            logging.warning("Failed to queue tracking_batch for database, but continuing with in-memory storage")
+
+        redis_success = await self.cache_tracking_points(tracking_points)
+        if not redis_success:
+            logging.warning(
+                "Batch for session %s is live but was not cached in Redis",
+                actual_session_id
+            )
+
+        await self.publish_cluster_points(message_data['sessionId'], tracking_points)
+        new_session = actual_session_id not in old_active_sessions
+        # One coalesced message for the whole replay
+        await self.distribute_live_points(actual_session_id, tracking_points, new_session)
+        return new_session
+
+    async def distribute_live_points(self, session_id: str, tracking_points: List[Dict[str, Any]],
+                                     new_session: bool) -> None:
+        """Add points to the live history and send them to this worker's clients."""
+        self.append_live_points(session_id, tracking_points)
+
+        if new_session:
+            logging.info(f"New active session detected: {session_id}")
+            await self.broadcast_active_users_update()
+            await self.broadcast_session_list_update()
+
+        await self.publish_points(tracking_points)
+        await self.send_followed_user_update(session_id, tracking_points[-1])
+
+    async def publish_cluster_event(self, event: Dict[str, Any]) -> None:
+        """Send a live-state change to the other websocket workers."""
+        if not self.cluster_enabled or not self.redis_client:
+            return
+        try:
+            await self.redis_client.publish(self.cluster_channel, json.dumps({**event, 'origin': self.worker_id}))
+        except Exception as e:
+            logging.error(f"Error publishing {event.get('type')} to the other workers: {str(e)}")
+
+    async def publish_cluster_points(self, original_session_id: str,
+                                     tracking_points: List[Dict[str, Any]]) -> None:
+        """Send accepted points, and a session reset they caused, to the other workers."""
+        session_id = tracking_points[0]['sessionId']
+        await self.publish_cluster_event({
+            'type': 'points',
+            'sessionId': session_id,
+            'points': tracking_points,
+            'resetFrom': original_session_id if original_session_id != session_id else None
+        })
+
+    async def handle_cluster_message(self, data) -> None:
+        """Apply a live-state change published by another websocket worker.
+
+        Points update the reset detector like local ones, so a tracker that
+        reconnects to this worker continues its session without a reset.
+        """
+        event = json.loads(data)
+        if event.get('origin') == self.worker_id:
+            return
+
+        event_type = event.get('type')
+        if event_type == 'points':
+            session_id = event['sessionId']
+            tracking_points = event['points']
+            if event.get('resetFrom'):
+                self.apply_session_reset(event['resetFrom'])
+            # A tracker that reconnects to this worker must not replay them either
+            self.record_point_sequences(event.get('resetFrom') or session_id, tracking_points)
+            new_session = session_id not in self.active_sessions
+            self.session_detector.update_session_data(session_id, tracking_points[-1])
+            self.mark_session_active(session_id)
+            await self.distribute_live_points(session_id, tracking_points, new_session)
+        elif event_type == 'activity':
+            self.mark_session_active(event['sessionId'])
+        elif event_type == 'invalid_coordinates':
+            self.mark_session_active(event['point']['sessionId'])
+            await self.publish_point_message(event['point'], event['message'])
+        elif event_type == 'session_deleted':
+            await self.forget_deleted_sessions(event['sessionId'], set(event['sessionIds']))
+        elif event_type == 'sessions_expired':
+            # Their metadata hashes are gone, so the versions must be written again
+            for expired_session_id in event['sessionIds']:
+                self.redis_session_metadata.pop(expired_session_id, None)
+        else:
+            logging.warning(f"Ignoring unknown cluster event: {event_type}")
+
     async def handle_client(self, websocket: websockets.WebSocketServerProtocol) -> None:
         """Handle individual WebSocket client connection."""
         client_address = websocket.remote_address
@@ -2679,7 +6204,10 @@ class TrackingServer:
 
         try:
             self.connected_clients.add(websocket)
-            logging.info(f"New client connected from {client_address}")
+            self.register_client_outbox(websocket)
+            self.set_client_topics(websocket, {FIREHOSE_TOPIC})
+            wire_format = wire_format_of(websocket)
+            logging.info(f"New client connected from {client_address} ({wire_format})")
 
             # Don't send historical data automatically
             # Client must request it with 'request_history' message
@@ -2692,15 +6220,15 @@ class TrackingServer:
                         continue
 
                     logging.info(f"Received message: {message}")
-                    message_data = json.loads(message)
+                    message_data = decode_message(message, wire_format)
 
                     # Handle ping messages for connection testing
                     if message_data.get('type') == 'ping':
-                        await websocket.send(json.dumps({
+                        await self.send_message(websocket, {
                             'type': 'pong',
                             'message': 'Connection successful',
                             'timestamp': datetime.datetime.now().isoformat()
-                        }))
+                        })
                         continue
 
                     # Handle request for historical data
@@ -2712,11 +6240,21 @@ class TrackingServer:
                     # Handle memory cleanup request
                     if message_data.get('type') == 'cleanup_memory':
                         result = await self.manual_cleanup_memory()
-                        await websocket.send(json.dumps({
+                        await self.send_message(websocket, {
                             'type': 'cleanup_response',
                             'success': result["success"],
                             'message': result["message"]
-                        }))
+                        })
+                        continue
+
+                    # Handle cache metrics request
+                    if message_data.get('type') == 'get_cache_metrics':
+                        await self.send_message(websocket, {
+                            'type': 'cache_metrics',
+                            'redisWrites': self.get_redis_write_metrics(),
+                            'sessionState': self.sessions.memory_footprint(),
+                            'replayedPointsRejected': self.replayed_points_rejected
+                        })
                         continue
 
                     # Handle get_active_users request
@@ -2732,6 +6270,11 @@ class TrackingServer:
                         await self.handle_follow_users_request(websocket, session_ids, include_history)
                         continue
 
+                    # Handle topic subscriptions for live updates
+                    if message_data.get('type') in ('subscribe', 'unsubscribe'):
+                        await self.handle_subscribe_request(websocket, message_data)
+                        continue
+
                     # Handle unfollow_users request
                     if message_data.get('type') == 'unfollow_users':
                         await self.handle_unfollow_users_request(websocket)
@@ -2743,25 +6286,25 @@ class TrackingServer:
                         if session_id:
                             try:
                                 weather_data = await self.get_weather_data_for_session(session_id)
-                                await websocket.send(json.dumps({
+                                await self.send_message(websocket, {
                                     'type': 'weather_data',
                                     'sessionId': session_id,
                                     'weather': weather_data
-                                }))
+                                })
                                 logging.info(f"Sent weather data for session {session_id}: {len(weather_data)} weather points")
                             except Exception as e:
                                 logging.error(f"Error handling weather data request: {str(e)}")
-                                await websocket.send(json.dumps({
+                                await self.send_message(websocket, {
                                     'type': 'weather_data',
                                     'sessionId': session_id,
                                     'weather': [],
                                     'error': str(e)
-                                }))
+                                })
                         else:
-                            await websocket.send(json.dumps({
+                            await self.send_message(websocket, {
                                 'type': 'weather_data',
                                 'error': 'sessionId is required'
-                            }))
+                            })
                         continue
 
                     # Handle get_weather_summary request
@@ -2770,22 +6313,22 @@ class TrackingServer:
                         if session_id:
                             try:
                                 summary = await self.get_weather_summary_for_session(session_id)
-                                await websocket.send(json.dumps({
+                                await self.send_message(websocket, {
                                     'type': 'weather_summary',
                                     'summary': summary
-                                }))
+                                })
                                 logging.info(f"Sent weather summary for session {session_id}")
                             except Exception as e:
                                 logging.error(f"Error handling weather summary request: {str(e)}")
-                                await websocket.send(json.dumps({
+                                await self.send_message(websocket, {
                                     'type': 'weather_summary',
                                     'error': str(e)
-                                }))
+                                })
                         else:
-                            await websocket.send(json.dumps({
+                            await self.send_message(websocket, {
                                 'type': 'weather_summary',
                                 'error': 'sessionId is required'
-                            }))
+                            })
                         continue
 
                     # Handle get_barometer request
@@ -2794,25 +6337,25 @@ class TrackingServer:
                         if session_id:
                             try:
                                 barometer_data = await self.get_barometer_data_for_session(session_id)
-                                await websocket.send(json.dumps({
+                                await self.send_message(websocket, {
                                     'type': 'barometer_data',
                                     'sessionId': session_id,
                                     'barometer': barometer_data
-                                }))
+                                })
                                 logging.info(f"Sent barometer data for session {session_id}: {len(barometer_data)} barometer points")
                             except Exception as e:
                                 logging.error(f"Error handling barometer data request: {str(e)}")
-                                await websocket.send(json.dumps({
+                                await self.send_message(websocket, {
                                     'type': 'barometer_data',
                                     'sessionId': session_id,
                                     'barometer': [],
                                     'error': str(e)
-                                }))
+                                })
                         else:
-                            await websocket.send(json.dumps({
+                            await self.send_message(websocket, {
                                 'type': 'barometer_data',
                                 'error': 'sessionId is required'
-                            }))
+                            })
                         continue
 
                     # Handle get_barometer_summary request
@@ -2821,22 +6364,22 @@ class TrackingServer:
                         if session_id:
                             try:
                                 summary = await self.get_barometer_summary_for_session(session_id)
-                                await websocket.send(json.dumps({
+                                await self.send_message(websocket, {
                                     'type': 'barometer_summary',
                                     'summary': summary
-                                }))
+                                })
                                 logging.info(f"Sent barometer summary for session {session_id}")
                             except Exception as e:
                                 logging.error(f"Error handling barometer summary request: {str(e)}")
-                                await websocket.send(json.dumps({
+                                await self.send_message(websocket, {
                                     'type': 'barometer_summary',
                                     'error': str(e)
-                                }))
+                                })
                         else:
-                            await websocket.send(json.dumps({
+                            await self.send_message(websocket, {
                                 'type': 'barometer_summary',
                                 'error': 'sessionId is required'
-                            }))
+                            })
                         continue
 
                     # Handle delete request
@@ -2844,24 +6387,18 @@ class TrackingServer:
                         session_id = message_data.get('sessionId')
                         if session_id:
                             result = await self.delete_session(session_id)
-                            await websocket.send(json.dumps({
+                            await self.send_message(websocket, {
                                 'type': 'delete_response',
                                 'sessionId': session_id,
                                 'success': result["success"],
                                 'reason': result.get("reason", "")
-                            }))
+                            })
                         continue
 
                     # Handle session status request
                     if message_data.get('type') == 'request_sessions':
                         self.update_active_sessions()
-                        tracking_points = await self.get_tracking_points_from_redis()
-                        session_info = self.build_session_info(tracking_points)
-
-                        await websocket.send(json.dumps({
-                            'type': 'session_list',
-                            'sessions': session_info
-                        }))
+                        await self.send_message(websocket, self.get_session_list_message())
                         continue
 
                     # Handle discipline transition messages
@@ -2880,6 +6417,12 @@ class TrackingServer:
                                 })
                         continue
 
+                    # Handle offline-buffer replays sent as one message
+                    if message_data.get('type') == 'tracking_batch':
+                        if await self.process_tracking_batch(message_data):
+                            last_active_users_broadcast = datetime.datetime.now()
+                        continue
+
                     # Handle waypoint messages
                     if 'waypoint' in message_data and self.validate_waypoint_message(message_data):
                         logging.info(f"Received waypoint: '{message_data.get('waypoint', {}).get('name', 'Unknown')}' for session {message_data.get('sessionId', 'Unknown')}")
@@ -2906,6 +6449,11 @@ class TrackingServer:
                         logging.error(f"Missing required fields: {missing_fields}")
                         continue
 
+                    # Drop points the app resent after a reconnect
+                    if self.is_replayed_point(message_data['sessionId'], message_data):
+                        self.mark_session_active(message_data['sessionId'])
+                        continue
+
                     # Create and validate tracking point (this now handles session reset detection)
                     old_active_sessions = self.active_sessions.copy()
                     tracking_point = self.create_tracking_point(message_data)
@@ -2924,8 +6472,8 @@ class TrackingServer:
                         # DO NOT save to database - user wants to exclude -999.0 coordinates completely
                         # This prevents invalid GPS data from polluting the database
 
-                        # Send a special update to frontend indicating invalid coordinates
-                        await self.broadcast_update({
+                        # Send a special update to subscribers indicating invalid coordinates
+                        invalid_message = {
                             'type': 'invalid_coordinates',
                             'sessionId': actual_session_id,
                             'reason': tracking_point.get('reason', 'Invalid GPS coordinates'),
@@ -2936,15 +6484,25 @@ class TrackingServer:
                                 'currentSpeed': tracking_point.get('currentSpeed'),
                                 'timestamp': tracking_point.get('timestamp')
                             }
+                        }
+                        await self.publish_cluster_event({
+                            'type': 'invalid_coordinates',
+                            'point': tracking_point,
+                            'message': invalid_message
                         })
+                        await self.publish_point_message(tracking_point, invalid_message)
 
                         # Continue processing other messages, don't break the loop
                         continue
 
-                    # Save to database with the actual session ID (only for valid coordinates)
-                    db_success = await self.save_tracking_data_to_db(tracking_point)
-                    if not db_success:
-                        logging.warning("Failed to save to database, but continuing with in-memory storage")
+                    # Queue for the write-behind database writer with the actual
+                    # session ID (only for valid coordinates); broadcasting does
+                    # not wait for the PostgreSQL transaction.
+                    db_queued = await self.enqueue_tracking_point(tracking_point)
+                    if db_queued:
+                        self.record_point_sequences(message_data['sessionId'], [tracking_point])
+                    else:
+                        logging.warning("Failed to queue point for database, but continuing with in-memory storage")
 
                     # Redis is the recent-history source for the live webpage.
                     # A Redis failure must not interrupt PostgreSQL persistence
@@ -2956,59 +6514,17 @@ class TrackingServer:
                             actual_session_id
                         )
 
-                    # Store tracking point (only valid coordinates)
-                    self.tracking_history[actual_session_id].append(tracking_point)
+                    # The other workers store and deliver the point as well
+                    await self.publish_cluster_points(message_data['sessionId'], [tracking_point])
 
-                    # Check if we have new active sessions
-                    if actual_session_id not in old_active_sessions:
-                        logging.info(f"New active session detected: {actual_session_id}")
-                        # Broadcast active users update when new session becomes active
-                        await self.broadcast_active_users_update()
-                        await self.broadcast_session_list_update()
+                    # Store the tracking point (only valid coordinates) and send
+                    # it to subscribers and followers; a new active session also
+                    # updates the active users and session lists.
+                    new_session = actual_session_id not in old_active_sessions
+                    await self.distribute_live_points(actual_session_id, [tracking_point], new_session)
+                    if new_session:
                         last_active_users_broadcast = datetime.datetime.now()
 
-                    # Broadcast general tracking update to all clients (only for valid coordinates)
-                    await self.broadcast_update({
-                        'type': 'update',
-                        'point': tracking_point
-                    })
-
-                    # Send specific followed_user_update to followers of this session
-                    if actual_session_id in self.session_followers:
-                        # Get lap times for this session
-                        lap_times = await self.get_lap_times_for_session(actual_session_id)
-                        
-                        follower_update = {
-                            'type': 'followed_user_update',
-                            'point': {
-                                'sessionId': actual_session_id,
-                                'person': tracking_point.get("firstname", tracking_point.get("person", "")),
-                                'latitude': tracking_point.get("latitude", 0.0),
-                                'longitude': tracking_point.get("longitude", 0.0),
-                                'altitude': tracking_point.get("altitude", 0.0),
-                                'currentSpeed': tracking_point.get("currentSpeed", 0.0),
-                                'distance': tracking_point.get("distance", 0.0),
-                                'sportType': tracking_point.get("sportType", ""),
-                                'heartRate': tracking_point.get("heartRate"),
-                                'cadence': tracking_point.get("cadence"),
-                                'slope': tracking_point.get("slope"),
-                                'averageSlope': tracking_point.get("averageSlope"),
-                                'maxUphillSlope': tracking_point.get("maxUphillSlope"),
-                                'maxDownhillSlope': tracking_point.get("maxDownhillSlope"),
-                                'timestamp': tracking_point.get("timestamp", ""),
-                                'lapTimes': [
-                                    {
-                                        'lapNumber': lap['lapNumber'],
-                                        'duration': lap['duration'],
-                                        'distance': lap['distance']
-                                    } for lap in lap_times
-                                ] if lap_times else None
-                            }
-                        }
-
-                        await self.broadcast_to_followers(actual_session_id, follower_update)
-                        logging.info(f"Sent followed_user_update for session {actual_session_id} to {len(self.session_followers[actual_session_id])} followers")
-
                     # Periodically broadcast active users list
                     now = datetime.datetime.now()
                     if (now - last_active_users_broadcast).total_seconds() > broadcast_interval:
@@ -3026,33 +6542,62 @@ class TrackingServer:
         except Exception as e:
             logging.error(f"Unexpected error in handle_client: {str(e)}")
         finally:
+            await self.unregister_client_outbox(websocket)
+            # Clean up following relationships for this client even when a
+            # broadcast already dropped it from connected_clients
+            self.remove_client_from_following(websocket)
+            self.remove_client_topics(websocket)
             if websocket in self.connected_clients:
                 self.connected_clients.remove(websocket)
-                # Clean up following relationships for this client
-                self.remove_client_from_following(websocket)
                 logging.info(f"Removed client {client_address} from connected_clients and following relationships")
 
-async def main():
-    """Main function to run the WebSocket server."""
-    server = TrackingServer()
+async def main(worker_index: int = 0, worker_count: int = 1,
+               position_board: Optional[PositionBoard] = None):
+    """Main function to run the WebSocket server (or one of its worker processes).
 
-    logging.info(f"WebSocket server starting on port 6789")
+    Workers get the position board from the supervisor; a single server
+    creates its own.
+    """
+    server = TrackingServer()
+    server.cluster_enabled = worker_count > 1
+    server.position_board = position_board
+    if worker_count == 1:
+        server.position_board = create_position_board(server)
+    elif server.spool_dir:
+        # Segment numbers are per process
+        server.spool_dir = os.path.join(server.spool_dir, f"worker-{worker_index}")
+
+    logging.info(f"WebSocket server starting on port 6789 (worker {worker_index + 1}/{worker_count})")
     logging.info(f"Database config: {server.db_config}")
 
     # PostgreSQL remains the permanent store used by analysis/history pages.
     try:
         await server.init_database()
+        await server.start_persistence_writer()
     except Exception as e:
         logging.error(f"Database initialization failed: {str(e)}")
         logging.info("Continuing without database - data will be stored in memory only")
 
     # Redis is the normal startup source for the live webpage. If its live key
-    # is empty after an outage or recreation, rebuild the configured live
-    # window from PostgreSQL before loading the in-memory state.
+    # is empty after an outage or recreation, the configured live window is
+    # rebuilt from PostgreSQL before the in-memory state is hydrated.
+    restore_task = None
     try:
         await server.init_redis()
-        await server.backfill_empty_redis_history_from_db()
-        await server.load_tracking_history_from_redis()
+        await server.start_redis_writer()
+        if server.persistence_mode == 'stream':
+            server.pubsub_handlers[server.lap_update_channel] = server.apply_lap_update
+            logging.info(f"Points are persisted by workers through {server.ingest_stream_key}")
+        if server.cluster_enabled:
+            # Every worker saves points, so laps are shared like in stream mode
+            server.publish_lap_updates = True
+            server.pubsub_handlers[server.lap_update_channel] = server.apply_lap_update
+            server.pubsub_handlers[server.cluster_channel] = server.handle_cluster_message
+        await server.start_pubsub_listener()
+        # Accept connections right away; the live history is restored in
+        # the background and Redis is read only up to this moment.
+        server.restore_started_at = time.time()
+        restore_task = asyncio.create_task(server.restore_live_state(prepare=not server.cluster_enabled))
     except Exception as e:
         logging.error(f"Redis live-history initialization failed: {str(e)}")
         logging.info(
@@ -3068,11 +6613,22 @@ async def main():
     else:
         logging.info("Automatic memory cleanup is disabled")
 
+    await server.start_broadcast_ticker()
+
     try:
-        async with websockets.serve(server.handle_client, "0.0.0.0", 6789):
+        async with websockets.serve(server.handle_client, "0.0.0.0", 6789,
+                                    subprotocols=supported_subprotocols() or None,
+                                    reuse_port=server.cluster_enabled):
             logging.info("server listening on 0.0.0.0:6789")
+            # Docker stops the container with SIGTERM; turn it into a normal
+            # shutdown so queued points are drained before exiting.
+            stop_future = asyncio.get_running_loop().create_future()
             try:
-                await asyncio.Future()  # run forever
+                asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop_future.cancel)
+            except NotImplementedError:
+                pass
+            try:
+                await stop_future  # run until SIGTERM
             except asyncio.CancelledError:
                 pass
     finally:
@@ -3084,6 +6640,23 @@ async def main():
             except asyncio.CancelledError:
                 logging.info("Cleanup task cancelled during shutdown")
 
+        if restore_task and not restore_task.done():
+            restore_task.cancel()
+            try:
+                await restore_task
+            except asyncio.CancelledError:
+                logging.info("Live history restore cancelled during shutdown")
+
+        # Flush pending broadcasts and queued points before the pool goes away
+        try:
+            server.stop_activity_timer()
+            await server.stop_broadcast_ticker()
+            await server.stop_pubsub_listener()
+            await server.stop_redis_writer()
+            await server.stop_persistence_writer()
+        except Exception as e:
+            logging.error(f"Error draining persistence queue during shutdown: {str(e)}")
+
         # Clean up database connections if they exist
         try:
             await server.close_database()
@@ -3095,5 +6668,210 @@ async def main():
         except:
             pass
 
+        # Workers leave the board to the supervisor that created it
+        if server.position_board and worker_count == 1:
+            server.position_board.close()
+
+async def backfill_redis(force: bool, batch_size: Optional[int]) -> int:
+    """Rebuild the Redis live cache from PostgreSQL, e.g. after a Redis loss."""
+    server = TrackingServer()
+    try:
+        await server.init_database()
+        await server.init_redis()
+
+        if await server.redis_client.exists(server.redis_restore_key):
+            print("A server is restoring the Redis live history; try again when it is done")
+            return 1
+        # Points the running servers cache from now on are left to them
+        server.restore_started_at = time.time()
+
+        if await server.redis_client.hlen(server.redis_session_index_key):
+            if not force:
+                print("Redis live history is not empty; use --force to replace it")
+                return 1
+            session_ids = {session_id for session_id, _ in await server.get_redis_session_index()}
+            removed = await server.delete_sessions_from_redis(session_ids)
+            print(f"Removed {removed} cached points of {len(session_ids)} sessions from Redis")
+
+        stats = await server.backfill_redis_from_db(batch_size)
+        print(json.dumps(stats))
+        return 0
+    finally:
+        try:
+            await server.close_database()
+        except Exception:
+            pass
+        try:
+            await server.close_redis()
+        except Exception:
+            pass
+
+async def persist_worker() -> int:
+    """Write the Redis ingest stream to PostgreSQL until SIGTERM."""
+    server = TrackingServer()
+    server.publish_lap_updates = True
+    stop_event = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop_event.set)
+    except NotImplementedError:
+        pass
+
+    if not 0 <= server.ingest_shard < server.ingest_shards:
+        logging.error(f"INGEST_SHARD {server.ingest_shard} is outside of INGEST_SHARDS={server.ingest_shards}")
+        return 1
+
+    try:
+        await server.init_database()
+        await server.init_redis()
+        server.pubsub_handlers[server.session_delete_channel] = server.apply_session_deletion
+        await server.start_pubsub_listener()
+        await server.run_persistence_worker(stop_event)
+        return 0
+    finally:
+        try:
+            await server.stop_pubsub_listener()
+        except Exception:
+            pass
+        try:
+            await server.close_database()
+        except Exception:
+            pass
+        try:
+            await server.close_redis()
+        except Exception:
+            pass
+
+async def prepare_live_cache() -> None:
+    """Create the tables and prepare Redis once before the workers start."""
+    server = TrackingServer()
+    try:
+        try:
+            await server.init_database()
+        except Exception as e:
+            logging.error(f"Database initialization failed: {str(e)}")
+        await server.init_redis()
+        await server.prepare_redis_history()
+    except Exception as e:
+        logging.error(f"Preparing the Redis live history failed: {str(e)}")
+    finally:
+        try:
+            await server.close_database()
+        except Exception:
+            pass
+        try:
+            await server.close_redis()
+        except Exception:
+            pass
+
+def create_position_board(server: TrackingServer) -> Optional[PositionBoard]:
+    """Create the shared position board, or return None if it is disabled or fails."""
+    if server.position_board_slots <= 0:
+        return None
+    try:
+        position_board = PositionBoard.create(server.position_board_name, server.position_board_slots)
+        logging.info(
+            f"Position board {server.position_board_name} created with {server.position_board_slots} slots"
+        )
+        return position_board
+    except Exception as e:
+        logging.error(f"Creating the position board failed: {str(e)}")
+        return None
+
+def run_worker(worker_index: int, worker_count: int,
+               position_board: Optional[PositionBoard]) -> None:
+    """Entry point of one websocket worker process."""
+    # Forked from the supervisor; only the supervisor restarts or stops workers
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    if position_board:
+        # The board object is the supervisor's copy; a previous writer may have used it since
+        position_board.take_over()
+    asyncio.run(main(worker_index, worker_count, position_board))
+
+def serve_workers(worker_count: int) -> None:
+    """Run worker_count server processes on port 6789 and restart any that die."""
+    asyncio.run(prepare_live_cache())
+    # Every worker holds every session, so the first one writes the board
+    position_board = create_position_board(TrackingServer())
+
+    context = multiprocessing.get_context('fork')
+    stopping = False
+
+    def start_worker(worker_index: int):
+        process = context.Process(target=run_worker,
+                                  args=(worker_index, worker_count, position_board if worker_index == 0 else None),
+                                  name=f"websocket-worker-{worker_index}")
+        process.start()
+        return process
+
+    workers = {worker_index: start_worker(worker_index) for worker_index in range(worker_count)}
+    logging.info(f"Started {worker_count} websocket workers: {[process.pid for process in workers.values()]}")
+
+    def stop_workers(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for process in workers.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM drains queued points
+
+    signal.signal(signal.SIGTERM, stop_workers)
+    signal.signal(signal.SIGINT, stop_workers)
+
+    while workers:
+        multiprocessing.connection.wait([process.sentinel for process in workers.values()])
+        for worker_index, process in list(workers.items()):
+            if process.exitcode is None:
+                continue
+            if stopping:
+                del workers[worker_index]
+                continue
+            logging.error(f"Websocket worker {worker_index} exited with {process.exitcode}; restarting it")
+            time.sleep(1)
+            workers[worker_index] = start_worker(worker_index)
+
+    if position_board:
+        position_board.close()
+
+
 if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="GeoTracker WebSocket server")
+    subcommands = arg_parser.add_subparsers(dest="command")
+    backfill_parser = subcommands.add_parser(
+        "backfill-redis", help="Rebuild the Redis live cache from PostgreSQL and exit"
+    )
+    backfill_parser.add_argument("--force", action="store_true",
+                                 help="Replace the live cache even if Redis is not empty")
+    backfill_parser.add_argument("--batch-size", type=int, default=None,
+                                 help="Points per cursor fetch and Redis pipeline (default: REDIS_WRITE_BATCH_SIZE)")
+    subcommands.add_parser(
+        "persist-worker", help="Write the Redis ingest stream to PostgreSQL (PERSISTENCE_MODE=stream)"
+    )
+    positions_parser = subcommands.add_parser(
+        "positions", help="Print the latest positions of the active sessions from the shared board"
+    )
+    positions_parser.add_argument("--max-age", type=float, default=None,
+                                  help="Only sessions seen within this many seconds")
+    args = arg_parser.parse_args()
+
+    if args.command == "backfill-redis":
+        # Progress goes to the console as well as the log file
+        logging.getLogger().addHandler(logging.StreamHandler())
+        sys.exit(asyncio.run(backfill_redis(args.force, args.batch_size)))
+    if args.command == "persist-worker":
+        sys.exit(asyncio.run(persist_worker()))
+    if args.command == "positions":
+        board = PositionBoard.attach(os.getenv('POSITION_BOARD_NAME', 'geotracker_positions'))
+        try:
+            print(json.dumps(board.positions(args.max_age)))
+        finally:
+            board.close()
+        sys.exit(0)
+
+    # Several processes share the port; live state is replicated through Redis
+    worker_count = int(os.getenv('WEBSOCKET_WORKERS', '1'))
+    if worker_count > 1:
+        serve_workers(worker_count)
+        sys.exit(0)
     asyncio.run(main())